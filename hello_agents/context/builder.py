@@ -7,16 +7,30 @@
 4. Compress: 在预算内压缩与规范化
 """
 
-from typing import Dict, Any, List, Optional, Tuple
+from typing import Callable, Dict, Any, List, Optional, Tuple
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from dataclasses import dataclass, field
 from datetime import datetime
-import tiktoken
+from itertools import accumulate
+import bisect
+import contextvars
+import hashlib
 import math
+import threading
+import time
+import numpy as np
+import tiktoken
 
 from ..core.message import Message
+from ..memory.embedding import embed_queries_memoized, query_embedding_scope
 from ..tools import MemoryTool, RAGTool
 
 
+# 每次构建都会重新生成、且不参与向量检索的包类型：不做嵌入（系统指令固定纳入，历史按关键词重叠评分）
+_UNEMBEDDED_TYPES = frozenset({"instructions", "history"})
+
+
 @dataclass
 class ContextPacket:
     """上下文信息包"""
@@ -27,7 +41,7 @@ class ContextPacket:
     relevance_score: float = 0.0  # 0.0-1.0
     
     def __post_init__(self):
-        """自动计算token数"""
+        """自动计算token数（按内容哈希缓存，相同内容不会重复分词）"""
         if self.token_count == 0:
             self.token_count = count_tokens(self.content)
 
@@ -37,11 +51,14 @@ class ContextConfig:
     """上下文构建配置"""
     max_tokens: int = 8000  # 总预算
     reserve_ratio: float = 0.15  # 生成余量（10-20%）
-    min_relevance: float = 0.3  # 最小相关性阈值
+    min_relevance: float = 0.3  # 最小相关性阈值（关键词重叠：命中查询词的比例）
+    min_embedding_relevance: float = 0.2  # 向量路径的最小相关性阈值（查询与包的余弦相似度）
     enable_mmr: bool = True  # 启用最大边际相关性（多样性）
     mmr_lambda: float = 0.7  # MMR平衡参数（0=纯多样性, 1=纯相关性）
+    duplicate_threshold: float = 0.95  # 与已选包的余弦相似度不低于该值时视为重复并丢弃
     system_prompt_template: str = ""  # 系统提示模板
     enable_compression: bool = True  # 启用压缩
+    source_timeout: float = 10.0  # Gather阶段单个来源的超时（秒），超时来源的结果被丢弃
     
     def get_available_tokens(self) -> int:
         """获取可用token预算（扣除余量）"""
@@ -76,7 +93,32 @@ class ContextBuilder:
         self.memory_tool = memory_tool
         self.rag_tool = rag_tool
         self.config = config or ContextConfig()
-        self._encoding = tiktoken.get_encoding("cl100k_base")
+        
+        # Gather来源：名称 -> (函数(user_query) -> List[ContextPacket], 超时秒数或None)，按注册顺序输出
+        self._sources: Dict[str, Tuple[Callable[[str], List[ContextPacket]], Optional[float]]] = {}
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self.last_gather_timings: Dict[str, Dict[str, Any]] = {}
+        if self.memory_tool:
+            self.register_source("task_state", self._task_state_source)
+            self.register_source("related_memory", self._related_memory_source)
+        if self.rag_tool:
+            self.register_source("knowledge_base", self._knowledge_base_source)
+    
+    def register_source(
+        self,
+        name: str,
+        source: Callable[[str], List[ContextPacket]],
+        timeout: Optional[float] = None
+    ):
+        """注册Gather来源：source(user_query) 返回 ContextPacket 列表；同名来源会被替换
+        
+        所有来源在Gather阶段并发执行，超过 timeout（默认 config.source_timeout）的来源被跳过。
+        """
+        self._sources[name] = (source, timeout)
+    
+    def unregister_source(self, name: str):
+        """移除Gather来源"""
+        self._sources.pop(name, None)
     
     def build(
         self,
@@ -96,16 +138,18 @@ class ContextBuilder:
         Returns:
             结构化上下文字符串
         """
-        # 1. Gather: 收集候选信息
-        packets = self._gather(
-            user_query=user_query,
-            conversation_history=conversation_history or [],
-            system_instructions=system_instructions,
-            additional_packets=additional_packets or []
-        )
-        
-        # 2. Select: 筛选与排序
-        selected_packets = self._select(packets, user_query)
+        # 同一次构建内，记忆/RAG检索与Select阶段共享查询向量
+        with query_embedding_scope():
+            # 1. Gather: 收集候选信息
+            packets = self._gather(
+                user_query=user_query,
+                conversation_history=conversation_history or [],
+                system_instructions=system_instructions,
+                additional_packets=additional_packets or []
+            )
+            
+            # 2. Select: 筛选与排序
+            selected_packets = self._select(packets, user_query)
         
         # 3. Structure: 组织成结构化模板
         structured_context = self._structure(
@@ -136,51 +180,8 @@ class ContextBuilder:
                 metadata={"type": "instructions"}
             ))
         
-        # P1: 从记忆中获取任务状态与关键结论
-        if self.memory_tool:
-            try:
-                # 搜索任务状态相关记忆
-                state_results = self.memory_tool.execute(
-                    "search",
-                    query="(任务状态 OR 子目标 OR 结论 OR 阻塞)",
-                    min_importance=0.7,
-                    limit=5
-                )
-                if state_results and "未找到" not in state_results:
-                    packets.append(ContextPacket(
-                        content=state_results,
-                        metadata={"type": "task_state", "importance": "high"}
-                    ))
-                
-                # 搜索与当前查询相关的记忆
-                related_results = self.memory_tool.execute(
-                    "search",
-                    query=user_query,
-                    limit=5
-                )
-                if related_results and "未找到" not in related_results:
-                    packets.append(ContextPacket(
-                        content=related_results,
-                        metadata={"type": "related_memory"}
-                    ))
-            except Exception as e:
-                print(f"⚠️ 记忆检索失败: {e}")
-        
-        # P2: 从RAG中获取事实证据
-        if self.rag_tool:
-            try:
-                rag_results = self.rag_tool.run({
-                    "action": "search",
-                    "query": user_query,
-                    "limit": 5
-                })
-                if rag_results and "未找到" not in rag_results and "错误" not in rag_results:
-                    packets.append(ContextPacket(
-                        content=rag_results,
-                        metadata={"type": "knowledge_base"}
-                    ))
-            except Exception as e:
-                print(f"⚠️ RAG检索失败: {e}")
+        # P1/P2: 记忆（任务状态、相关记忆）、RAG证据及其他注册来源，并发收集
+        packets.extend(self._gather_sources(user_query))
         
         # P3: 对话历史（辅助材料）
         if conversation_history:
@@ -200,15 +201,132 @@ class ContextBuilder:
         
         return packets
     
+    def _gather_sources(self, user_query: str) -> List[ContextPacket]:
+        """并发执行所有注册来源，按注册顺序合并结果，并记录各来源耗时到 last_gather_timings
+        
+        每个来源从同一时刻开始计时，超时后不再等待（线程无法强制中止，超时来源在后台结束后结果被丢弃），
+        因此整体耗时受最慢的（未超时）来源约束，慢来源不会阻塞其他来源的结果。
+        """
+        self.last_gather_timings = {}
+        if not self._sources:
+            return []
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=max(4, len(self._sources)),
+                thread_name_prefix="context-gather"
+            )
+        
+        started = time.perf_counter()
+        futures = {}
+        for name, (source, timeout) in self._sources.items():
+            # 复制当前上下文，使来源线程共享本次构建的查询向量备忘录
+            ctx = contextvars.copy_context()
+            futures[name] = (self._executor.submit(ctx.run, self._timed, source, user_query), timeout)
+        
+        packets: List[ContextPacket] = []
+        for name, (future, timeout) in futures.items():
+            limit = self.config.source_timeout if timeout is None else timeout
+            remaining = max(0.0, started + limit - time.perf_counter())
+            try:
+                elapsed, result = future.result(timeout=remaining)
+            except FutureTimeoutError:
+                future.cancel()
+                self.last_gather_timings[name] = {"status": "timeout", "elapsed_ms": round(limit * 1000, 1), "packets": 0}
+                print(f"⚠️ 上下文来源 {name} 超时（>{limit}s），已跳过")
+                continue
+            if isinstance(result, Exception):
+                self.last_gather_timings[name] = {"status": "error", "elapsed_ms": round(elapsed * 1000, 1), "packets": 0}
+                print(f"⚠️ 上下文来源 {name} 失败: {result}")
+                continue
+            result = result or []
+            self.last_gather_timings[name] = {"status": "ok", "elapsed_ms": round(elapsed * 1000, 1), "packets": len(result)}
+            packets.extend(result)
+        return packets
+    
+    @staticmethod
+    def _timed(source: Callable[[str], List[ContextPacket]], user_query: str) -> Tuple[float, Any]:
+        """执行来源并计时；异常作为结果返回，以便记录失败来源的实际耗时"""
+        t0 = time.perf_counter()
+        try:
+            result = source(user_query)
+        except Exception as e:
+            result = e
+        return time.perf_counter() - t0, result
+    
+    def _task_state_source(self, user_query: str) -> List[ContextPacket]:
+        """记忆来源：任务状态与关键结论"""
+        state_results = self.memory_tool.execute(
+            "search",
+            query="(任务状态 OR 子目标 OR 结论 OR 阻塞)",
+            min_importance=0.7,
+            limit=5
+        )
+        if state_results and "未找到" not in state_results:
+            return [ContextPacket(
+                content=state_results,
+                metadata={"type": "task_state", "importance": "high"}
+            )]
+        return []
+    
+    def _related_memory_source(self, user_query: str) -> List[ContextPacket]:
+        """记忆来源：与当前查询相关的记忆"""
+        related_results = self.memory_tool.execute(
+            "search",
+            query=user_query,
+            limit=5
+        )
+        if related_results and "未找到" not in related_results:
+            return [ContextPacket(
+                content=related_results,
+                metadata={"type": "related_memory"}
+            )]
+        return []
+    
+    def _knowledge_base_source(self, user_query: str) -> List[ContextPacket]:
+        """RAG来源：知识库事实证据"""
+        rag_results = self.rag_tool.run({
+            "action": "search",
+            "query": user_query,
+            "limit": 5
+        })
+        if rag_results and "未找到" not in rag_results and "错误" not in rag_results:
+            return [ContextPacket(
+                content=rag_results,
+                metadata={"type": "knowledge_base"}
+            )]
+        return []
+    
     def _select(
         self,
         packets: List[ContextPacket],
         user_query: str
     ) -> List[ContextPacket]:
-        """Select: 基于分数与预算的筛选"""
-        # 1) 计算相关性（关键词重叠）
+        """Select: 基于分数与预算的筛选
+        
+        相关性为包向量与查询向量的余弦相似度（一次矩阵运算，按 min_embedding_relevance 过滤），
+        系统指令与对话历史不做嵌入，与嵌入不可用时一样使用关键词重叠（按 min_relevance 过滤）；
+        启用MMR时按 λ·分数 − (1−λ)·与已选包的最大相似度 贪心选择，并丢弃近似重复的包。
+        """
+        # 1) 计算相关性（向量余弦；固定包或嵌入失败时使用关键词重叠）
+        embed_idx = [i for i, p in enumerate(packets) if p.metadata.get("type") not in _UNEMBEDDED_TYPES]
+        vectors = self._embed_packets([packets[i] for i in embed_idx], user_query)
+        thresholds = [self.config.min_relevance] * len(packets)
+        packet_vecs = None
+        keyword_idx = range(len(packets))
+        if vectors is not None:
+            query_vec, embedded_vecs = vectors
+            # 未嵌入的包取零向量：不参与MMR相似度与去重
+            packet_vecs = np.zeros((len(packets), embedded_vecs.shape[1]), dtype=embedded_vecs.dtype)
+            packet_vecs[embed_idx] = embedded_vecs
+            relevance = np.clip(embedded_vecs @ query_vec, 0.0, 1.0)
+            for i, rel in zip(embed_idx, relevance):
+                packets[i].relevance_score = float(rel)
+                thresholds[i] = self.config.min_embedding_relevance
+            embedded = set(embed_idx)
+            keyword_idx = [i for i in range(len(packets)) if i not in embedded]
         query_tokens = set(user_query.lower().split())
-        for packet in packets:
+        for i in keyword_idx:
+            packet = packets[i]
             content_tokens = set(packet.content.lower().split())
             if len(query_tokens) > 0:
                 overlap = len(query_tokens & content_tokens)
@@ -223,40 +341,79 @@ class ContextBuilder:
             return math.exp(-delta / tau)
         
         # 3) 计算复合分：0.7*相关性 + 0.3*新近性
-        scored_packets: List[Tuple[float, ContextPacket]] = []
-        for p in packets:
-            rec = recency_score(p.timestamp)
-            score = 0.7 * p.relevance_score + 0.3 * rec
-            scored_packets.append((score, p))
+        scores = [0.7 * p.relevance_score + 0.3 * recency_score(p.timestamp) for p in packets]
         
-        # 4) 系统指令单独拿出，固定纳入
-        system_packets = [p for (_, p) in scored_packets if p.metadata.get("type") == "instructions"]
-        remaining = [p for (s, p) in sorted(scored_packets, key=lambda x: x[0], reverse=True)
-                     if p.metadata.get("type") != "instructions"]
-        
-        # 5) 依据 min_relevance 过滤（对非系统包）
-        filtered = [p for p in remaining if p.relevance_score >= self.config.min_relevance]
+        # 4) 系统指令单独拿出，固定纳入；其余依据各自评分方式的阈值过滤
+        system_idx = [i for i, p in enumerate(packets) if p.metadata.get("type") == "instructions"]
+        candidates = [
+            i for i, p in enumerate(packets)
+            if p.metadata.get("type") != "instructions" and p.relevance_score >= thresholds[i]
+        ]
         
-        # 6) 按预算填充
+        # 5) 按预算填充
         available_tokens = self.config.get_available_tokens()
         selected: List[ContextPacket] = []
         used_tokens = 0
         
         # 先放入系统指令（不排序）
-        for p in system_packets:
+        for i in system_idx:
+            p = packets[i]
             if used_tokens + p.token_count <= available_tokens:
                 selected.append(p)
                 used_tokens += p.token_count
         
-        # 再按分数加入其余
-        for p in filtered:
+        # 再按分数（或MMR）贪心加入其余：放不下的包跳过，继续尝试更小的包
+        if packet_vecs is None or not self.config.enable_mmr:
+            for i in sorted(candidates, key=lambda i: scores[i], reverse=True):
+                p = packets[i]
+                if used_tokens + p.token_count > available_tokens:
+                    continue
+                selected.append(p)
+                used_tokens += p.token_count
+            return selected
+        
+        lam = self.config.mmr_lambda
+        sims = packet_vecs @ packet_vecs.T
+        base = np.array(scores, dtype=np.float32)
+        # 与已选包（含系统指令）的最大相似度
+        max_sim = np.zeros(len(packets), dtype=np.float32)
+        for i in system_idx:
+            max_sim = np.maximum(max_sim, sims[i])
+        pool = set(candidates)
+        while pool:
+            idx = np.fromiter(pool, dtype=np.int64)
+            mmr = lam * base[idx] - (1 - lam) * max_sim[idx]
+            best = int(idx[int(np.argmax(mmr))])
+            pool.discard(best)
+            p = packets[best]
+            if max_sim[best] >= self.config.duplicate_threshold:
+                continue  # 与已选内容近似重复
             if used_tokens + p.token_count > available_tokens:
                 continue
             selected.append(p)
             used_tokens += p.token_count
+            max_sim = np.maximum(max_sim, sims[best])
         
         return selected
     
+    def _embed_packets(
+        self,
+        packets: List[ContextPacket],
+        user_query: str
+    ) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """一次批量嵌入查询与给定包内容，返回 (查询单位向量, 包单位向量矩阵)；嵌入不可用时返回 None"""
+        if not packets or not user_query.strip():
+            return None
+        try:
+            mat = embed_queries_memoized([user_query] + [p.content for p in packets])
+        except Exception:
+            return None
+        norms = np.linalg.norm(mat, axis=1, keepdims=True)
+        if not norms[0, 0] > 0:
+            return None
+        mat = mat / np.where(norms > 0, norms, 1.0)
+        return mat[0], mat[1:]
+    
     def _structure(
         self,
         selected_packets: List[ContextPacket],
@@ -327,27 +484,81 @@ class ContextBuilder:
         # 实际应用中可用LLM做高保真摘要
         print(f"⚠️ 上下文超预算 ({current_tokens} > {available_tokens})，执行截断")
         
-        # 按段落截断，保留结构
+        # 按行截断，保留结构：一次批量计数，在行token前缀和上二分找到截断点
         lines = context.split("\n")
-        compressed_lines = []
-        used_tokens = 0
+        prefix = list(accumulate(count_tokens_batch(lines)))
+        keep = bisect.bisect_right(prefix, available_tokens)
         
-        for line in lines:
-            line_tokens = count_tokens(line)
-            if used_tokens + line_tokens > available_tokens:
-                break
-            compressed_lines.append(line)
-            used_tokens += line_tokens
-        
-        return "\n".join(compressed_lines)
+        return "\n".join(lines[:keep])
+
+
+# 编码器只加载一次（加载失败也记住，避免每次计数都重新尝试下载编码表）
+_encoding_lock = threading.Lock()
+_encoding: Optional[Any] = None
+_encoding_loaded = False
+
+# token数缓存：内容哈希 -> token数（LRU）
+_TOKEN_CACHE_SIZE = 8192
+_token_cache: "OrderedDict[bytes, int]" = OrderedDict()
+_token_cache_lock = threading.Lock()
+
+
+def _get_encoding():
+    """进程内共享的 cl100k_base 编码器；不可用时返回 None"""
+    global _encoding, _encoding_loaded
+    if _encoding_loaded:
+        return _encoding
+    with _encoding_lock:
+        if not _encoding_loaded:
+            try:
+                _encoding = tiktoken.get_encoding("cl100k_base")
+            except Exception:
+                _encoding = None
+            _encoding_loaded = True
+    return _encoding
+
+
+def _content_key(text: str) -> bytes:
+    return hashlib.blake2b(text.encode("utf-8", "surrogatepass"), digest_size=16).digest()
+
+
+def count_tokens_batch(texts: List[str]) -> List[int]:
+    """批量计算token数：命中缓存的直接返回，其余一次性批量分词"""
+    keys = [_content_key(t) for t in texts]
+    counts: List[Optional[int]] = [None] * len(texts)
+    with _token_cache_lock:
+        for i, key in enumerate(keys):
+            cached = _token_cache.get(key)
+            if cached is not None:
+                _token_cache.move_to_end(key)
+                counts[i] = cached
+    missing = {}
+    for i, c in enumerate(counts):
+        if c is None:
+            missing.setdefault(keys[i], texts[i])
+    if missing:
+        encoding = _get_encoding()
+        uniq = list(missing.items())
+        if encoding is not None:
+            try:
+                fresh = [len(ids) for ids in encoding.encode_batch([t for _, t in uniq], disallowed_special=())]
+            except Exception:
+                fresh = [len(t) // 4 for _, t in uniq]
+        else:
+            # 降级方案：粗略估算（1 token ≈ 4 字符）
+            fresh = [len(t) // 4 for _, t in uniq]
+        computed = {key: n for (key, _), n in zip(uniq, fresh)}
+        with _token_cache_lock:
+            for key, n in computed.items():
+                _token_cache[key] = n
+                _token_cache.move_to_end(key)
+            while len(_token_cache) > _TOKEN_CACHE_SIZE:
+                _token_cache.popitem(last=False)
+        counts = [c if c is not None else computed[k] for c, k in zip(counts, keys)]
+    return counts
 
 
 def count_tokens(text: str) -> int:
-    """计算文本token数（使用tiktoken）"""
-    try:
-        encoding = tiktoken.get_encoding("cl100k_base")
-        return len(encoding.encode(text))
-    except Exception:
-        # 降级方案：粗略估算（1 token ≈ 4 字符）
-        return len(text) // 4
+    """计算文本token数（使用tiktoken，按内容哈希缓存）"""
+    return count_tokens_batch([text])[0]
 
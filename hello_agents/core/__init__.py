@@ -2,6 +2,7 @@
 
 from .agent import Agent
 from .llm import HelloAgentsLLM
+from .llm_router import RoutedLLM
 from .message import Message
 from .config import Config
 from .exceptions import HelloAgentsException
@@ -9,6 +10,7 @@ from .exceptions import HelloAgentsException
 __all__ = [
     "Agent",
     "HelloAgentsLLM", 
+    "RoutedLLM",
     "Message",
     "Config",
     "HelloAgentsException"
@@ -1,10 +1,18 @@
 """HelloAgents统一LLM接口 - 基于OpenAI原生API"""
 
+import asyncio
+import logging
 import os
-from typing import Literal, Optional, Iterator
-from openai import OpenAI
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Dict, List, Literal, Optional, Iterator, Tuple, Union
+from openai import AsyncOpenAI, OpenAI
 
 from .exceptions import HelloAgentsException
+from .llm_cache import ResponseCache, cache_enabled_by_env, get_response_cache
+
+logger = logging.getLogger(__name__)
 
 # 支持的LLM提供商
 SUPPORTED_PROVIDERS = Literal[
@@ -21,6 +29,51 @@ SUPPORTED_PROVIDERS = Literal[
     "custom",
 ]
 
+# 进程级客户端池：同一 (provider, base_url, api_key, timeout, max_retries) 复用一个客户端及其连接池，
+# 避免每次构造 HelloAgentsLLM 都重新握手。异步客户端绑定在创建它的事件循环上，按循环分别缓存。
+_ClientKey = Tuple[str, str, str, int, int]
+_client_lock = threading.Lock()
+_sync_clients: Dict[_ClientKey, OpenAI] = {}
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[_ClientKey, AsyncOpenAI]]" = weakref.WeakKeyDictionary()
+_default_llm: Optional["HelloAgentsLLM"] = None
+# 默认LLM单独加锁：构造 HelloAgentsLLM 时会经 get_shared_client 获取 _client_lock
+_default_llm_lock = threading.Lock()
+
+
+def get_shared_client(key: _ClientKey) -> OpenAI:
+    """获取（或创建）共享的同步客户端"""
+    client = _sync_clients.get(key)
+    if client is not None:
+        return client
+    with _client_lock:
+        if key not in _sync_clients:
+            _, base_url, api_key, timeout, max_retries = key
+            _sync_clients[key] = OpenAI(api_key=api_key, base_url=base_url, timeout=timeout, max_retries=max_retries)
+        return _sync_clients[key]
+
+
+def get_shared_async_client(key: _ClientKey) -> AsyncOpenAI:
+    """获取（或创建）当前事件循环上共享的异步客户端"""
+    loop = asyncio.get_running_loop()
+    with _client_lock:
+        clients = _async_clients.setdefault(loop, {})
+        if key not in clients:
+            _, base_url, api_key, timeout, max_retries = key
+            clients[key] = AsyncOpenAI(api_key=api_key, base_url=base_url, timeout=timeout, max_retries=max_retries)
+        return clients[key]
+
+
+def get_default_llm() -> "HelloAgentsLLM":
+    """进程内共享的默认LLM（按环境变量配置），供RAG扩展/摘要等内部辅助调用复用"""
+    global _default_llm
+    if _default_llm is not None:
+        return _default_llm
+    with _default_llm_lock:
+        if _default_llm is None:
+            _default_llm = HelloAgentsLLM()
+        return _default_llm
+
+
 class HelloAgentsLLM:
     """
     为HelloAgents定制的LLM客户端。
@@ -42,6 +95,8 @@ class HelloAgentsLLM:
         temperature: float = 0.7,
         max_tokens: Optional[int] = None,
         timeout: Optional[int] = None,
+        response_cache: Union[bool, ResponseCache, None] = None,
+        max_retries: Optional[int] = None,
         **kwargs
     ):
         """
@@ -56,13 +111,22 @@ class HelloAgentsLLM:
             temperature: 温度参数
             max_tokens: 最大token数
             timeout: 超时时间，从环境变量LLM_TIMEOUT读取，默认60秒
+            response_cache: invoke/ainvoke 的响应缓存；True 使用共享缓存，也可传入 ResponseCache 实例，
+                未提供时由环境变量 LLM_RESPONSE_CACHE 决定（默认关闭）
+            max_retries: 客户端自动重试次数，从环境变量LLM_MAX_RETRIES读取，默认2
         """
         # 优先使用传入参数，如果未提供，则从环境变量加载
         self.model = model or os.getenv("LLM_MODEL_ID")
         self.temperature = temperature
         self.max_tokens = max_tokens
         self.timeout = timeout or int(os.getenv("LLM_TIMEOUT", "60"))
+        self.max_retries = max_retries if max_retries is not None else int(os.getenv("LLM_MAX_RETRIES", "2"))
         self.kwargs = kwargs
+        if response_cache is None:
+            response_cache = cache_enabled_by_env()
+        if response_cache is True:
+            response_cache = get_response_cache()
+        self.response_cache: Optional[ResponseCache] = response_cache or None
 
         # 自动检测provider或使用指定的provider
         requested_provider = (provider or "").lower() if provider else None
@@ -229,13 +293,23 @@ class HelloAgentsLLM:
             resolved_base_url = base_url or os.getenv("LLM_BASE_URL")
             return resolved_api_key, resolved_base_url
 
+    @property
+    def _client_key(self) -> _ClientKey:
+        return (self.provider, self.base_url, self.api_key, self.timeout, self.max_retries)
+
     def _create_client(self) -> OpenAI:
-        """创建OpenAI客户端"""
-        return OpenAI(
-            api_key=self.api_key,
-            base_url=self.base_url,
-            timeout=self.timeout
-        )
+        """获取OpenAI客户端（同一服务与凭据在进程内共享）"""
+        return get_shared_client(self._client_key)
+
+    @property
+    def _async_client(self) -> AsyncOpenAI:
+        return get_shared_async_client(self._client_key)
+
+    def _request_params(self, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        params = {k: v for k, v in kwargs.items() if k not in ['temperature', 'max_tokens']}
+        params["temperature"] = kwargs.get('temperature', self.temperature)
+        params["max_tokens"] = kwargs.get('max_tokens', self.max_tokens)
+        return params
     
     def _get_default_model(self) -> str:
         """获取默认模型"""
@@ -282,7 +356,12 @@ class HelloAgentsLLM:
             else:
                 return "gpt-3.5-turbo"
 
-    def think(self, messages: list[dict[str, str]], temperature: Optional[float] = None) -> Iterator[str]:
+    def think(
+        self,
+        messages: list[dict[str, str]],
+        temperature: Optional[float] = None,
+        timeout: Optional[float] = None
+    ) -> Iterator[str]:
         """
         调用大语言模型进行思考，并返回流式响应。
         这是主要的调用方法，默认使用流式响应以获得更好的用户体验。
@@ -290,11 +369,13 @@ class HelloAgentsLLM:
         Args:
             messages: 消息列表
             temperature: 温度参数，如果未提供则使用初始化时的值
+            timeout: 本次请求的超时（秒），如果未提供则使用客户端的超时
 
         Yields:
             str: 流式响应的文本片段
         """
         print(f"🧠 正在调用 {self.model} 模型...")
+        extra = {"timeout": timeout} if timeout is not None else {}
         try:
             response = self._client.chat.completions.create(
                 model=self.model,
@@ -302,6 +383,7 @@ class HelloAgentsLLM:
                 temperature=temperature if temperature is not None else self.temperature,
                 max_tokens=self.max_tokens,
                 stream=True,
+                **extra
             )
 
             # 处理流式响应
@@ -321,18 +403,136 @@ class HelloAgentsLLM:
         """
         非流式调用LLM，返回完整响应。
         适用于不需要流式输出的场景。
+        启用响应缓存时先查缓存；传入 use_cache=False 可跳过本次调用的缓存。
         """
+        cache = self.response_cache if kwargs.pop('use_cache', True) else None
+        params = self._request_params(kwargs)
+        if cache is not None:
+            cached = self._cache_lookup(cache, messages, params)
+            if cached is not None:
+                return cached
         try:
             response = self._client.chat.completions.create(
                 model=self.model,
                 messages=messages,
-                temperature=kwargs.get('temperature', self.temperature),
-                max_tokens=kwargs.get('max_tokens', self.max_tokens),
-                **{k: v for k, v in kwargs.items() if k not in ['temperature', 'max_tokens']}
+                **params
+            )
+            content = response.choices[0].message.content
+        except Exception as e:
+            raise HelloAgentsException(f"LLM调用失败: {str(e)}")
+        if cache is not None:
+            self._cache_store(cache, messages, params, content)
+        return content
+
+    async def ainvoke(self, messages: list[dict[str, str]], **kwargs) -> str:
+        """
+        异步非流式调用，基于 AsyncOpenAI。
+        同一事件循环内的并发调用共享一个客户端连接池；缓存行为与 invoke 相同。
+        """
+        cache = self.response_cache if kwargs.pop('use_cache', True) else None
+        params = self._request_params(kwargs)
+        # 缓存读写是同步的 SQLite 操作（语义层还可能调用远程嵌入），放到线程中执行，不阻塞事件循环
+        if cache is not None:
+            cached = await asyncio.to_thread(self._cache_lookup, cache, messages, params)
+            if cached is not None:
+                return cached
+        try:
+            response = await self._async_client.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                **params
             )
-            return response.choices[0].message.content
+            content = response.choices[0].message.content
         except Exception as e:
             raise HelloAgentsException(f"LLM调用失败: {str(e)}")
+        if cache is not None:
+            await asyncio.to_thread(self._cache_store, cache, messages, params, content)
+        return content
+
+    def _cache_lookup(self, cache: ResponseCache, messages: list[dict[str, str]], params: Dict[str, Any]) -> Optional[str]:
+        """查响应缓存；缓存出错（数据库被锁、嵌入失败等）时记录日志并按未命中处理"""
+        try:
+            return cache.lookup(self.model, messages, params)
+        except Exception as e:
+            logger.warning("响应缓存读取失败，直接调用模型: %s", e)
+            return None
+
+    def _cache_store(self, cache: ResponseCache, messages: list[dict[str, str]], params: Dict[str, Any], content: str) -> None:
+        """写响应缓存；失败时只记录日志，不影响已经拿到的结果"""
+        try:
+            cache.store(self.model, messages, params, content)
+        except Exception as e:
+            logger.warning("响应缓存写入失败: %s", e)
+
+    async def astream(self, messages: list[dict[str, str]], **kwargs) -> AsyncIterator[str]:
+        """
+        异步流式调用，逐段产出文本片段（不打印到控制台）。
+        """
+        try:
+            kwargs.pop('use_cache', None)
+            response = await self._async_client.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                stream=True,
+                **self._request_params(kwargs)
+            )
+            async for chunk in response:
+                if not chunk.choices:
+                    continue
+                content = chunk.choices[0].delta.content or ""
+                if content:
+                    yield content
+        except Exception as e:
+            raise HelloAgentsException(f"LLM调用失败: {str(e)}")
+
+    async def abatch_invoke(
+        self,
+        message_lists: List[list[dict[str, str]]],
+        max_concurrency: int = 8,
+        return_exceptions: bool = False,
+        **kwargs
+    ) -> List[Any]:
+        """
+        异步并发调用多组消息，最多 max_concurrency 个请求同时在途，结果与输入顺序一致。
+        return_exceptions=True 时失败项以异常对象占位，否则第一个失败会向上抛出。
+        """
+        semaphore = asyncio.Semaphore(max(1, max_concurrency))
+
+        async def run_one(messages):
+            async with semaphore:
+                return await self.ainvoke(messages, **kwargs)
+
+        return await asyncio.gather(
+            *(run_one(messages) for messages in message_lists),
+            return_exceptions=return_exceptions
+        )
+
+    def batch_invoke(
+        self,
+        message_lists: List[list[dict[str, str]]],
+        max_concurrency: int = 8,
+        return_exceptions: bool = False,
+        **kwargs
+    ) -> List[Any]:
+        """
+        同步接口的并发批量调用，可在任意线程（包括已有事件循环的线程）中使用。
+        请求复用共享客户端连接池，最多 max_concurrency 个同时在途，结果与输入顺序一致。
+        """
+        message_lists = list(message_lists)
+        if not message_lists:
+            return []
+
+        def run_one(messages):
+            try:
+                return self.invoke(messages, **kwargs)
+            except Exception as e:
+                if return_exceptions:
+                    return e
+                raise
+
+        workers = max(1, min(max_concurrency, len(message_lists)))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="llm-batch") as executor:
+            return list(executor.map(run_one, message_lists))
 
     def stream_invoke(self, messages: list[dict[str, str]], **kwargs) -> Iterator[str]:
         """
@@ -0,0 +1,312 @@
+"""LLM响应缓存
+
+为 HelloAgentsLLM.invoke/ainvoke 提供可选的两级响应缓存：
+- 精确层：键为 sha256(模型 + 完整消息 + 调用参数)
+- 语义层（可选，默认关闭）：消息前缀（除最后一条外的全部消息）、模型与参数完全一致时，
+  对最后一条消息做向量相似度匹配，超过阈值即视为命中（复用统一嵌入模型）。
+  只比较最后一条消息，模板化提示词（评委评分标准、RAG 问答等）仅有少量槽位不同时相似度
+  很容易超过阈值而返回另一个问题的答案，只应在最后一条消息为自由文本的场景开启
+
+存储在 SQLite（默认 ./memory_data/llm_cache.db），进程重启后仍然有效；
+按 TTL 过期、按 last_access 做 LRU 淘汰，并记录命中率指标。
+temperature > 0 的调用结果不确定，默认既不读也不写缓存，除非显式允许。
+
+环境变量：
+- LLM_RESPONSE_CACHE: 是否为默认构造的 HelloAgentsLLM 启用缓存（默认 0）
+- LLM_CACHE_PATH: 缓存数据库路径（默认 ./memory_data/llm_cache.db）
+- LLM_CACHE_MAX_ENTRIES: 最大条目数（默认 10000）
+- LLM_CACHE_TTL: 条目有效期（秒），0 表示不过期（默认 604800，即7天）
+- LLM_CACHE_SEMANTIC_THRESHOLD: 语义层余弦相似度阈值，0 表示关闭语义层（默认 0，建议开启时取 0.95 以上）
+- LLM_CACHE_ALLOW_NONDETERMINISTIC: 是否缓存 temperature > 0 的调用（默认 0）
+"""
+
+from typing import Any, Dict, List, Optional, Tuple, Union
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+
+# 只影响传输、不影响生成结果的参数，不参与缓存键
+_TRANSPORT_PARAMS = ("timeout", "extra_headers")
+
+# 嵌入失败后暂停语义层的退避时间（秒）：指数增长，成功一次后复位
+_EMBED_RETRY_BASE = 5.0
+_EMBED_RETRY_MAX = 300.0
+
+
+def _env_flag(name: str, default: str = "0") -> bool:
+    return os.getenv(name, default).strip().lower() in ("1", "true", "yes", "on")
+
+
+def _canonical(obj: Any) -> str:
+    return json.dumps(obj, ensure_ascii=False, sort_keys=True, default=str)
+
+
+def _sha256(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """SQLite 持久化的 LLM 响应缓存（精确 + 语义两级）"""
+
+    def __init__(
+        self,
+        db_path: str,
+        max_entries: int = 10000,
+        ttl_seconds: float = 7 * 86400,
+        semantic_threshold: float = 0.0,
+        allow_nondeterministic: bool = False,
+        embedder=None
+    ):
+        self.db_path = db_path
+        self.max_entries = max(1, int(max_entries))
+        self.ttl_seconds = float(ttl_seconds or 0)
+        self.semantic_threshold = float(semantic_threshold or 0)
+        self.allow_nondeterministic = allow_nondeterministic
+        self._embedder = embedder
+        self._embed_failures = 0
+        self._embed_retry_at = 0.0
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS llm_cache (
+                key TEXT PRIMARY KEY,
+                scope TEXT NOT NULL,
+                model TEXT NOT NULL,
+                response TEXT NOT NULL,
+                embedding BLOB,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_scope ON llm_cache(scope)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_access ON llm_cache(last_access)")
+        self._conn.commit()
+        self._count = self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+        # scope -> (keys, 归一化向量矩阵)，首次查询该 scope 时从库中加载
+        self._semantic_index: Dict[str, Tuple[List[str], np.ndarray]] = {}
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.skipped = 0
+        self.stores = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    # ---- keys ----
+
+    @staticmethod
+    def make_keys(model: str, messages: List[Dict[str, Any]], params: Dict[str, Any]) -> Tuple[str, str]:
+        """返回 (精确键, 语义scope)；scope 覆盖模型、参数和最后一条之前的全部消息"""
+        params = {k: v for k, v in params.items() if k not in _TRANSPORT_PARAMS}
+        key = _sha256(_canonical({"model": model, "messages": messages, "params": params}))
+        scope = _sha256(_canonical({"model": model, "prefix": messages[:-1], "params": params}))
+        return key, scope
+
+    def is_cacheable(self, params: Dict[str, Any]) -> bool:
+        if params.get("stream"):
+            return False
+        temperature = params.get("temperature")
+        return self.allow_nondeterministic or temperature is None or float(temperature) <= 0
+
+    # ---- lookup / store ----
+
+    def lookup(self, model: str, messages: List[Dict[str, Any]], params: Dict[str, Any]) -> Optional[str]:
+        """命中返回缓存的响应文本；不可缓存或未命中返回 None"""
+        if not messages or not self.is_cacheable(params):
+            with self._lock:
+                self.skipped += 1
+            return None
+        key, scope = self.make_keys(model, messages, params)
+        response = self._get_row(key)
+        if response is not None:
+            with self._lock:
+                self.exact_hits += 1
+            return response
+
+        if self.semantic_threshold > 0:
+            vec = self._embed_last(messages)
+            if vec is not None:
+                match = self._nearest(scope, vec)
+                if match is not None:
+                    response = self._get_row(match)
+                    if response is not None:
+                        with self._lock:
+                            self.semantic_hits += 1
+                        return response
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def store(self, model: str, messages: List[Dict[str, Any]], params: Dict[str, Any], response: Optional[str]) -> None:
+        if not messages or response is None or not self.is_cacheable(params):
+            return
+        key, scope = self.make_keys(model, messages, params)
+        vec = self._embed_last(messages) if self.semantic_threshold > 0 else None
+        now = time.time()
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+            existed = self._conn.total_changes - before
+            self._conn.execute(
+                "INSERT INTO llm_cache (key, scope, model, response, embedding, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, scope, model, response, vec.tobytes() if vec is not None else None, now, now)
+            )
+            self._count += 1 - existed
+            self.stores += 1
+            if vec is not None and scope in self._semantic_index and not existed:
+                keys, mat = self._semantic_index[scope]
+                self._semantic_index[scope] = (keys + [key], np.vstack([mat, vec[None, :]]))
+            if self._count > self.max_entries:
+                self._evict_locked()
+            self._conn.commit()
+
+    # ---- internals ----
+
+    def _get_row(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, created_at, scope FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            response, created_at, scope = row
+            now = time.time()
+            if self.ttl_seconds and now - created_at > self.ttl_seconds:
+                self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                self._conn.commit()
+                self._count -= 1
+                self.expirations += 1
+                self._semantic_index.pop(scope, None)
+                return None
+            self._conn.execute("UPDATE llm_cache SET last_access = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            return response
+
+    def _nearest(self, scope: str, vec: np.ndarray) -> Optional[str]:
+        with self._lock:
+            index = self._semantic_index.get(scope)
+            if index is None:
+                rows = self._conn.execute(
+                    "SELECT key, embedding FROM llm_cache WHERE scope = ? AND embedding IS NOT NULL", (scope,)
+                ).fetchall()
+                keys = [k for k, blob in rows if len(blob) == vec.nbytes]
+                mat = (
+                    np.vstack([np.frombuffer(blob, dtype=np.float32) for _, blob in rows if len(blob) == vec.nbytes])
+                    if keys else np.zeros((0, vec.shape[0]), dtype=np.float32)
+                )
+                index = (keys, mat)
+                self._semantic_index[scope] = index
+        keys, mat = index
+        if not keys or mat.shape[1] != vec.shape[0]:
+            return None
+        sims = mat @ vec
+        best = int(np.argmax(sims))
+        return keys[best] if float(sims[best]) >= self.semantic_threshold else None
+
+    def _embed_last(self, messages: List[Dict[str, Any]]) -> Optional[np.ndarray]:
+        if time.time() < self._embed_retry_at:
+            return None
+        content = messages[-1].get("content")
+        if not isinstance(content, str) or not content.strip():
+            return None
+        try:
+            if self._embedder is None:
+                from ..memory.embedding import get_text_embedder
+                self._embedder = get_text_embedder()
+            from ..memory.embedding import embed_query_memoized
+            vec = np.asarray(embed_query_memoized(content, self._embedder), dtype=np.float32).reshape(-1)
+        except Exception:
+            # 嵌入暂时不可用：退避期内只用精确层，之后再重试
+            with self._lock:
+                self._embed_failures += 1
+                delay = min(_EMBED_RETRY_MAX, _EMBED_RETRY_BASE * 2 ** (self._embed_failures - 1))
+                self._embed_retry_at = time.time() + delay
+            return None
+        if self._embed_failures:
+            with self._lock:
+                self._embed_failures = 0
+                self._embed_retry_at = 0.0
+        norm = float(np.linalg.norm(vec))
+        return vec / norm if norm > 0 else None
+
+    def _evict_locked(self) -> None:
+        # 先清理过期条目，再按最近访问时间淘汰到容量的90%
+        before = self._conn.total_changes
+        if self.ttl_seconds:
+            self._conn.execute("DELETE FROM llm_cache WHERE created_at < ?", (time.time() - self.ttl_seconds,))
+        expired = self._conn.total_changes - before
+        self._count -= expired
+        self.expirations += expired
+        excess = self._count - int(self.max_entries * 0.9)
+        if excess > 0:
+            before = self._conn.total_changes
+            self._conn.execute(
+                "DELETE FROM llm_cache WHERE key IN ("
+                "SELECT key FROM llm_cache ORDER BY last_access ASC LIMIT ?)",
+                (excess,)
+            )
+            removed = self._conn.total_changes - before
+            self._count -= removed
+            self.evictions += removed
+        self._semantic_index.clear()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_cache")
+            self._conn.commit()
+            self._count = 0
+            self._semantic_index.clear()
+
+    def stats(self) -> Dict[str, Union[int, float, str]]:
+        hits = self.exact_hits + self.semantic_hits
+        total = hits + self.misses
+        return {
+            "db_path": self.db_path,
+            "entries": self._count,
+            "max_entries": self.max_entries,
+            "exact_hits": self.exact_hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "skipped": self.skipped,
+            "stores": self.stores,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_rate": round(hits / total, 4) if total else 0.0,
+        }
+
+
+_cache_lock = threading.Lock()
+_caches: Dict[str, ResponseCache] = {}
+
+
+def get_response_cache(db_path: Optional[str] = None) -> ResponseCache:
+    """按路径共享的响应缓存实例（参数取自环境变量）"""
+    path = os.path.abspath(db_path or os.getenv("LLM_CACHE_PATH", os.path.join("memory_data", "llm_cache.db")))
+    with _cache_lock:
+        if path not in _caches:
+            _caches[path] = ResponseCache(
+                path,
+                max_entries=int(os.getenv("LLM_CACHE_MAX_ENTRIES", "10000")),
+                ttl_seconds=float(os.getenv("LLM_CACHE_TTL", str(7 * 86400))),
+                semantic_threshold=float(os.getenv("LLM_CACHE_SEMANTIC_THRESHOLD", "0")),
+                allow_nondeterministic=_env_flag("LLM_CACHE_ALLOW_NONDETERMINISTIC"),
+            )
+        return _caches[path]
+
+
+def cache_enabled_by_env() -> bool:
+    return _env_flag("LLM_RESPONSE_CACHE")
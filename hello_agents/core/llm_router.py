@@ -0,0 +1,335 @@
+"""多提供商路由LLM
+
+RoutedLLM 接收多个端点配置（每个对应一个 HelloAgentsLLM），每次请求按实时指标选择端点：
+- p50 延迟（最近若干次成功调用；流式调用记录首个片段的到达时间）
+- 错误率（最近若干次调用）
+- 每分钟 token 预算（tpm_limit，滑动60秒窗口，按字符数估算 token）
+
+失败时在总截止时间（deadline）内依次切换到下一个端点；连续失败的端点进入冷却期。
+think/stream_invoke/astream 只在尚未产出任何片段前切换端点，已开始输出后的错误直接抛出。
+
+用法：
+```python
+llm = RoutedLLM([
+    {"provider": "modelscope", "model": "Qwen/Qwen2.5-72B-Instruct", "tpm_limit": 100000},
+    {"provider": "qwen", "model": "qwen-plus"},
+    {"provider": "deepseek", "model": "deepseek-chat"},
+], deadline=60)
+llm.invoke([{"role": "user", "content": "你好"}])
+```
+"""
+
+from collections import deque
+from typing import Any, AsyncIterator, Deque, Dict, Iterator, List, Optional, Tuple, Union
+import os
+import threading
+import time
+
+from .exceptions import HelloAgentsException
+from .llm import HelloAgentsLLM
+
+
+def _estimate_tokens(text: str) -> int:
+    """粗略估算token数（中英文混合约每3个字符一个token）"""
+    return max(1, len(text) // 3)
+
+
+def _messages_tokens(messages: List[Dict[str, Any]]) -> int:
+    return sum(_estimate_tokens(str(m.get("content") or "")) for m in messages)
+
+
+class EndpointStats:
+    """单个端点的滑动窗口指标"""
+
+    def __init__(self, window: int = 50, tpm_limit: Optional[int] = None):
+        self.latencies: Deque[float] = deque(maxlen=window)
+        self.outcomes: Deque[bool] = deque(maxlen=window)
+        self.token_log: Deque[Tuple[float, int]] = deque()
+        self.tpm_limit = tpm_limit
+        self.consecutive_failures = 0
+        self.cooldown_until = 0.0
+        self.in_flight = 0
+
+    def p50(self) -> float:
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        return ordered[len(ordered) // 2]
+
+    def error_rate(self) -> float:
+        if not self.outcomes:
+            return 0.0
+        return sum(1 for ok in self.outcomes if not ok) / len(self.outcomes)
+
+    def tokens_last_minute(self, now: float) -> int:
+        while self.token_log and now - self.token_log[0][0] > 60.0:
+            self.token_log.popleft()
+        return sum(n for _, n in self.token_log)
+
+    def headroom(self, now: float, tokens: int) -> float:
+        """剩余TPM预算比例（0~1）；本次请求放不下时为0"""
+        if not self.tpm_limit:
+            return 1.0
+        remaining = self.tpm_limit - self.tokens_last_minute(now)
+        if remaining < tokens:
+            return 0.0
+        return remaining / self.tpm_limit
+
+
+class RoutedLLM(HelloAgentsLLM):
+    """在多个 OpenAI 兼容端点之间做负载均衡与故障转移的 HelloAgentsLLM"""
+
+    def __init__(
+        self,
+        endpoints: List[Union[Dict[str, Any], HelloAgentsLLM]],
+        deadline: Optional[float] = None,
+        failure_threshold: int = 3,
+        cooldown: float = 30.0,
+        window: int = 50
+    ):
+        """
+        Args:
+            endpoints: 端点列表；字典项为 HelloAgentsLLM 的构造参数，可额外包含 tpm_limit。
+                字典配置的端点默认 max_retries=0，失败直接交给路由切换端点
+            deadline: 单次请求（含故障转移）的总时限（秒），默认取 LLM_ROUTER_DEADLINE 或 120
+            failure_threshold: 连续失败多少次后进入冷却
+            cooldown: 冷却时长（秒），冷却中的端点只在其他端点都不可用时才会被尝试
+            window: 延迟/错误率统计的滑动窗口大小
+        """
+        if not endpoints:
+            raise HelloAgentsException("RoutedLLM 至少需要一个端点配置")
+        self.endpoints: List[HelloAgentsLLM] = []
+        self._stats: List[EndpointStats] = []
+        for endpoint in endpoints:
+            tpm_limit = None
+            if isinstance(endpoint, dict):
+                config = dict(endpoint)
+                tpm_limit = config.pop("tpm_limit", None)
+                config.setdefault("max_retries", 0)
+                endpoint = HelloAgentsLLM(**config)
+            self.endpoints.append(endpoint)
+            self._stats.append(EndpointStats(window=window, tpm_limit=tpm_limit))
+        self.deadline = float(deadline or os.getenv("LLM_ROUTER_DEADLINE", "120"))
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self._lock = threading.Lock()
+
+        # 与 HelloAgentsLLM 保持相同的公开属性（取首个端点），便于直接替换
+        primary = self.endpoints[0]
+        self.model = primary.model
+        self.provider = "router"
+        self.api_key = primary.api_key
+        self.base_url = primary.base_url
+        self.temperature = primary.temperature
+        self.max_tokens = primary.max_tokens
+        self.timeout = primary.timeout
+        self.max_retries = primary.max_retries
+        self.kwargs = {}
+        self.response_cache = None
+        self._client = primary._client
+
+    # ---- routing ----
+
+    def _ranked(self, tokens: int) -> List[int]:
+        """按代价排序的端点下标：p50 × (1 + 4×错误率) ÷ 剩余预算 + 错误率惩罚；冷却中/预算不足的排在最后"""
+        now = time.time()
+        ranked = []
+        with self._lock:
+            for i, stats in enumerate(self._stats):
+                if stats.cooldown_until and stats.cooldown_until <= now:
+                    # 冷却结束：清空历史错误，让端点重新参与探测
+                    stats.cooldown_until = 0.0
+                    stats.consecutive_failures = 0
+                    stats.outcomes.clear()
+                headroom = stats.headroom(now, tokens)
+                unavailable = stats.cooldown_until > now or headroom <= 0
+                # 尚无成功样本的端点延迟按0计，优先获得探测流量；失败过的端点另加错误率惩罚；
+                # 在途请求数用于打破平局
+                error_rate = stats.error_rate()
+                cost = stats.p50() * (1 + 4 * error_rate) / max(headroom, 0.1) + error_rate * self.timeout
+                ranked.append((unavailable, cost, stats.in_flight, i))
+        ranked.sort()
+        return [i for *_, i in ranked]
+
+    def _begin(self, i: int) -> None:
+        with self._lock:
+            self._stats[i].in_flight += 1
+
+    def _record(self, i: int, ok: bool, latency: Optional[float] = None, tokens: int = 0) -> None:
+        now = time.time()
+        with self._lock:
+            stats = self._stats[i]
+            stats.in_flight = max(0, stats.in_flight - 1)
+            stats.outcomes.append(ok)
+            if ok:
+                stats.consecutive_failures = 0
+                if latency is not None:
+                    stats.latencies.append(latency)
+            else:
+                stats.consecutive_failures += 1
+                if stats.consecutive_failures >= self.failure_threshold:
+                    stats.cooldown_until = now + self.cooldown
+            if tokens:
+                stats.token_log.append((now, tokens))
+
+    def _remaining(self, started: float) -> float:
+        return self.deadline - (time.time() - started)
+
+    @staticmethod
+    def _call_timeout(endpoint: HelloAgentsLLM, remaining: float, timeout: Optional[float]) -> float:
+        """单次端点调用的超时：端点超时、剩余截止时间与调用方传入的 timeout 取最小"""
+        limit = min(endpoint.timeout, remaining)
+        return limit if timeout is None else min(limit, timeout)
+
+    def _exhausted(self, errors: List[str]) -> HelloAgentsException:
+        return HelloAgentsException("所有LLM端点均调用失败: " + "; ".join(errors))
+
+    # ---- sync API ----
+
+    def invoke(self, messages: list[dict[str, str]], **kwargs) -> str:
+        started = time.time()
+        timeout = kwargs.pop("timeout", None)
+        prompt_tokens = _messages_tokens(messages)
+        errors = []
+        for i in self._ranked(prompt_tokens):
+            remaining = self._remaining(started)
+            if remaining <= 0:
+                errors.append("超过截止时间")
+                break
+            endpoint = self.endpoints[i]
+            self._begin(i)
+            t0 = time.time()
+            try:
+                content = endpoint.invoke(messages, timeout=self._call_timeout(endpoint, remaining, timeout), **kwargs)
+            except Exception as e:
+                self._record(i, ok=False)
+                errors.append(f"{endpoint.provider}/{endpoint.model}: {e}")
+                continue
+            self._record(i, ok=True, latency=time.time() - t0,
+                         tokens=prompt_tokens + _estimate_tokens(content or ""))
+            return content
+        raise self._exhausted(errors)
+
+    def think(
+        self,
+        messages: list[dict[str, str]],
+        temperature: Optional[float] = None,
+        timeout: Optional[float] = None
+    ) -> Iterator[str]:
+        started = time.time()
+        prompt_tokens = _messages_tokens(messages)
+        errors = []
+        for i in self._ranked(prompt_tokens):
+            remaining = self._remaining(started)
+            if remaining <= 0:
+                errors.append("超过截止时间")
+                break
+            endpoint = self.endpoints[i]
+            self._begin(i)
+            t0 = time.time()
+            first_chunk_at = None
+            produced = 0
+            try:
+                for chunk in endpoint.think(messages, temperature, timeout=self._call_timeout(endpoint, remaining, timeout)):
+                    if first_chunk_at is None:
+                        first_chunk_at = time.time()
+                    produced += len(chunk)
+                    yield chunk
+            except GeneratorExit:
+                # 调用方提前结束消费：按成功计入，释放在途计数
+                self._record(i, ok=True, latency=(first_chunk_at or time.time()) - t0)
+                raise
+            except Exception as e:
+                self._record(i, ok=False)
+                if first_chunk_at is not None:
+                    # 已经向调用方输出了部分内容，无法透明地切换端点
+                    raise
+                errors.append(f"{endpoint.provider}/{endpoint.model}: {e}")
+                continue
+            latency = (first_chunk_at or time.time()) - t0
+            self._record(i, ok=True, latency=latency, tokens=prompt_tokens + max(1, produced // 3))
+            return
+        raise self._exhausted(errors)
+
+    # ---- async API ----
+
+    async def ainvoke(self, messages: list[dict[str, str]], **kwargs) -> str:
+        started = time.time()
+        timeout = kwargs.pop("timeout", None)
+        prompt_tokens = _messages_tokens(messages)
+        errors = []
+        for i in self._ranked(prompt_tokens):
+            remaining = self._remaining(started)
+            if remaining <= 0:
+                errors.append("超过截止时间")
+                break
+            endpoint = self.endpoints[i]
+            self._begin(i)
+            t0 = time.time()
+            try:
+                content = await endpoint.ainvoke(messages, timeout=self._call_timeout(endpoint, remaining, timeout), **kwargs)
+            except Exception as e:
+                self._record(i, ok=False)
+                errors.append(f"{endpoint.provider}/{endpoint.model}: {e}")
+                continue
+            self._record(i, ok=True, latency=time.time() - t0,
+                         tokens=prompt_tokens + _estimate_tokens(content or ""))
+            return content
+        raise self._exhausted(errors)
+
+    async def astream(self, messages: list[dict[str, str]], **kwargs) -> AsyncIterator[str]:
+        started = time.time()
+        timeout = kwargs.pop("timeout", None)
+        prompt_tokens = _messages_tokens(messages)
+        errors = []
+        for i in self._ranked(prompt_tokens):
+            remaining = self._remaining(started)
+            if remaining <= 0:
+                errors.append("超过截止时间")
+                break
+            endpoint = self.endpoints[i]
+            self._begin(i)
+            t0 = time.time()
+            first_chunk_at = None
+            produced = 0
+            try:
+                async for chunk in endpoint.astream(messages, timeout=self._call_timeout(endpoint, remaining, timeout), **kwargs):
+                    if first_chunk_at is None:
+                        first_chunk_at = time.time()
+                    produced += len(chunk)
+                    yield chunk
+            except GeneratorExit:
+                # 调用方提前结束消费：按成功计入，释放在途计数
+                self._record(i, ok=True, latency=(first_chunk_at or time.time()) - t0)
+                raise
+            except Exception as e:
+                self._record(i, ok=False)
+                if first_chunk_at is not None:
+                    raise
+                errors.append(f"{endpoint.provider}/{endpoint.model}: {e}")
+                continue
+            latency = (first_chunk_at or time.time()) - t0
+            self._record(i, ok=True, latency=latency, tokens=prompt_tokens + max(1, produced // 3))
+            return
+        raise self._exhausted(errors)
+
+    # ---- observability ----
+
+    def get_stats(self) -> List[Dict[str, Any]]:
+        """各端点的实时路由指标"""
+        now = time.time()
+        with self._lock:
+            return [
+                {
+                    "provider": endpoint.provider,
+                    "model": endpoint.model,
+                    "base_url": endpoint.base_url,
+                    "p50_latency": round(stats.p50(), 3),
+                    "error_rate": round(stats.error_rate(), 3),
+                    "tokens_last_minute": stats.tokens_last_minute(now),
+                    "tpm_limit": stats.tpm_limit,
+                    "in_flight": stats.in_flight,
+                    "cooling_down": stats.cooldown_until > now,
+                }
+                for endpoint, stats in zip(self.endpoints, self._stats)
+            ]
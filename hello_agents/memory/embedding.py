@@ -4,16 +4,34 @@
 - 提供统一的文本嵌入接口与多实现：本地Transformer、DashScope（通义千问）、TF-IDF兜底。
 - 暴露 get_text_embedder()/get_dimension()/refresh_embedder() 供各记忆类型统一使用。
 - 通过环境变量优先级：dashscope > local > tfidf。
+- 提供器返回的实例外包一层持久化嵌入缓存（SQLite，按 模型+内容哈希 寻址，LRU淘汰）。
+- BatchEmbeddingEngine：大批量文本的并发嵌入（令牌桶限流 + 指数退避重试，结果保持原顺序）。
+- encode(texts, as_array=True) 返回连续的 float32 矩阵 (n, d)，批量路径全程不拆成 Python 浮点列表。
+- query_embedding_scope()：请求级查询向量备忘录，作用域内（如一次上下文构建/一次Agent轮次）
+  相同查询字符串只嵌入一次，embed_query_memoized()/embed_queries_memoized() 读写该备忘录。
 
 环境变量：
 - EMBED_MODEL_TYPE: "dashscope" | "local" | "tfidf"（默认 dashscope）
 - EMBED_MODEL_NAME: 模型名称（dashscope默认 text-embedding-v3；local默认 sentence-transformers/all-MiniLM-L6-v2）
 - EMBED_API_KEY: Embedding API Key（统一命名）
 - EMBED_BASE_URL: Embedding Base URL（统一命名，可选）
+- EMBED_CACHE: 是否启用嵌入缓存（默认 1，设为 0 关闭）
+- EMBED_CACHE_PATH: 缓存数据库路径（默认 ./memory_data/embedding_cache.db）
+- EMBED_CACHE_MAX_ENTRIES: 缓存最大条目数，超出后按最近访问时间淘汰（默认 200000）
+- EMBED_MAX_CONCURRENCY: 远程嵌入的最大并发批次数（默认 4）
+- EMBED_RATE_LIMIT_RPS: 远程嵌入每秒请求数上限，0 表示不限流（默认 10）
+- EMBED_MAX_RETRIES: 单批次最大重试次数（默认 4）
 """
 
-from typing import List, Union, Optional
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterator, List, Tuple, Union, Optional
+import hashlib
+import random
+import sqlite3
 import threading
+import time
 import os
 import numpy as np
 
@@ -22,10 +40,35 @@ import numpy as np
 # 抽象与实现
 # ==============
 
+def as_matrix(vecs) -> np.ndarray:
+    """将向量或向量序列整理为连续的 float32 矩阵 (n, d)（已满足要求时不复制）"""
+    mat = np.asarray(vecs, dtype=np.float32)
+    if mat.ndim == 1:
+        mat = mat.reshape(1, -1)
+    return np.ascontiguousarray(mat)
+
+
+def fit_dimension(mat: np.ndarray, dimension: int) -> np.ndarray:
+    """按目标维度截断或零填充矩阵的列（维度一致时原样返回）"""
+    if mat.shape[1] == dimension:
+        return mat
+    out = np.zeros((mat.shape[0], dimension), dtype=np.float32)
+    width = min(dimension, mat.shape[1])
+    out[:, :width] = mat[:, :width]
+    return out
+
+
 class EmbeddingModel:
-    """嵌入模型基类（最小接口）"""
+    """嵌入模型基类（最小接口）
+
+    encode 默认返回单个向量（str 输入）或向量列表（list 输入）；
+    as_array=True 时统一返回 float32 矩阵 (n, d)，str 输入视为 n=1。
+    """
 
-    def encode(self, texts: Union[str, List[str]]):
+    # 远程模型受网络延迟主导，适合并发批量请求；本地模型并发无收益
+    is_remote = False
+
+    def encode(self, texts: Union[str, List[str]], as_array: bool = False):
         raise NotImplementedError
 
     @property
@@ -76,7 +119,7 @@ class LocalTransformerEmbedding(EmbeddingModel):
 
         raise ImportError("未找到可用的本地嵌入后端，请安装 sentence-transformers 或 transformers+torch")
 
-    def encode(self, texts: Union[str, List[str]]):
+    def encode(self, texts: Union[str, List[str]], as_array: bool = False):
         if isinstance(texts, str):
             inputs = [texts]
             single = True
@@ -86,6 +129,8 @@ class LocalTransformerEmbedding(EmbeddingModel):
 
         if self._backend == "st":
             vecs = self._st_model.encode(inputs)
+            if as_array:
+                return as_matrix(vecs)
             if hasattr(vecs, "tolist"):
                 vecs = [v for v in vecs]
         else:
@@ -94,6 +139,8 @@ class LocalTransformerEmbedding(EmbeddingModel):
             with torch.no_grad():
                 outputs = self._hf_model(**tokenized)
                 embeddings = outputs.last_hidden_state.mean(dim=1).cpu().numpy()
+            if as_array:
+                return as_matrix(embeddings)
             vecs = [v for v in embeddings]
 
         if single:
@@ -127,7 +174,7 @@ class TFIDFEmbedding(EmbeddingModel):
         self._is_fitted = True
         self._dimension = len(self._vectorizer.get_feature_names_out())
 
-    def encode(self, texts: Union[str, List[str]]):
+    def encode(self, texts: Union[str, List[str]], as_array: bool = False):
         if not self._is_fitted:
             raise ValueError("TF-IDF模型未训练，请先调用fit()方法")
         if isinstance(texts, str):
@@ -136,6 +183,8 @@ class TFIDFEmbedding(EmbeddingModel):
         else:
             single = False
         tfidf_matrix = self._vectorizer.transform(texts)
+        if as_array:
+            return tfidf_matrix.toarray().astype(np.float32)
         embeddings = tfidf_matrix.toarray()
         if single:
             return embeddings[0]
@@ -152,13 +201,18 @@ class DashScopeEmbedding(EmbeddingModel):
     行为：
     - 如提供 base_url，则优先使用 OpenAI 兼容的 REST 接口（POST {base_url}/embeddings）。
     - 否则使用官方 dashscope SDK 的 TextEmbedding.call。
+    - REST 模式复用带连接池的 requests.Session，避免每个批次重新建连。
     """
 
+    is_remote = True
+
     def __init__(self, model_name: str = "text-embedding-v3", api_key: Optional[str] = None, base_url: Optional[str] = None):
         self.model_name = model_name
         self.api_key = api_key
         self.base_url = base_url
         self._dimension = None
+        self._session = None
+        self._session_lock = threading.Lock()
         # 仅在非REST情况下初始化SDK
         if not self.base_url:
             self._init_client()
@@ -175,7 +229,22 @@ class DashScopeEmbedding(EmbeddingModel):
         except ImportError:
             raise ImportError("请安装 dashscope: pip install dashscope")
 
-    def encode(self, texts: Union[str, List[str]]):
+    def _get_session(self):
+        """惰性创建共享的 HTTP 会话（连接池大小与并发度匹配）"""
+        if self._session is None:
+            with self._session_lock:
+                if self._session is None:
+                    import requests
+                    from requests.adapters import HTTPAdapter
+                    pool_size = max(4, _env_int("EMBED_MAX_CONCURRENCY", 4) * 2)
+                    session = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+                    session.mount("http://", adapter)
+                    session.mount("https://", adapter)
+                    self._session = session
+        return self._session
+
+    def encode(self, texts: Union[str, List[str]], as_array: bool = False):
         if isinstance(texts, str):
             inputs = [texts]
             single = True
@@ -185,19 +254,20 @@ class DashScopeEmbedding(EmbeddingModel):
 
         # REST 模式（OpenAI兼容）
         if self.base_url:
-            import requests
             url = self.base_url.rstrip("/") + "/embeddings"
             headers = {
                 "Authorization": f"Bearer {self.api_key}" if self.api_key else "",
                 "Content-Type": "application/json",
             }
             payload = {"model": self.model_name, "input": inputs}
-            resp = requests.post(url, headers=headers, json=payload, timeout=30)
+            resp = self._get_session().post(url, headers=headers, json=payload, timeout=30)
             if resp.status_code >= 400:
                 raise RuntimeError(f"Embedding REST 调用失败: {resp.status_code} {resp.text}")
             data = resp.json()
             # 期望结构：{"data": [{"embedding": [...]}]}
             items = data.get("data") or []
+            if as_array:
+                return as_matrix([item.get("embedding") for item in items])
             vecs = [np.array(item.get("embedding")) for item in items]
             if single:
                 return vecs[0]
@@ -213,6 +283,8 @@ class DashScopeEmbedding(EmbeddingModel):
             embeddings_obj = getattr(getattr(rsp, "output", None), "embeddings", None)
         if not embeddings_obj:
             raise RuntimeError("DashScope 返回为空或格式不匹配")
+        if as_array:
+            return as_matrix([item.get("embedding") or item.get("vector") for item in embeddings_obj])
         vecs = [np.array(item.get("embedding") or item.get("vector")) for item in embeddings_obj]
         if single:
             return vecs[0]
@@ -223,6 +295,476 @@ class DashScopeEmbedding(EmbeddingModel):
         return int(self._dimension or 0)
 
 
+# ==============
+# 持久化嵌入缓存
+# ==============
+
+class EmbeddingCache:
+    """SQLite 嵌入缓存
+
+    - 键：sha256(模型标识 + 文本)，同一内容在不同模型下互不干扰
+    - 值：float32 向量的原始字节
+    - 淘汰：条目数超过 max_entries 时按 last_access 删除最旧的一批（LRU）
+    """
+
+    _CHUNK = 500  # 单条 IN (...) 查询的最大参数数量
+
+    def __init__(self, db_path: str, max_entries: int = 200000):
+        self.db_path = db_path
+        self.max_entries = max(1, int(max_entries))
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embedding_cache (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                dim INTEGER NOT NULL,
+                vector BLOB NOT NULL,
+                last_access REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_embedding_cache_access ON embedding_cache(last_access)"
+        )
+        self._conn.commit()
+        self._count = self._conn.execute("SELECT COUNT(*) FROM embedding_cache").fetchone()[0]
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(model: str, text: str) -> str:
+        return hashlib.sha256(f"{model}\x00{text}".encode("utf-8")).hexdigest()
+
+    def get_many(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        """批量读取，命中的条目同时刷新访问时间"""
+        found: Dict[str, np.ndarray] = {}
+        uniq = list(dict.fromkeys(keys))
+        if not uniq:
+            return found
+        with self._lock:
+            for i in range(0, len(uniq), self._CHUNK):
+                part = uniq[i:i + self._CHUNK]
+                marks = ",".join("?" * len(part))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embedding_cache WHERE key IN ({marks})", part
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32)
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embedding_cache SET last_access = ? WHERE key = ?",
+                    [(now, k) for k in found]
+                )
+                self._conn.commit()
+            self.hits += sum(1 for k in keys if k in found)
+            self.misses += sum(1 for k in keys if k not in found)
+        return found
+
+    def put_many(self, model: str, items: Dict[str, np.ndarray]) -> None:
+        """批量写入，写入后按需淘汰"""
+        if not items:
+            return
+        now = time.time()
+        rows = []
+        for key, vec in items.items():
+            arr = np.ascontiguousarray(vec, dtype=np.float32).reshape(-1)
+            rows.append((key, model, int(arr.shape[0]), arr.tobytes(), now))
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO embedding_cache (key, model, dim, vector, last_access) VALUES (?, ?, ?, ?, ?)",
+                rows
+            )
+            self._count += self._conn.total_changes - before
+            if self._count > self.max_entries:
+                self._evict_locked()
+            self._conn.commit()
+
+    def _evict_locked(self) -> None:
+        # 一次淘汰到容量的90%，避免每次写入都触发删除
+        target = int(self.max_entries * 0.9)
+        excess = self._count - target
+        if excess <= 0:
+            return
+        before = self._conn.total_changes
+        self._conn.execute(
+            "DELETE FROM embedding_cache WHERE key IN ("
+            "SELECT key FROM embedding_cache ORDER BY last_access ASC LIMIT ?)",
+            (excess,)
+        )
+        removed = self._conn.total_changes - before
+        self._count -= removed
+        self.evictions += removed
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM embedding_cache")
+            self._conn.commit()
+            self._count = 0
+
+    def stats(self) -> Dict[str, Union[int, float, str]]:
+        total = self.hits + self.misses
+        return {
+            "db_path": self.db_path,
+            "entries": self._count,
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": (self.hits / total) if total else 0.0,
+        }
+
+
+def encode_as_matrix(model: EmbeddingModel, texts: List[str]) -> np.ndarray:
+    """以矩阵形式编码；兼容未实现 as_array 参数的自定义模型"""
+    try:
+        return as_matrix(model.encode(texts, as_array=True))
+    except TypeError:
+        return as_matrix(model.encode(texts))
+
+
+# ==================
+# 请求级查询向量备忘录
+# ==================
+
+# (模型标识, 查询文本) -> 向量；仅在 query_embedding_scope 内存在。
+# 提交到线程池的任务需通过 contextvars.copy_context().run 继承当前作用域。
+_query_memo: ContextVar[Optional[Dict[Tuple[int, str], np.ndarray]]] = ContextVar("query_embedding_memo", default=None)
+
+
+@contextmanager
+def query_embedding_scope() -> Iterator[None]:
+    """开启请求级查询向量备忘录；嵌套调用复用最外层作用域，退出时丢弃"""
+    if _query_memo.get() is not None:
+        yield
+        return
+    token = _query_memo.set({})
+    try:
+        yield
+    finally:
+        _query_memo.reset(token)
+
+
+def embed_queries_memoized(queries: List[str], model: Optional["EmbeddingModel"] = None) -> np.ndarray:
+    """批量嵌入查询 (n, d)；在 query_embedding_scope 内时，本轮已嵌入过的字符串直接复用"""
+    model = model or get_text_embedder()
+    queries = list(queries)
+    memo = _query_memo.get()
+    if memo is None or not queries:
+        return encode_as_matrix(model, queries)
+    model_key = id(getattr(model, "inner", model))
+    missing = list(dict.fromkeys(q for q in queries if (model_key, q) not in memo))
+    if missing:
+        mat = encode_as_matrix(model, missing)
+        for q, vec in zip(missing, mat):
+            memo[(model_key, q)] = vec
+    return np.stack([memo[(model_key, q)] for q in queries])
+
+
+def embed_query_memoized(query: str, model: Optional["EmbeddingModel"] = None) -> np.ndarray:
+    """嵌入单条查询，返回 float32 向量 (d,)"""
+    return embed_queries_memoized([query], model)[0]
+
+
+class CachedEmbedding(EmbeddingModel):
+    """为任意 EmbeddingModel 增加持久化缓存
+
+    仅对未命中的文本调用底层模型（同一批内重复文本只计算一次），
+    返回结构与底层模型一致：单条输入返回单个向量，列表输入返回向量列表。
+    """
+
+    def __init__(self, inner: EmbeddingModel, cache: EmbeddingCache):
+        self.inner = inner
+        self.cache = cache
+        self.model_name = getattr(inner, "model_name", None)
+        self._cache_model = f"{type(inner).__name__}:{self.model_name or 'default'}"
+
+    def encode(self, texts: Union[str, List[str]], as_array: bool = False):
+        if isinstance(texts, str):
+            inputs = [texts]
+            single = True
+        else:
+            inputs = list(texts)
+            single = False
+
+        keys = [EmbeddingCache.make_key(self._cache_model, t) for t in inputs]
+        vectors = self.cache.get_many(keys)
+
+        # 未命中的文本去重后一次性计算
+        pending: Dict[str, str] = {}
+        for key, text in zip(keys, inputs):
+            if key not in vectors and key not in pending:
+                pending[key] = text
+        if pending:
+            computed = encode_as_matrix(self.inner, list(pending.values()))
+            fresh = dict(zip(pending.keys(), computed))
+            self.cache.put_many(self._cache_model, fresh)
+            vectors.update(fresh)
+
+        if as_array:
+            return np.stack([vectors[k] for k in keys]) if keys else np.zeros((0, self.dimension), dtype=np.float32)
+        vecs = [vectors[k] for k in keys]
+        if single:
+            return vecs[0]
+        return vecs
+
+    @property
+    def dimension(self) -> int:
+        return self.inner.dimension
+
+    @property
+    def is_remote(self) -> bool:
+        return bool(getattr(self.inner, "is_remote", False))
+
+    def lookup(self, texts: List[str]) -> Tuple[List[Optional[np.ndarray]], List[int]]:
+        """只查缓存：返回 (按位置的向量或None, 未命中位置列表)"""
+        keys = [EmbeddingCache.make_key(self._cache_model, t) for t in texts]
+        found = self.cache.get_many(keys)
+        vecs = [found.get(k) for k in keys]
+        missing = [i for i, v in enumerate(vecs) if v is None]
+        return vecs, missing
+
+    def remember(self, texts: List[str], vectors: np.ndarray) -> None:
+        """将外部计算好的向量（矩阵的行）写入缓存"""
+        items = {
+            EmbeddingCache.make_key(self._cache_model, t): v
+            for t, v in zip(texts, vectors)
+        }
+        self.cache.put_many(self._cache_model, items)
+
+    def cache_stats(self) -> Dict[str, Union[int, float, str]]:
+        return self.cache.stats()
+
+    def __getattr__(self, name):
+        # 透传底层模型的其他能力（如 TFIDFEmbedding.fit）
+        inner = self.__dict__.get("inner")
+        if inner is None:
+            raise AttributeError(name)
+        return getattr(inner, name)
+
+
+# ==============
+# 并发批量嵌入引擎
+# ==============
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+
+class TokenBucket:
+    """线程安全的令牌桶限流器
+
+    rate: 每秒补充的令牌数（<=0 表示不限流）
+    capacity: 桶容量，即允许的突发请求数
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1.0, self.rate))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: float = 1.0) -> None:
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait = (tokens - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class BatchEmbeddingEngine:
+    """并发批量嵌入引擎
+
+    - 按 batch_size 切分文本，最多 max_concurrency 个批次同时请求
+    - 每次请求前从令牌桶取令牌，限制整体请求速率
+    - 失败批次按指数退避（带全抖动）重试；仍失败时拆成小批次再试
+    - 输出与输入一一对应并保持原顺序
+    - 底层为 CachedEmbedding 时先整体查缓存，只有未命中的文本进入请求队列
+    """
+
+    def __init__(
+        self,
+        embedder: EmbeddingModel,
+        batch_size: int = 64,
+        max_concurrency: Optional[int] = None,
+        requests_per_second: Optional[float] = None,
+        max_retries: Optional[int] = None,
+        base_delay: float = 0.5,
+        max_delay: float = 20.0,
+        fallback_batch_size: int = 8,
+    ):
+        self.embedder = embedder
+        self.batch_size = max(1, int(batch_size))
+        if max_concurrency is None:
+            max_concurrency = _env_int("EMBED_MAX_CONCURRENCY", 4) if getattr(embedder, "is_remote", False) else 1
+        self.max_concurrency = max(1, int(max_concurrency))
+        if requests_per_second is None:
+            requests_per_second = _env_float("EMBED_RATE_LIMIT_RPS", 10.0) if getattr(embedder, "is_remote", False) else 0.0
+        self.bucket = TokenBucket(requests_per_second, capacity=max(1.0, float(self.max_concurrency)))
+        self.max_retries = max(0, int(max_retries if max_retries is not None else _env_int("EMBED_MAX_RETRIES", 4)))
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.fallback_batch_size = max(1, int(fallback_batch_size))
+        self.failed_texts = 0
+        # 最近一次 encode/encode_matrix 中彻底失败的输入下标（升序）
+        self.failed_rows: List[int] = []
+        self.dimension_mismatches = 0
+
+    def _backoff(self, attempt: int) -> None:
+        delay = min(self.max_delay, self.base_delay * (2 ** attempt))
+        time.sleep(random.uniform(0, delay))
+
+    def _call(self, model: EmbeddingModel, texts: List[str]) -> np.ndarray:
+        """单次请求：限流 + 重试，返回 (len(texts), d) 矩阵"""
+        last_error: Optional[Exception] = None
+        for attempt in range(self.max_retries + 1):
+            self.bucket.acquire()
+            try:
+                mat = encode_as_matrix(model, texts)
+                if mat.shape[0] != len(texts):
+                    raise RuntimeError(f"嵌入结果数量不匹配: 期望{len(texts)}, 实际{mat.shape[0]}")
+                return mat
+            except Exception as e:
+                last_error = e
+                if attempt < self.max_retries:
+                    self._backoff(attempt)
+        raise last_error
+
+    def _run_batch(self, model: EmbeddingModel, texts: List[str]) -> List[Tuple[int, int, Optional[np.ndarray]]]:
+        """执行一个批次，返回 (起始偏移, 条数, 矩阵或None) 片段列表"""
+        try:
+            return [(0, len(texts), self._call(model, texts))]
+        except Exception as e:
+            if len(texts) <= self.fallback_batch_size:
+                print(f"[WARNING] Embedding batch failed after retries: {e}")
+                self.failed_texts += len(texts)
+                return [(0, len(texts), None)]
+        # 大批次失败后拆小重试，避免单条异常输入拖垮整批
+        segments: List[Tuple[int, int, Optional[np.ndarray]]] = []
+        for j in range(0, len(texts), self.fallback_batch_size):
+            small = texts[j:j + self.fallback_batch_size]
+            try:
+                segments.append((j, len(small), self._call(model, small)))
+            except Exception as e:
+                print(f"[WARNING] Embedding sub-batch failed after retries: {e}")
+                self.failed_texts += len(small)
+                segments.append((j, len(small), None))
+        return segments
+
+    def _run(
+        self,
+        texts: List[str],
+        sink: Callable[[List[int], np.ndarray], None],
+        progress_callback: Optional[Callable[[int, int], None]] = None,
+    ) -> None:
+        """调度所有批次，把 (原始位置列表, 矩阵) 交给 sink；失败的片段不回调，位置记入 failed_rows"""
+        self.failed_rows = []
+        total = len(texts)
+        cached = self.embedder if isinstance(self.embedder, CachedEmbedding) else None
+        if cached is not None:
+            hits, pending = cached.lookup(texts)
+            hit_idx = [i for i, v in enumerate(hits) if v is not None]
+            if hit_idx:
+                sink(hit_idx, np.stack([hits[i] for i in hit_idx]))
+            target = cached.inner
+        else:
+            pending = list(range(total))
+            target = self.embedder
+
+        done = total - len(pending)
+        if progress_callback and done:
+            progress_callback(done, total)
+        if not pending:
+            return
+
+        batches = [pending[i:i + self.batch_size] for i in range(0, len(pending), self.batch_size)]
+        with ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(batches))) as pool:
+            futures = [
+                (idx_list, pool.submit(self._run_batch, target, [texts[i] for i in idx_list]))
+                for idx_list in batches
+            ]
+            for idx_list, fut in futures:
+                for offset, count, mat in fut.result():
+                    rows = idx_list[offset:offset + count]
+                    if mat is None:
+                        self.failed_rows.extend(rows)
+                        continue
+                    sink(rows, mat)
+                    if cached is not None:
+                        cached.remember([texts[i] for i in rows], mat)
+                done += len(idx_list)
+                if progress_callback:
+                    progress_callback(done, total)
+
+    def encode(
+        self,
+        texts: List[str],
+        progress_callback: Optional[Callable[[int, int], None]] = None,
+    ) -> List[Optional[np.ndarray]]:
+        """返回按输入顺序排列的向量列表，彻底失败的位置为 None"""
+        texts = list(texts)
+        results: List[Optional[np.ndarray]] = [None] * len(texts)
+
+        def sink(rows: List[int], mat: np.ndarray) -> None:
+            for i, v in zip(rows, mat):
+                results[i] = v
+
+        if texts:
+            self._run(texts, sink, progress_callback)
+        return results
+
+    def encode_matrix(
+        self,
+        texts: List[str],
+        dimension: int,
+        progress_callback: Optional[Callable[[int, int], None]] = None,
+    ) -> np.ndarray:
+        """返回预分配的 float32 矩阵 (n, dimension)
+
+        各批次结果直接写入对应行（维度不一致时截断或零填充），
+        彻底失败的行保持为零向量，数量记录在 failed_texts，下标记录在 failed_rows。
+        """
+        texts = list(texts)
+        out = np.zeros((len(texts), dimension), dtype=np.float32)
+
+        def sink(rows: List[int], mat: np.ndarray) -> None:
+            if mat.shape[1] != dimension:
+                self.dimension_mismatches += len(rows)
+            width = min(dimension, mat.shape[1])
+            out[rows, :width] = mat[:, :width]
+
+        if texts:
+            self._run(texts, sink, progress_callback)
+        return out
+
+
 # ==============
 # 工厂与回退
 # ==============
@@ -266,6 +808,37 @@ def create_embedding_model_with_fallback(preferred_type: str = "dashscope", **kw
 
 _lock = threading.RLock()
 _embedder: Optional[EmbeddingModel] = None
+_caches: Dict[str, EmbeddingCache] = {}
+
+
+def _get_cache(db_path: str) -> EmbeddingCache:
+    """同一路径共享一个缓存连接"""
+    path = os.path.abspath(db_path)
+    with _lock:
+        if path not in _caches:
+            max_entries = _env_int("EMBED_CACHE_MAX_ENTRIES", 200000)
+            _caches[path] = EmbeddingCache(path, max_entries=max_entries)
+        return _caches[path]
+
+
+def _wrap_with_cache(model: EmbeddingModel, db_path: Optional[str] = None) -> EmbeddingModel:
+    """按配置为嵌入模型加上持久化缓存
+
+    TF-IDF 的向量依赖 fit 的语料，结果不可跨进程复用，因此不做缓存。
+    """
+    if isinstance(model, CachedEmbedding):
+        model = model.inner
+    if isinstance(model, TFIDFEmbedding):
+        return model
+    if db_path is None:
+        if os.getenv("EMBED_CACHE", "1").strip().lower() in ("0", "false", "no", "off"):
+            return model
+        db_path = os.getenv("EMBED_CACHE_PATH", os.path.join("memory_data", "embedding_cache.db"))
+    try:
+        return CachedEmbedding(model, _get_cache(db_path))
+    except Exception:
+        # 缓存不可用时不影响嵌入本身
+        return model
 
 
 def _build_embedder() -> EmbeddingModel:
@@ -283,7 +856,7 @@ def _build_embedder() -> EmbeddingModel:
     base_url = os.getenv("EMBED_BASE_URL")
     if base_url:
         kwargs["base_url"] = base_url
-    return create_embedding_model_with_fallback(preferred_type=preferred, **kwargs)
+    return _wrap_with_cache(create_embedding_model_with_fallback(preferred_type=preferred, **kwargs))
 
 
 def get_text_embedder() -> EmbeddingModel:
@@ -313,3 +886,14 @@ def refresh_embedder() -> EmbeddingModel:
         return _embedder
 
 
+def get_cached_embedder(cache_db: str) -> EmbeddingModel:
+    """获取使用指定缓存库的嵌入实例（底层模型与全局实例共享）"""
+    return _wrap_with_cache(get_text_embedder(), db_path=cache_db)
+
+
+def get_embedding_cache_stats() -> Dict[str, Union[int, float, str]]:
+    """获取全局嵌入缓存的命中统计（未启用缓存时返回空字典）"""
+    embedder = get_text_embedder()
+    if isinstance(embedder, CachedEmbedding):
+        return embedder.cache_stats()
+    return {}
@@ -17,11 +17,15 @@ from ..embedding import (
     create_embedding_model_with_fallback,
 )
 from .document import Document, DocumentProcessor
+from .manifest import DocumentManifest
 from .pipeline import (
     load_and_chunk_texts,
+    iter_document_chunks,
     build_graph_from_chunks,
     index_chunks,
+    stream_index_documents,
     embed_query,
+    embed_queries,
     search_vectors,
     rank,
     merge_snippets,
@@ -48,10 +52,14 @@ __all__ = [
     "create_embedding_model_with_fallback",
     "Document",
     "DocumentProcessor",
+    "DocumentManifest",
     "load_and_chunk_texts",
+    "iter_document_chunks",
     "build_graph_from_chunks",
     "index_chunks",
+    "stream_index_documents",
     "embed_query",
+    "embed_queries",
     "search_vectors",
     "rank",
     "merge_snippets",
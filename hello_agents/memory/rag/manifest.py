@@ -0,0 +1,213 @@
+"""文档清单（Manifest）：增量重建索引的变更检测
+
+为每个已索引文件记录 mtime/size/内容哈希、索引配置指纹，以及其分块的 content_hash 与签名，
+按 (collection, namespace) 隔离，存储在 SQLite（默认 ./memory_data/rag_manifest.db，
+可通过 RAG_MANIFEST_PATH 覆盖）。
+
+变更检测分三级：
+- 索引配置指纹（向量存储身份、分块参数、嵌入模型）与记录不一致 -> 需要重建索引
+- mtime 与 size 均未变化 -> 视为未变化，不读取文件
+- 否则计算文件 sha256；哈希一致时只刷新 mtime/size，仍视为未变化
+
+分块签名由调用方计算（包含内容、位置与配置指纹），签名不一致的已知分块需要重新写入。
+旧版清单没有配置与签名列，升级后首次导入会完整重建一次。
+"""
+
+from typing import Dict, List, Optional, Set, Tuple
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+
+def default_manifest_path() -> str:
+    return os.getenv("RAG_MANIFEST_PATH", "./memory_data/rag_manifest.db")
+
+
+def manifest_key(path: str) -> str:
+    """Manifest中统一使用绝对路径作为文件键"""
+    return os.path.abspath(path)
+
+
+def file_sha256(path: str, block_size: int = 1 << 20) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        while True:
+            block = f.read(block_size)
+            if not block:
+                break
+            h.update(block)
+    return h.hexdigest()
+
+
+class DocumentManifest:
+    """Persistent per-file fingerprints and per-chunk content hashes for one collection/namespace."""
+
+    def __init__(self, db_path: Optional[str] = None, collection: str = "hello_agents_rag_vectors", namespace: str = "default"):
+        self.db_path = db_path or default_manifest_path()
+        self.collection = collection
+        self.namespace = namespace
+        self._lock = threading.Lock()
+        db_dir = os.path.dirname(self.db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS manifest_files (
+                collection TEXT NOT NULL,
+                namespace TEXT NOT NULL,
+                path TEXT NOT NULL,
+                mtime REAL NOT NULL,
+                size INTEGER NOT NULL,
+                file_hash TEXT NOT NULL,
+                doc_id TEXT,
+                indexed_at REAL NOT NULL,
+                PRIMARY KEY (collection, namespace, path)
+            )
+            """
+        )
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS manifest_chunks (
+                collection TEXT NOT NULL,
+                namespace TEXT NOT NULL,
+                path TEXT NOT NULL,
+                chunk_id TEXT NOT NULL,
+                content_hash TEXT NOT NULL,
+                PRIMARY KEY (collection, namespace, path, chunk_id)
+            )
+            """
+        )
+        # 旧版清单升级：补充配置指纹与分块签名列
+        for table, column in (("manifest_files", "config"), ("manifest_chunks", "signature")):
+            columns = {r[1] for r in self._conn.execute(f"PRAGMA table_info({table})")}
+            if column not in columns:
+                self._conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} TEXT NOT NULL DEFAULT ''")
+        self._conn.commit()
+
+    # ---- change detection ----
+
+    def check_file(self, path: str, config: str = "") -> Tuple[bool, Optional[Dict]]:
+        """
+        Returns (unchanged, fingerprint). fingerprint is {"mtime", "size", "file_hash"} for
+        files that need (re)indexing; None when the file is unchanged or unreadable.
+        A file recorded under a different index config always needs re-indexing.
+        """
+        key = manifest_key(path)
+        try:
+            st = os.stat(path)
+        except OSError:
+            return False, None
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT mtime, size, file_hash, config FROM manifest_files WHERE collection=? AND namespace=? AND path=?",
+                (self.collection, self.namespace, key),
+            ).fetchone()
+        if row and row[3] != config:
+            row = None
+        if row and row[0] == st.st_mtime and row[1] == st.st_size:
+            return True, None
+        try:
+            digest = file_sha256(path)
+        except OSError:
+            return False, None
+        if row and row[2] == digest:
+            # 内容未变（如仅被touch），刷新指纹即可
+            with self._lock:
+                self._conn.execute(
+                    "UPDATE manifest_files SET mtime=?, size=? WHERE collection=? AND namespace=? AND path=?",
+                    (st.st_mtime, st.st_size, self.collection, self.namespace, key),
+                )
+                self._conn.commit()
+            return True, None
+        return False, {"mtime": st.st_mtime, "size": st.st_size, "file_hash": digest}
+
+    def chunk_ids(self, path: str) -> Set[str]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT chunk_id FROM manifest_chunks WHERE collection=? AND namespace=? AND path=?",
+                (self.collection, self.namespace, manifest_key(path)),
+            ).fetchall()
+        return {r[0] for r in rows}
+
+    def chunk_signatures(self, path: str) -> Dict[str, str]:
+        """{chunk_id: signature} of a file's recorded chunks"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT chunk_id, signature FROM manifest_chunks WHERE collection=? AND namespace=? AND path=?",
+                (self.collection, self.namespace, manifest_key(path)),
+            ).fetchall()
+        return {r[0]: r[1] for r in rows}
+
+    def paths_under(self, directory: str) -> List[str]:
+        """All recorded file paths below a directory"""
+        prefix = manifest_key(directory).rstrip(os.sep) + os.sep
+        pattern = prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT path FROM manifest_files WHERE collection=? AND namespace=? AND path LIKE ? ESCAPE '\\'",
+                (self.collection, self.namespace, pattern),
+            ).fetchall()
+        return [r[0] for r in rows]
+
+    # ---- updates (call only after the vector store reflects the change) ----
+
+    def commit_file(self, path: str, fingerprint: Dict, doc_id: Optional[str],
+                    chunks: Dict[str, Tuple[str, str]], config: str = "") -> None:
+        """Record a file's fingerprint and index config, and replace its chunk set ({chunk_id: (content_hash, signature)})"""
+        key = manifest_key(path)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO manifest_files (collection, namespace, path, mtime, size, file_hash, doc_id, indexed_at, config) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (self.collection, self.namespace, key, fingerprint["mtime"], fingerprint["size"],
+                 fingerprint["file_hash"], doc_id, time.time(), config),
+            )
+            self._conn.execute(
+                "DELETE FROM manifest_chunks WHERE collection=? AND namespace=? AND path=?",
+                (self.collection, self.namespace, key),
+            )
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO manifest_chunks (collection, namespace, path, chunk_id, content_hash, signature) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [(self.collection, self.namespace, key, cid, ch, sig) for cid, (ch, sig) in chunks.items()],
+            )
+            self._conn.commit()
+
+    def remove_file(self, path: str) -> None:
+        key = manifest_key(path)
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM manifest_files WHERE collection=? AND namespace=? AND path=?",
+                (self.collection, self.namespace, key),
+            )
+            self._conn.execute(
+                "DELETE FROM manifest_chunks WHERE collection=? AND namespace=? AND path=?",
+                (self.collection, self.namespace, key),
+            )
+            self._conn.commit()
+
+    def clear(self, all_namespaces: bool = False) -> None:
+        """Forget recorded files (all namespaces of the collection when the collection itself was dropped)"""
+        where, args = ("collection=?", (self.collection,)) if all_namespaces else (
+            "collection=? AND namespace=?", (self.collection, self.namespace))
+        with self._lock:
+            self._conn.execute(f"DELETE FROM manifest_files WHERE {where}", args)
+            self._conn.execute(f"DELETE FROM manifest_chunks WHERE {where}", args)
+            self._conn.commit()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            files = self._conn.execute(
+                "SELECT COUNT(*) FROM manifest_files WHERE collection=? AND namespace=?",
+                (self.collection, self.namespace),
+            ).fetchone()[0]
+            chunks = self._conn.execute(
+                "SELECT COUNT(*) FROM manifest_chunks WHERE collection=? AND namespace=?",
+                (self.collection, self.namespace),
+            ).fetchone()[0]
+        return {"files": int(files), "chunks": int(chunks)}
@@ -1,23 +1,46 @@
-from typing import List, Dict, Optional, Any
+from typing import List, Dict, Optional, Any, Callable, Iterable, Iterator, Set
 import os
 import hashlib
+import queue
 import sqlite3
+import threading
 import time
 import json
-from ..embedding import get_text_embedder, get_dimension
-from ..storage.qdrant_store import QdrantVectorStore
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from ..embedding import (
+    BatchEmbeddingEngine,
+    embed_queries_memoized,
+    encode_as_matrix,
+    fit_dimension,
+    get_text_embedder,
+    get_cached_embedder,
+    get_dimension,
+)
+from ..storage.vector_store import VectorStore, get_vector_store, create_vector_store
+from .manifest import DocumentManifest, manifest_key
+
+
+_MARKITDOWN = None
+_MARKITDOWN_LOADED = False
 
 
 def _get_markitdown_instance():
     """
     Get a configured MarkItDown instance for document conversion.
+    The instance is created once per process, so each conversion worker owns its own.
     """
+    global _MARKITDOWN, _MARKITDOWN_LOADED
+    if _MARKITDOWN_LOADED:
+        return _MARKITDOWN
     try:
         from markitdown import MarkItDown
-        return MarkItDown()
+        _MARKITDOWN = MarkItDown()
     except ImportError:
         print("[WARNING] MarkItDown not available. Install with: pip install markitdown")
-        return None
+        _MARKITDOWN = None
+    _MARKITDOWN_LOADED = True
+    return _MARKITDOWN
 
 
 def _is_markitdown_supported_format(path: str) -> bool:
@@ -74,6 +97,168 @@ def _convert_to_markdown(path: str) -> str:
         print(f"[WARNING] MarkItDown failed for {path}: {e}")
         return _fallback_text_reader(path)
 
+def _convert_worker(path: str) -> str:
+    """Process-pool entry point: convert one file with the worker's own MarkItDown."""
+    return _convert_to_markdown(path)
+
+
+def _register_convert_worker(pids) -> None:
+    """Process-pool initializer: report the worker pid so a hung pool can be terminated."""
+    pids.put(os.getpid())
+
+
+class ParallelConverter:
+    """
+    Convert documents to markdown on a process pool.
+
+    - At most `max_workers` files are in flight, so each submitted file starts immediately
+      and its wall time can be checked against `timeout`.
+    - Results are yielded in input order; completed-but-unyielded results are bounded by
+      `max_workers * 4`.
+    - A file exceeding `timeout` is skipped and the pool is recycled (its workers are
+      terminated) so a hung conversion cannot hold a worker forever.
+    - If a worker crashes, the pool is rebuilt and the in-flight files are retried once,
+      each on its own; a file that crashes a worker again is skipped. The run continues.
+
+    Workers are started with the "spawn" method: the converter usually runs inside the
+    ingest producer thread, and forking a multi-threaded process can deadlock. Spawned
+    workers re-import the caller's main module, so scripts that enable it must guard their
+    entry point with `if __name__ == "__main__":`.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, timeout: Optional[float] = None):
+        if max_workers is None:
+            max_workers = _default_convert_workers()
+        self.max_workers = max(1, int(max_workers))
+        if timeout is None:
+            try:
+                timeout = float(os.getenv("RAG_CONVERT_TIMEOUT", "300"))
+            except ValueError:
+                timeout = 300.0
+        self.timeout = timeout
+        self.timeouts = 0
+        self.crashes = 0
+        self._pool = None
+        self._pids = None
+
+    def _new_pool(self):
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+        ctx = multiprocessing.get_context("spawn")
+        self._pids = ctx.SimpleQueue()
+        self._pool = ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            mp_context=ctx,
+            initializer=_register_convert_worker,
+            initargs=(self._pids,),
+        )
+
+    def _kill_pool(self):
+        import multiprocessing
+        pool, self._pool = self._pool, None
+        if pool is None:
+            return
+        pids = set()
+        while not self._pids.empty():
+            pids.add(self._pids.get())
+        # Only terminate live children of this process that registered as workers of this pool
+        for proc in multiprocessing.active_children():
+            if proc.pid in pids:
+                try:
+                    proc.terminate()
+                except Exception:
+                    pass
+        try:
+            pool.shutdown(wait=False, cancel_futures=True)
+        except Exception:
+            pass
+
+    def iter_convert(self, paths: List[str]) -> Iterator[tuple]:
+        """Yield (path, markdown) pairs in input order; failed files yield an empty string."""
+        from collections import deque
+        from concurrent.futures import FIRST_COMPLETED, wait
+        from concurrent.futures.process import BrokenProcessPool
+
+        todo = deque((i, p, 0) for i, p in enumerate(paths))  # (index, path, crash attempts)
+        inflight: Dict[Any, tuple] = {}  # future -> (index, path, attempts, started)
+        ready: Dict[int, tuple] = {}
+        next_index = 0
+        window = self.max_workers * 4
+
+        self._new_pool()
+        try:
+            while next_index < len(paths):
+                while next_index in ready:
+                    yield ready.pop(next_index)
+                    next_index += 1
+                if next_index >= len(paths):
+                    break
+
+                while todo and len(inflight) < self.max_workers and todo[0][0] < next_index + window:
+                    if todo[0][2] > 0 and inflight:
+                        break
+                    idx, path, attempts = todo.popleft()
+                    fut = self._pool.submit(_convert_worker, path)
+                    inflight[fut] = (idx, path, attempts, time.time())
+                    if attempts > 0:
+                        # Crash suspects are retried alone so a second crash is attributable
+                        break
+
+                done, _ = wait(list(inflight.keys()), timeout=1.0, return_when=FIRST_COMPLETED)
+                crashed = []
+                for fut in done:
+                    idx, path, attempts, _started = inflight.pop(fut)
+                    try:
+                        ready[idx] = (path, fut.result() or "")
+                    except BrokenProcessPool:
+                        crashed.append((idx, path, attempts))
+                    except Exception as e:
+                        print(f"[WARNING] Conversion failed for {path}: {e}")
+                        ready[idx] = (path, "")
+
+                now = time.time()
+                expired = {f for f, (_, _, _, started) in inflight.items()
+                           if self.timeout and now - started > self.timeout}
+                if not crashed and not expired:
+                    continue
+
+                # Recycle the pool; files still running on it are requeued
+                requeue = []
+                for fut, (idx, path, attempts, _started) in inflight.items():
+                    if fut in expired:
+                        self.timeouts += 1
+                        print(f"[WARNING] Conversion timed out after {self.timeout:.0f}s: {path}")
+                        ready[idx] = (path, "")
+                    elif crashed:
+                        # A crash breaks the whole pool, so every in-flight file is suspect
+                        crashed.append((idx, path, attempts))
+                    else:
+                        requeue.append((idx, path, attempts))
+                inflight.clear()
+                if crashed:
+                    self.crashes += 1
+                    for idx, path, attempts in crashed:
+                        if attempts >= 1:
+                            print(f"[WARNING] Skipping file after repeated worker crashes: {path}")
+                            ready[idx] = (path, "")
+                        else:
+                            requeue.append((idx, path, attempts + 1))
+                self._kill_pool()
+                self._new_pool()
+                for item in sorted(requeue, reverse=True):
+                    todo.appendleft(item)
+        finally:
+            self._kill_pool()
+
+
+def _default_convert_workers() -> int:
+    """Process-pool conversion is opt-in: RAG_CONVERT_WORKERS defaults to 1 (in-process)."""
+    try:
+        return int(os.getenv("RAG_CONVERT_WORKERS", "1"))
+    except ValueError:
+        return 1
+
+
 def _enhanced_pdf_processing(path: str) -> str:
     """
     Enhanced PDF processing with post-processing cleanup.
@@ -322,36 +507,125 @@ def _chunk_paragraphs(paragraphs: List[Dict], chunk_tokens: int, overlap_tokens:
     return chunks
 
 
-def load_and_chunk_texts(paths: List[str], chunk_size: int = 800, chunk_overlap: int = 100, namespace: Optional[str] = None, source_label: str = "rag") -> List[Dict]:
+class IngestStats:
+    """Progress and throughput counters for streaming ingestion."""
+
+    def __init__(self, files_total: int = 0):
+        self.files_total = files_total
+        self.files_done = 0
+        self.files_skipped = 0
+        self.files_unchanged = 0
+        self.files_removed = 0
+        self.bytes_read = 0
+        self.chunks_produced = 0
+        self.chunks_unchanged = 0
+        self.chunks_indexed = 0
+        self.chunks_deleted = 0
+        self.chunks_failed = 0
+        self.batches_indexed = 0
+        self.started_at = time.time()
+
+    def to_dict(self) -> Dict[str, Any]:
+        elapsed = max(1e-6, time.time() - self.started_at)
+        return {
+            "files_total": self.files_total,
+            "files_done": self.files_done,
+            "files_skipped": self.files_skipped,
+            "files_unchanged": self.files_unchanged,
+            "files_removed": self.files_removed,
+            "bytes_read": self.bytes_read,
+            "chunks_produced": self.chunks_produced,
+            "chunks_unchanged": self.chunks_unchanged,
+            "chunks_indexed": self.chunks_indexed,
+            "chunks_deleted": self.chunks_deleted,
+            "chunks_failed": self.chunks_failed,
+            "batches_indexed": self.batches_indexed,
+            "elapsed_sec": round(elapsed, 3),
+            "chunks_per_sec": round(self.chunks_indexed / elapsed, 2),
+            "mb_per_sec": round(self.bytes_read / elapsed / (1024 * 1024), 3),
+        }
+
+
+def iter_document_paths(paths: List[str], recursive: bool = True) -> Iterator[str]:
     """
-    Universal document loader and chunker using MarkItDown.
-    Converts all supported formats to markdown, then chunks intelligently.
+    Expand files and directories into supported document paths (directories sorted, lazily walked).
     """
-    print(f"[RAG] Universal loader start: files={len(paths)} chunk_size={chunk_size} overlap={chunk_overlap} ns={namespace or 'default'}")
-    chunks: List[Dict] = []
-    seen_hashes = set()
-    
+    for path in paths:
+        if os.path.isdir(path):
+            if recursive:
+                walker = os.walk(path)
+            else:
+                walker = [(path, [], os.listdir(path))]
+            for root, dirs, files in walker:
+                dirs.sort()
+                for name in sorted(files):
+                    full = os.path.join(root, name)
+                    if os.path.isfile(full) and _is_markitdown_supported_format(full):
+                        yield full
+        else:
+            yield path
+
+
+def _iter_file_chunks(
+    paths: Iterable[str],
+    chunk_size: int = 800,
+    chunk_overlap: int = 100,
+    namespace: Optional[str] = None,
+    source_label: str = "rag",
+    stats: Optional[IngestStats] = None,
+    seen_hashes: Optional[set] = None,
+    convert_workers: Optional[int] = None,
+) -> Iterator[tuple]:
+    """
+    Yields (path, doc_id, chunks) per input file in input order; chunks is None when the
+    file is missing or no content could be extracted.
+    Ids are content-addressed: doc_id = md5(abspath), chunk_id = md5(doc_id|content_hash),
+    so an unchanged chunk keeps its id when text around it moves (incremental re-indexing).
+    """
+    if seen_hashes is None:
+        seen_hashes = set()
+
+    existing: List[str] = []
     for path in paths:
         if not os.path.exists(path):
             print(f"[WARNING] File not found: {path}")
+            if stats is not None:
+                stats.files_skipped += 1
+            yield path, None, None
             continue
-            
+        existing.append(path)
+
+    workers = _default_convert_workers() if convert_workers is None else convert_workers
+    if workers > 1 and len(existing) > 1:
+        converted = ParallelConverter(max_workers=min(workers, len(existing))).iter_convert(existing)
+    else:
+        # Convert to markdown using MarkItDown in-process
+        converted = ((p, _convert_to_markdown(p)) for p in existing)
+
+    for path, markdown_text in converted:
         print(f"[RAG] Processing: {path}")
         ext = (os.path.splitext(path)[1] or '').lower()
+        if stats is not None:
+            try:
+                stats.bytes_read += os.path.getsize(path)
+            except OSError:
+                pass
         
-        # Convert to markdown using MarkItDown
-        markdown_text = _convert_to_markdown(path)
         if not markdown_text.strip():
             print(f"[WARNING] No content extracted from: {path}")
+            if stats is not None:
+                stats.files_skipped += 1
+            yield path, None, None
             continue
         
         lang = _detect_lang(markdown_text)
-        doc_id = hashlib.md5(f"{path}|{len(markdown_text)}".encode('utf-8')).hexdigest()
+        doc_id = hashlib.md5(os.path.abspath(path).encode('utf-8')).hexdigest()
         
         # Always use markdown-aware chunking for better structure preservation
         para = _split_paragraphs_with_headings(markdown_text)
         token_chunks = _chunk_paragraphs(para, chunk_tokens=max(1, chunk_size), overlap_tokens=max(0, chunk_overlap))
         
+        file_chunks: List[Dict] = []
         for ch in token_chunks:
             content = ch["content"]
             start = ch.get("start", 0)
@@ -365,8 +639,11 @@ def load_and_chunk_texts(paths: List[str], chunk_size: int = 800, chunk_overlap:
                 continue
             seen_hashes.add(content_hash)
             
-            chunk_id = hashlib.md5(f"{doc_id}|{start}|{end}|{content_hash}".encode('utf-8')).hexdigest()
-            chunks.append({
+            # 32 hex digits: a valid UUID, so Qdrant keeps it as the point id
+            chunk_id = hashlib.md5(f"{doc_id}|{content_hash}".encode('utf-8')).hexdigest()
+            if stats is not None:
+                stats.chunks_produced += 1
+            file_chunks.append({
                 "id": chunk_id,
                 "content": content,
                 "metadata": {
@@ -384,7 +661,56 @@ def load_and_chunk_texts(paths: List[str], chunk_size: int = 800, chunk_overlap:
                     "format": "markdown",  # Mark all content as markdown-processed
                 },
             })
-            
+        if stats is not None:
+            stats.files_done += 1
+        yield path, doc_id, file_chunks
+
+
+def iter_document_chunks(
+    paths: Iterable[str],
+    chunk_size: int = 800,
+    chunk_overlap: int = 100,
+    namespace: Optional[str] = None,
+    source_label: str = "rag",
+    stats: Optional[IngestStats] = None,
+    seen_hashes: Optional[set] = None,
+    convert_workers: Optional[int] = None,
+) -> Iterator[Dict]:
+    """
+    Generator form of the universal loader: yields chunks file by file, so only a bounded
+    number of converted documents is held in memory.
+    With convert_workers > 1 (default RAG_CONVERT_WORKERS, 1) and several files, conversion runs
+    on a spawned ParallelConverter process pool; chunks are still produced in input order.
+    """
+    for _path, _doc_id, file_chunks in _iter_file_chunks(
+        paths,
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        namespace=namespace,
+        source_label=source_label,
+        stats=stats,
+        seen_hashes=seen_hashes,
+        convert_workers=convert_workers,
+    ):
+        if file_chunks:
+            yield from file_chunks
+
+
+def load_and_chunk_texts(paths: List[str], chunk_size: int = 800, chunk_overlap: int = 100, namespace: Optional[str] = None, source_label: str = "rag", convert_workers: Optional[int] = None) -> List[Dict]:
+    """
+    Universal document loader and chunker using MarkItDown.
+    Converts all supported formats to markdown (in parallel across processes when
+    convert_workers > 1), then chunks intelligently.
+    """
+    print(f"[RAG] Universal loader start: files={len(paths)} chunk_size={chunk_size} overlap={chunk_overlap} ns={namespace or 'default'}")
+    chunks = list(iter_document_chunks(
+        paths,
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        namespace=namespace,
+        source_label=source_label,
+        convert_workers=convert_workers,
+    ))
     print(f"[RAG] Universal loader done: total_chunks={len(chunks)}")
     return chunks
 
@@ -451,10 +777,10 @@ def _preprocess_markdown_for_embedding(text: str) -> str:
     return text.strip()
 
 
-def _create_default_vector_store(dimension: int = None) -> QdrantVectorStore:
+def _create_default_vector_store(dimension: int = None) -> VectorStore:
     """
-    Create default Qdrant vector store with RAG-optimized settings.
-    使用连接管理器避免重复连接。
+    Create default vector store with RAG-optimized settings (backend via VECTOR_STORE_BACKEND).
+    使用共享实例避免重复连接。
     """
     if dimension is None:
         dimension = get_dimension(384)
@@ -463,9 +789,7 @@ def _create_default_vector_store(dimension: int = None) -> QdrantVectorStore:
     qdrant_url = os.getenv("QDRANT_URL")
     qdrant_api_key = os.getenv("QDRANT_API_KEY")
     
-    # 使用连接管理器
-    from ..storage.qdrant_store import QdrantConnectionManager
-    return QdrantConnectionManager.get_instance(
+    return get_vector_store(
         url=qdrant_url,
         api_key=qdrant_api_key,
         collection_name="hello_agents_rag_vectors",
@@ -474,7 +798,7 @@ def _create_default_vector_store(dimension: int = None) -> QdrantVectorStore:
     )
 
 
-# Cache functions removed - using unified embedder with internal caching
+# Embedding cache lives in the unified embedder (see memory/embedding.py)
 
 
 def index_chunks(
@@ -483,23 +807,26 @@ def index_chunks(
     cache_db: Optional[str] = None, 
     batch_size: int = 64,
     rag_namespace: str = "default"
-) -> None:
+) -> List[str]:
     """
     Index markdown chunks with unified embedding and Qdrant storage.
     Uses百炼 API with fallback to sentence-transformers.
+    cache_db: optional path of a dedicated embedding cache database;
+    defaults to the global cache configured via EMBED_CACHE_PATH.
+    Returns the ids of chunks that failed to embed (upserted with zero vectors).
     """
     if not chunks:
         print("[RAG] No chunks to index")
-        return
+        return []
     
-    # Use unified embedding from embedding module
-    embedder = get_text_embedder()
+    # Use unified embedding from embedding module (persistent cache included)
+    embedder = get_cached_embedder(cache_db) if cache_db else get_text_embedder()
     dimension = get_dimension(384)
     
-    # Create default Qdrant store if not provided
+    # Create default vector store if not provided
     if store is None:
         store = _create_default_vector_store(dimension)
-        print(f"[RAG] Created default Qdrant store with dimension {dimension}")
+        print(f"[RAG] Created default vector store with dimension {dimension}")
     
     # Preprocess markdown texts for better embeddings
     processed_texts = []
@@ -510,100 +837,23 @@ def index_chunks(
     
     print(f"[RAG] Embedding start: total_texts={len(processed_texts)} batch_size={batch_size}")
     
-    # Batch encoding with unified embedder
-    vecs: List[List[float]] = []
-    for i in range(0, len(processed_texts), batch_size):
-        part = processed_texts[i:i+batch_size]
-        try:
-            # Use unified embedder directly (handles caching internally)
-            part_vecs = embedder.encode(part)
-            
-            # Normalize to List[List[float]]
-            if not isinstance(part_vecs, list):
-                # 单个numpy数组转为列表中的列表
-                if hasattr(part_vecs, "tolist"):
-                    part_vecs = [part_vecs.tolist()]
-                else:
-                    part_vecs = [list(part_vecs)]
-            else:
-                # 检查是否是嵌套列表
-                if part_vecs and not isinstance(part_vecs[0], (list, tuple)) and hasattr(part_vecs[0], "__len__"):
-                    # numpy数组列表 -> 转换每个数组
-                    normalized_vecs = []
-                    for v in part_vecs:
-                        if hasattr(v, "tolist"):
-                            normalized_vecs.append(v.tolist())
-                        else:
-                            normalized_vecs.append(list(v))
-                    part_vecs = normalized_vecs
-                elif part_vecs and not isinstance(part_vecs[0], (list, tuple)):
-                    # 单个向量被误判为列表，实际应该包装成[[...]]
-                    if hasattr(part_vecs, "tolist"):
-                        part_vecs = [part_vecs.tolist()]
-                    else:
-                        part_vecs = [list(part_vecs)]
-            
-            for v in part_vecs:
-                try:
-                    # 确保向量是float列表
-                    if hasattr(v, "tolist"):
-                        v = v.tolist()
-                    v_norm = [float(x) for x in v]
-                    if len(v_norm) != dimension:
-                        print(f"[WARNING] 向量维度异常: 期望{dimension}, 实际{len(v_norm)}")
-                        # 用零向量填充或截断
-                        if len(v_norm) < dimension:
-                            v_norm.extend([0.0] * (dimension - len(v_norm)))
-                        else:
-                            v_norm = v_norm[:dimension]
-                    vecs.append(v_norm)
-                except Exception as e:
-                    print(f"[WARNING] 向量转换失败: {e}, 使用零向量")
-                    vecs.append([0.0] * dimension)
-                
-        except Exception as e:
-            print(f"[WARNING] Batch {i} encoding failed: {e}")
-            print(f"[RAG] Retrying batch {i} with smaller chunks...")
-            
-            # 尝试重试：将批次分解为更小的块
-            success = False
-            for j in range(0, len(part), 8):  # 更小的批次
-                small_part = part[j:j+8]
-                try:
-                    import time
-                    time.sleep(2)  # 等待2秒避免频率限制
-                    
-                    small_vecs = embedder.encode(small_part)
-                    # Normalize to List[List[float]]
-                    if isinstance(small_vecs, list) and small_vecs and not isinstance(small_vecs[0], list):
-                        small_vecs = [small_vecs]
-                    
-                    for v in small_vecs:
-                        if hasattr(v, "tolist"):
-                            v = v.tolist()
-                        try:
-                            v_norm = [float(x) for x in v]
-                            if len(v_norm) != dimension:
-                                print(f"[WARNING] 向量维度异常: 期望{dimension}, 实际{len(v_norm)}")
-                                if len(v_norm) < dimension:
-                                    v_norm.extend([0.0] * (dimension - len(v_norm)))
-                                else:
-                                    v_norm = v_norm[:dimension]
-                            vecs.append(v_norm)
-                            success = True
-                        except Exception as e2:
-                            print(f"[WARNING] 小批次向量转换失败: {e2}")
-                            vecs.append([0.0] * dimension)
-                except Exception as e2:
-                    print(f"[WARNING] 小批次 {j//8} 仍然失败: {e2}")
-                    # 为这个小批次创建零向量
-                    for _ in range(len(small_part)):
-                        vecs.append([0.0] * dimension)
-            
-            if not success:
-                print(f"[ERROR] 批次 {i} 完全失败，使用零向量")
-        
-        print(f"[RAG] Embedding progress: {min(i+batch_size, len(processed_texts))}/{len(processed_texts)}")
+    # Concurrent, rate-limited batch encoding straight into one float32 (n, d) matrix;
+    # rows keep input order, dimension is fixed per batch, failed rows stay zero
+    engine = BatchEmbeddingEngine(embedder, batch_size=batch_size)
+    total = len(processed_texts)
+    vecs = engine.encode_matrix(
+        processed_texts,
+        dimension=dimension,
+        progress_callback=lambda done, n: print(f"[RAG] Embedding progress: {done}/{n}"),
+    )
+    if engine.dimension_mismatches:
+        print(f"[WARNING] 向量维度异常: 期望{dimension}, {engine.dimension_mismatches} 条已截断或零填充")
+    if engine.failed_texts:
+        print(f"[ERROR] {engine.failed_texts}/{total} texts failed to embed, using zero vectors")
+    
+    if hasattr(embedder, "cache_stats"):
+        cs = embedder.cache_stats()
+        print(f"[RAG] Embedding cache: hits={cs['hits']} misses={cs['misses']} entries={cs['entries']}")
     
     # Prepare metadata with RAG tags
     metas: List[Dict] = []
@@ -624,48 +874,251 @@ def index_chunks(
         ids.append(ch["id"])
     
     print(f"[RAG] Qdrant upsert start: n={len(vecs)}")
-    success = store.add_vectors(vectors=vecs, metadata=metas, ids=ids)
+    # metas are freshly built above, so the store may stamp them in place
+    success = store.add_vectors(vectors=vecs, metadata=metas, ids=ids, copy_metadata=False)
     if success:
         print(f"[RAG] Qdrant upsert done: {len(vecs)} vectors indexed")
     else:
         print(f"[RAG] Qdrant upsert failed")
         raise RuntimeError("Failed to index vectors to Qdrant")
+    return [ids[i] for i in engine.failed_rows]
 
 
-def embed_query(query: str) -> List[float]:
+def _index_config(store: VectorStore, chunk_size: int, chunk_overlap: int) -> str:
     """
-    Embed query using unified embedding (百炼 with fallback).
+    Fingerprint of everything besides file content that determines the indexed points:
+    vector store identity (backend, Qdrant URL or embedded directory, collection, dimension),
+    chunking parameters and embedding model.
     """
     embedder = get_text_embedder()
+    model = getattr(embedder, "_cache_model", None) or (
+        f"{type(embedder).__name__}:{getattr(embedder, 'model_name', None) or 'default'}")
+    config = {
+        "store": type(store).__name__,
+        "url": getattr(store, "url", None),
+        "dir": getattr(store, "dir", None),
+        "collection": getattr(store, "collection_name", None),
+        "dimension": getattr(store, "vector_size", None),
+        "chunk_size": chunk_size,
+        "chunk_overlap": chunk_overlap,
+        "embed_model": model,
+    }
+    return hashlib.md5(json.dumps(config, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def _chunk_signature(chunk: Dict, config: str) -> str:
+    """Content hash plus the position payload (offsets, heading path) under an index config"""
+    meta = chunk["metadata"]
+    position = json.dumps([meta.get("start"), meta.get("end"), meta.get("heading_path")], ensure_ascii=False)
+    return hashlib.md5(f"{config}|{meta['content_hash']}|{position}".encode("utf-8")).hexdigest()
+
+
+def stream_index_documents(
+    paths: List[str],
+    store = None,
+    chunk_size: int = 800,
+    chunk_overlap: int = 100,
+    rag_namespace: str = "default",
+    source_label: str = "rag",
+    embed_batch_size: int = 64,
+    upsert_batch_size: int = 256,
+    max_pending_batches: int = 2,
+    recursive: bool = True,
+    convert_workers: Optional[int] = None,
+    progress_callback: Optional[Callable[[Dict[str, Any]], None]] = None,
+    manifest: Optional[DocumentManifest] = None,
+) -> Dict[str, Any]:
+    """
+    Streaming ingestion: file -> markdown -> chunks -> embedding batches -> upsert batches.
+
+    A producer thread converts and chunks documents into a bounded queue of upsert batches
+    while the caller's thread embeds and upserts them. When indexing falls behind, the queue
+    fills and the producer blocks (backpressure), so memory stays bounded by roughly
+    (max_pending_batches + 1) * upsert_batch_size chunks plus one document's markdown,
+    independent of corpus size. Directories in `paths` are walked lazily.
+
+    With a DocumentManifest the ingest is incremental: files whose mtime/size (or content
+    hash) are unchanged are not converted at all, only chunks that are new or whose position
+    payload (start/end/heading_path) moved are upserted (moved chunks hit the embedding cache),
+    chunks that disappeared from a file are deleted from the store, and recorded files missing
+    below a re-ingested directory are dropped. Files recorded under a different index config
+    (store, chunking parameters, embedding model; see _index_config) are fully re-indexed.
+    A file is committed to the manifest only after the batch holding its last chunk has been upserted,
+    and only if all of its chunks embedded successfully; otherwise it is re-indexed on the next run.
+
+    Returns ingest stats (files, bytes, chunks, throughput); progress_callback receives the
+    same dict after every upsert batch.
+    """
+    files = list(iter_document_paths(paths, recursive=recursive))
+    stats = IngestStats(files_total=len(files))
+    mode = "incremental" if manifest is not None else "full"
+    print(f"[RAG] Streaming ingest start: files={len(files)} upsert_batch={upsert_batch_size} ns={rag_namespace} mode={mode}")
+
+    if store is None:
+        store = _create_default_vector_store(get_dimension(384))
+    config = _index_config(store, chunk_size, chunk_overlap) if manifest is not None else ""
+
+    batches: "queue.Queue" = queue.Queue(maxsize=max(1, max_pending_batches))
+    stop = threading.Event()
+    done_marker = object()
+    errors: List[BaseException] = []
+
+    def _put(item) -> bool:
+        while not stop.is_set():
+            try:
+                batches.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    fingerprints: Dict[str, Dict] = {}
+
+    def _changed_files() -> Iterator[str]:
+        for path in files:
+            unchanged, fingerprint = manifest.check_file(path, config)
+            if unchanged:
+                stats.files_unchanged += 1
+                continue
+            if fingerprint is not None:
+                fingerprints[path] = fingerprint
+            yield path
+
+    def _produce():
+        try:
+            batch: List[Dict] = []
+            commits: List[Dict] = []
+            source = files if manifest is None else _changed_files()
+            for path, doc_id, file_chunks in _iter_file_chunks(
+                source,
+                chunk_size=chunk_size,
+                chunk_overlap=chunk_overlap,
+                namespace=rag_namespace,
+                source_label=source_label,
+                stats=stats,
+                convert_workers=convert_workers,
+            ):
+                if file_chunks is None:
+                    # Missing or unreadable: keep whatever was indexed before
+                    continue
+                known = manifest.chunk_signatures(path) if manifest is not None else {}
+                signatures = {c["id"]: _chunk_signature(c, config) for c in file_chunks} if manifest is not None else {}
+                for chunk in file_chunks:
+                    if chunk["id"] in known and known[chunk["id"]] == signatures[chunk["id"]]:
+                        stats.chunks_unchanged += 1
+                        continue
+                    batch.append(chunk)
+                    if len(batch) >= upsert_batch_size:
+                        if not _put((batch, commits)):
+                            return
+                        batch, commits = [], []
+                if manifest is not None and path in fingerprints:
+                    current = {c["id"]: (c["metadata"]["content_hash"], signatures[c["id"]]) for c in file_chunks}
+                    commits.append({
+                        "path": path,
+                        "doc_id": doc_id,
+                        "fingerprint": fingerprints.pop(path),
+                        "chunks": current,
+                        "stale": sorted(set(known) - set(current)),
+                    })
+            if manifest is not None:
+                # Files recorded below a re-ingested directory that no longer exist
+                listed = {manifest_key(p) for p in files}
+                for root in paths:
+                    if not os.path.isdir(root):
+                        continue
+                    for gone in manifest.paths_under(root):
+                        if gone not in listed and not os.path.exists(gone):
+                            commits.append({"path": gone, "removed": True, "stale": sorted(manifest.chunk_ids(gone))})
+            if batch or commits:
+                _put((batch, commits))
+        except BaseException as e:
+            errors.append(e)
+        finally:
+            _put(done_marker)
+
+    producer = threading.Thread(target=_produce, name="rag-ingest-producer", daemon=True)
+    producer.start()
+    # Chunks stored with zero vectors; their files stay out of the manifest so the next run retries them
+    failed_ids: Set[str] = set()
+    try:
+        while True:
+            item = batches.get()
+            if item is done_marker:
+                break
+            chunks, commits = item
+            if chunks:
+                failed = index_chunks(store=store, chunks=chunks, batch_size=embed_batch_size, rag_namespace=rag_namespace)
+                failed_ids.update(failed)
+                stats.chunks_indexed += len(chunks) - len(failed)
+                stats.chunks_failed += len(failed)
+                stats.batches_indexed += 1
+            for commit in commits:
+                if commit["stale"]:
+                    if not store.delete_vectors(commit["stale"]):
+                        raise RuntimeError(f"Failed to delete stale chunks of {commit['path']}")
+                    stats.chunks_deleted += len(commit["stale"])
+                if commit.get("removed"):
+                    manifest.remove_file(commit["path"])
+                    stats.files_removed += 1
+                elif failed_ids.intersection(commit["chunks"]):
+                    print(f"[WARNING] {commit['path']} has chunks that failed to embed, not recorded in manifest")
+                else:
+                    manifest.commit_file(commit["path"], commit["fingerprint"], commit["doc_id"], commit["chunks"], config)
+            if not chunks:
+                continue
+            snapshot = stats.to_dict()
+            print(
+                f"[RAG] Ingest progress: files={snapshot['files_done']}/{snapshot['files_total']} "
+                f"chunks={snapshot['chunks_indexed']} rate={snapshot['chunks_per_sec']} chunks/s"
+            )
+            if progress_callback:
+                progress_callback(snapshot)
+    finally:
+        stop.set()
+        producer.join(timeout=5)
+
+    if errors:
+        raise errors[0]
+    result = stats.to_dict()
+    print(
+        f"[RAG] Streaming ingest done: chunks={result['chunks_indexed']} "
+        f"unchanged_files={result['files_unchanged']} unchanged_chunks={result['chunks_unchanged']} "
+        f"deleted={result['chunks_deleted']} failed={result['chunks_failed']} elapsed={result['elapsed_sec']}s"
+    )
+    return result
+
+
+def embed_queries(queries: List[str]) -> np.ndarray:
+    """
+    Embed several queries with a single encoder call (one remote round-trip for API embedders).
+    Inside query_embedding_scope(), strings already embedded during the same request are reused.
+    Returns a float32 matrix of shape (n, d); rows are zero vectors if embedding fails.
+    """
     dimension = get_dimension(384)
+    if not queries:
+        return np.zeros((0, dimension), dtype=np.float32)
+    embedder = get_text_embedder()
     try:
-        vec = embedder.encode(query)
-        
-        # Normalize to List[float]
-        if hasattr(vec, "tolist"):
-            vec = vec.tolist()
-        
-        # 处理嵌套列表情况
-        if isinstance(vec, list) and vec and isinstance(vec[0], (list, tuple)):
-            vec = vec[0]  # Extract first vector if nested
-        
-        # 转换为float列表
-        result = [float(x) for x in vec]
-        
-        # 检查维度
-        if len(result) != dimension:
-            print(f"[WARNING] Query向量维度异常: 期望{dimension}, 实际{len(result)}")
+        mat = embed_queries_memoized(list(queries), embedder)
+        if mat.shape[1] != dimension:
+            print(f"[WARNING] Query向量维度异常: 期望{dimension}, 实际{mat.shape[1]}")
             # 用零向量填充或截断
-            if len(result) < dimension:
-                result.extend([0.0] * (dimension - len(result)))
-            else:
-                result = result[:dimension]
-        
-        return result
+            mat = fit_dimension(mat, dimension)
+        return mat
     except Exception as e:
         print(f"[WARNING] Query embedding failed: {e}")
-        # Return zero vector as fallback
-        return [0.0] * dimension
+        # Return zero vectors as fallback
+        return np.zeros((len(queries), dimension), dtype=np.float32)
+
+
+def embed_query(query: str, as_array: bool = False):
+    """
+    Embed query using unified embedding (百炼 with fallback).
+    Returns List[float] by default, or a float32 ndarray of shape (d,) when as_array=True.
+    """
+    vec = embed_queries([query])[0]
+    return vec if as_array else vec.tolist()
 
 
 def search_vectors(
@@ -687,7 +1140,7 @@ def search_vectors(
         store = _create_default_vector_store()
     
     # Embed query with unified embedder
-    qv = embed_query(query)
+    qv = embed_query(query, as_array=True)
     
     # Build filter for RAG data
     where = {"memory_type": "rag_chunk"}
@@ -711,8 +1164,8 @@ def search_vectors(
 
 def _prompt_mqe(query: str, n: int) -> List[str]:
     try:
-        from ...core.llm import HelloAgentsLLM
-        llm = HelloAgentsLLM()
+        from ...core.llm import get_default_llm
+        llm = get_default_llm()
         prompt = [
             {"role": "system", "content": "你是检索查询扩展助手。生成语义等价或互补的多样化查询。使用中文，简短，避免标点。"},
             {"role": "user", "content": f"原始查询：{query}\n请给出{n}个不同表述的查询，每行一个。"}
@@ -727,8 +1180,8 @@ def _prompt_mqe(query: str, n: int) -> List[str]:
 
 def _prompt_hyde(query: str) -> Optional[str]:
     try:
-        from ...core.llm import HelloAgentsLLM
-        llm = HelloAgentsLLM()
+        from ...core.llm import get_default_llm
+        llm = get_default_llm()
         prompt = [
             {"role": "system", "content": "根据用户问题，先写一段可能的答案性段落，用于向量检索的查询文档（不要分析过程）。"},
             {"role": "user", "content": f"问题：{query}\n请直接写一段中等长度、客观、包含关键术语的段落。"}
@@ -751,7 +1204,10 @@ def search_vectors_expanded(
     candidate_pool_multiplier: int = 4,
 ) -> List[Dict]:
     """
-    Search with query expansion using unified embedding and Qdrant.
+    Search with query expansion using unified embedding and the vector store.
+    MQE and HyDE prompts run concurrently while the original query is embedded; the
+    expansions are then embedded in one batch and searched with one batched query, so
+    latency is roughly one LLM call plus one search.
     """
     if not query:
         return []
@@ -760,15 +1216,23 @@ def search_vectors_expanded(
     if store is None:
         store = _create_default_vector_store()
     
-    # expansions
+    # expansions (LLM calls run in parallel with embedding the original query)
     expansions: List[str] = [query]
-    
-    if enable_mqe and mqe_expansions > 0:
-        expansions.extend(_prompt_mqe(query, mqe_expansions))
-    if enable_hyde:
-        hyde_text = _prompt_hyde(query)
-        if hyde_text:
-            expansions.append(hyde_text)
+    use_mqe = enable_mqe and mqe_expansions > 0
+    executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="rag-expand") if (use_mqe or enable_hyde) else None
+    try:
+        mqe_future = executor.submit(_prompt_mqe, query, mqe_expansions) if use_mqe else None
+        hyde_future = executor.submit(_prompt_hyde, query) if enable_hyde else None
+        query_vec = embed_query(query, as_array=True)
+        if mqe_future is not None:
+            expansions.extend(mqe_future.result())
+        if hyde_future is not None:
+            hyde_text = hyde_future.result()
+            if hyde_text:
+                expansions.append(hyde_text)
+    finally:
+        if executor is not None:
+            executor.shutdown(wait=False)
 
     # unique and trim
     uniq: List[str] = []
@@ -789,11 +1253,18 @@ def search_vectors_expanded(
     if rag_namespace:
         where["rag_namespace"] = rag_namespace
 
+    # embed remaining expansions in one batch, then one batched search for all of them
+    extra = expansions[1:]
+    qmat = np.vstack([query_vec[None, :], embed_queries(extra)]) if extra else query_vec[None, :]
+    batch_search = getattr(store, "search_similar_batch", None)
+    if batch_search is not None:
+        hit_lists = batch_search(query_vectors=qmat, limit=per, score_threshold=score_threshold, where=where)
+    else:
+        hit_lists = [store.search_similar(query_vector=qv, limit=per, score_threshold=score_threshold, where=where) for qv in qmat]
+
     # collect hits across expansions
     agg: Dict[str, Dict] = {}
-    for q in expansions:
-        qv = embed_query(q)
-        hits = store.search_similar(query_vector=qv, limit=per, score_threshold=score_threshold, where=where)
+    for hits in hit_lists:
         for h in hits:
             mid = h.get("metadata", {}).get("memory_id", h.get("id"))
             s = float(h.get("score", 0.0))
@@ -1111,8 +1582,8 @@ def tldr_summarize(text: str, bullets: int = 3) -> Optional[str]:
     try:
         if not text or len(text.strip()) == 0:
             return None
-        from ...core.llm import HelloAgentsLLM
-        llm = HelloAgentsLLM()
+        from ...core.llm import get_default_llm
+        llm = get_default_llm()
         prompt = [
             {"role": "system", "content": "请将以下内容概括为简洁的要点列表（最多3-5条），用中文，避免重复，突出关键信息。"},
             {"role": "user", "content": f"请用 {max(1, min(5, int(bullets)))} 条要点总结：\n\n{text}"},
@@ -1134,14 +1605,14 @@ def create_rag_pipeline(
     rag_namespace: str = "default"
 ) -> Dict[str, Any]:
     """
-    Create a complete RAG pipeline with Qdrant and unified embedding.
+    Create a complete RAG pipeline with a vector store (Qdrant by default) and unified embedding.
     
     Returns:
         Dict containing store, namespace, and helper functions
     """
     dimension = get_dimension(384)
     
-    store = QdrantVectorStore(
+    store = create_vector_store(
         url=qdrant_url,
         api_key=qdrant_api_key,
         collection_name=collection_name,
@@ -1149,21 +1620,39 @@ def create_rag_pipeline(
         distance="cosine"
     )
     
-    def add_documents(file_paths: List[str], chunk_size: int = 800, chunk_overlap: int = 100):
-        """Add documents to RAG pipeline"""
-        chunks = load_and_chunk_texts(
+    # Per collection/namespace record of indexed files for incremental re-indexing
+    manifest = DocumentManifest(collection=collection_name, namespace=rag_namespace)
+    
+    def add_documents_stream(
+        file_paths: List[str],
+        chunk_size: int = 800,
+        chunk_overlap: int = 100,
+        upsert_batch_size: int = 256,
+        progress_callback: Optional[Callable[[Dict[str, Any]], None]] = None,
+        incremental: bool = True
+    ) -> Dict[str, Any]:
+        """Add files or directories with bounded memory; unchanged files are skipped when incremental. Returns ingest stats"""
+        return stream_index_documents(
             paths=file_paths,
+            store=store,
             chunk_size=chunk_size,
             chunk_overlap=chunk_overlap,
-            namespace=rag_namespace,
-            source_label="rag"
+            rag_namespace=rag_namespace,
+            source_label="rag",
+            upsert_batch_size=upsert_batch_size,
+            progress_callback=progress_callback,
+            manifest=manifest if incremental else None
         )
-        index_chunks(
-            store=store,
-            chunks=chunks,
-            rag_namespace=rag_namespace
+    
+    def add_documents(file_paths: List[str], chunk_size: int = 800, chunk_overlap: int = 100, incremental: bool = True):
+        """Add documents to RAG pipeline"""
+        stats = add_documents_stream(
+            file_paths=file_paths,
+            chunk_size=chunk_size,
+            chunk_overlap=chunk_overlap,
+            incremental=incremental
         )
-        return len(chunks)
+        return stats["chunks_indexed"]
     
     def search(query: str, top_k: int = 8, score_threshold: Optional[float] = None):
         """Search RAG knowledge base"""
@@ -1200,7 +1689,9 @@ def create_rag_pipeline(
     return {
         "store": store,
         "namespace": rag_namespace,
+        "manifest": manifest,
         "add_documents": add_documents,
+        "add_documents_stream": add_documents_stream,
         "search": search,
         "search_advanced": search_advanced,
         "get_stats": get_stats
@@ -2,16 +2,25 @@
 
 按照第8章架构设计的存储层：
 - DocumentStore: 文档存储
+- VectorStore: 向量存储抽象接口（VECTOR_STORE_BACKEND 选择后端）
 - QdrantVectorStore: Qdrant向量存储
+- EmbeddedVectorStore: 进程内嵌入式向量存储（内存映射矩阵 + IVF）
 - Neo4jGraphStore: Neo4j图存储
 """
 
+from .vector_store import VectorStore, get_vector_store, create_vector_store
 from .qdrant_store import QdrantVectorStore, QdrantConnectionManager
+from .embedded_store import EmbeddedVectorStore, EmbeddedStoreManager
 from .neo4j_store import Neo4jGraphStore
 from .document_store import DocumentStore, SQLiteDocumentStore
 __all__ = [
+    "VectorStore",
+    "get_vector_store",
+    "create_vector_store",
     "QdrantVectorStore",
     "QdrantConnectionManager",
+    "EmbeddedVectorStore",
+    "EmbeddedStoreManager",
     "Neo4jGraphStore",
     "DocumentStore",
     "SQLiteDocumentStore"
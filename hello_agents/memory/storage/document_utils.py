@@ -0,0 +1,83 @@
+"""文档存储辅助函数（情景记忆与感知记忆共用）"""
+
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional
+import os
+import threading
+
+
+def fetch_documents(doc_store: Any, memory_ids: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+    """
+    按ID读取权威记录，返回 {memory_id: 记录}，不存在的ID不出现在结果中
+
+    DocumentStore 目前只提供单条 get_memory，这里逐条读取（重复ID只读一次）。
+    """
+    docs: Dict[str, Dict[str, Any]] = {}
+    for mem_id in dict.fromkeys(memory_ids):
+        doc = doc_store.get_memory(mem_id)
+        if doc:
+            docs[mem_id] = doc
+    return docs
+
+
+class DocumentCache:
+    """
+    已解码记录的读穿缓存（按 memory_id 的有界 LRU）
+
+    检索时命中的记录直接复用，只有未命中的ID才访问 doc_store；
+    记忆的新增/更新/删除路径必须调用 invalidate（清空时调用 clear），缓存才不会返回旧记录。
+    返回的记录与缓存共享，调用方只读不改。
+    """
+
+    def __init__(self, doc_store: Any, max_entries: Optional[int] = None):
+        self.doc_store = doc_store
+        if max_entries is None:
+            max_entries = int(os.getenv("DOC_CACHE_MAX_ENTRIES", "4096"))
+        self.max_entries = max(0, max_entries)
+        self._docs: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        # 每次失效递增：读取期间发生过失效的结果不写回，避免并发更新后缓存旧记录
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    def fetch(self, memory_ids: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """同 fetch_documents，命中缓存的ID不再读取 doc_store"""
+        ids = list(dict.fromkeys(memory_ids))
+        docs: Dict[str, Dict[str, Any]] = {}
+        with self._lock:
+            generation = self._generation
+            for mem_id in ids:
+                doc = self._docs.get(mem_id)
+                if doc is not None:
+                    self._docs.move_to_end(mem_id)
+                    docs[mem_id] = doc
+            self.hits += len(docs)
+            self.misses += len(ids) - len(docs)
+        missing = [mem_id for mem_id in ids if mem_id not in docs]
+        if not missing:
+            return docs
+        loaded = fetch_documents(self.doc_store, missing)
+        if self.max_entries:
+            with self._lock:
+                if generation == self._generation:
+                    self._docs.update(loaded)
+                    while len(self._docs) > self.max_entries:
+                        self._docs.popitem(last=False)
+        docs.update(loaded)
+        return {mem_id: docs[mem_id] for mem_id in ids if mem_id in docs}
+
+    def invalidate(self, *memory_ids: str) -> None:
+        with self._lock:
+            self._generation += 1
+            for mem_id in memory_ids:
+                self._docs.pop(mem_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._docs.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"entries": len(self._docs), "hits": self.hits, "misses": self.misses}
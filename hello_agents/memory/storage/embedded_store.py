@@ -0,0 +1,734 @@
+"""
+进程内嵌入式向量存储实现
+
+不依赖外部服务，适用于测试、CI与边缘部署：
+- 向量：内存映射的 float32 矩阵文件（按行存储，容量倍增扩展，删除的行被复用）
+- payload：SQLite（每个点一行，JSON序列化）
+- 近似检索：IVF（k-means 粗聚类 + nprobe 探测）；点数低于阈值时使用精确矩阵乘
+- 过滤：常用 payload 字段的倒排索引（值 -> 行集合），where 条件求交集后再打分；
+  首次按未索引字段过滤时自动补建该字段的索引
+
+环境变量：
+- EMBEDDED_VECTOR_PATH：数据目录（默认 ./memory_data/vector_index）
+- EMBEDDED_IVF_MIN_POINTS：启用IVF的最少点数（默认 20000）
+- EMBEDDED_IVF_NPROBE：每次查询探测的聚类数（默认 16）
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional, Any, Set, Tuple, Union
+
+import numpy as np
+
+from .vector_store import VectorStore
+
+logger = logging.getLogger(__name__)
+
+
+# 默认建立倒排索引的payload字段（与Qdrant后端的payload索引一致）
+DEFAULT_INDEXED_FIELDS = (
+    "memory_type", "user_id", "memory_id", "timestamp", "modality", "source",
+    "external", "namespace", "is_rag_data", "rag_namespace", "data_source",
+)
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+
+def _index_key(value: Any) -> Optional[Tuple[str, Any]]:
+    """倒排索引键：区分 bool 与数值（True == 1 在Python中哈希相同）"""
+    if isinstance(value, bool):
+        return ("b", value)
+    if isinstance(value, (int, float)):
+        return ("n", value)
+    if isinstance(value, str):
+        return ("s", value)
+    return None
+
+
+class EmbeddedStoreManager:
+    """嵌入式向量存储管理器 - 同一数据目录与集合在进程内只打开一次"""
+    _instances = {}  # key: (path, collection_name) -> EmbeddedVectorStore instance
+    _lock = threading.Lock()
+
+    @classmethod
+    def get_instance(
+        cls,
+        collection_name: str = "hello_agents_vectors",
+        vector_size: int = 384,
+        distance: str = "cosine",
+        path: Optional[str] = None,
+        **kwargs
+    ) -> 'EmbeddedVectorStore':
+        """获取或创建嵌入式存储实例（单例模式）"""
+        path = os.path.abspath(path or os.getenv("EMBEDDED_VECTOR_PATH", "./memory_data/vector_index"))
+        key = (path, collection_name)
+        if key not in cls._instances:
+            with cls._lock:
+                if key not in cls._instances:
+                    logger.debug(f"🔄 打开嵌入式向量集合: {collection_name}")
+                    cls._instances[key] = EmbeddedVectorStore(
+                        path=path,
+                        collection_name=collection_name,
+                        vector_size=vector_size,
+                        distance=distance,
+                    )
+        return cls._instances[key]
+
+
+class EmbeddedVectorStore(VectorStore):
+    """内存映射矩阵 + IVF + payload倒排索引的进程内向量存储"""
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        collection_name: str = "hello_agents_vectors",
+        vector_size: int = 384,
+        distance: str = "cosine",
+        ivf_min_points: Optional[int] = None,
+        nprobe: Optional[int] = None,
+        **kwargs
+    ):
+        """
+        初始化嵌入式向量存储
+
+        Args:
+            path: 数据根目录，每个集合一个子目录
+            collection_name: 集合名称
+            vector_size: 向量维度
+            distance: 距离度量方式 (cosine, dot, euclidean)
+            ivf_min_points: 点数达到该值后训练IVF索引
+            nprobe: 查询时探测的聚类数
+        """
+        self.collection_name = collection_name
+        self.vector_size = int(vector_size)
+        self.distance = (distance or "cosine").lower()
+        if self.distance not in ("cosine", "dot", "euclidean"):
+            self.distance = "cosine"
+        self.ivf_min_points = ivf_min_points or _env_int("EMBEDDED_IVF_MIN_POINTS", 20000)
+        self.nprobe = nprobe or _env_int("EMBEDDED_IVF_NPROBE", 16)
+
+        root = os.path.abspath(path or os.getenv("EMBEDDED_VECTOR_PATH", "./memory_data/vector_index"))
+        self.dir = os.path.join(root, collection_name)
+        os.makedirs(self.dir, exist_ok=True)
+        self._vec_path = os.path.join(self.dir, "vectors.f32")
+        self._lock = threading.RLock()
+
+        self._conn = sqlite3.connect(os.path.join(self.dir, "payloads.db"), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS points (point_id TEXT PRIMARY KEY, row INTEGER NOT NULL, payload TEXT)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self._conn.commit()
+
+        self._load()
+
+    # ---- persistence ----
+
+    def _load(self):
+        """从磁盘恢复行映射、倒排索引与向量矩阵"""
+        stored_dim = self._conn.execute("SELECT value FROM meta WHERE key='dim'").fetchone()
+        if stored_dim and int(stored_dim[0]) != self.vector_size:
+            logger.warning(f"⚠️ 嵌入式集合维度变化 ({stored_dim[0]} -> {self.vector_size})，重建集合: {self.collection_name}")
+            self._reset_storage()
+        self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('dim', ?)", (str(self.vector_size),))
+        self._conn.commit()
+
+        self._id_rows: Dict[str, int] = {}
+        self._row_ids: Dict[int, str] = {}
+        self._row_keys: Dict[int, List[Tuple[str, Tuple[str, Any]]]] = {}
+        self._indexed_fields: Set[str] = set(DEFAULT_INDEXED_FIELDS)
+        self._inverted: Dict[str, Dict[Tuple[str, Any], Set[int]]] = {f: {} for f in self._indexed_fields}
+        self._next_row = 0
+
+        for point_id, row, payload in self._conn.execute("SELECT point_id, row, payload FROM points"):
+            self._id_rows[point_id] = row
+            self._row_ids[row] = point_id
+            self._index_payload(row, json.loads(payload) if payload else {})
+            self._next_row = max(self._next_row, row + 1)
+        self._free_rows = sorted(set(range(self._next_row)) - set(self._row_ids), reverse=True)
+
+        capacity = max(1024, self._next_row)
+        self._open_matrix(capacity)
+        self._alive = np.zeros(self._capacity, dtype=bool)
+        if self._row_ids:
+            self._alive[np.fromiter(self._row_ids.keys(), dtype=np.int64)] = True
+        self._reset_ivf()
+        logger.info(f"✅ 嵌入式向量集合就绪: {self.collection_name} points={len(self._id_rows)} dim={self.vector_size}")
+
+    def _reset_storage(self):
+        self._conn.execute("DELETE FROM points")
+        self._conn.execute("DELETE FROM meta")
+        self._conn.commit()
+        if os.path.exists(self._vec_path):
+            os.remove(self._vec_path)
+
+    def _open_matrix(self, capacity: int):
+        """打开（必要时扩展）内存映射矩阵文件"""
+        nbytes = capacity * self.vector_size * 4
+        if not os.path.exists(self._vec_path) or os.path.getsize(self._vec_path) < nbytes:
+            with open(self._vec_path, "ab") as f:
+                f.truncate(nbytes)
+        capacity = os.path.getsize(self._vec_path) // (self.vector_size * 4)
+        self._vecs = np.memmap(self._vec_path, dtype=np.float32, mode="r+", shape=(capacity, self.vector_size))
+        self._capacity = capacity
+
+    def _ensure_capacity(self, rows_needed: int):
+        if rows_needed <= self._capacity:
+            return
+        new_capacity = self._capacity
+        while new_capacity < rows_needed:
+            new_capacity *= 2
+        self._vecs.flush()
+        del self._vecs
+        self._open_matrix(new_capacity)
+        alive = np.zeros(self._capacity, dtype=bool)
+        alive[:len(self._alive)] = self._alive
+        self._alive = alive
+        if self._assign is not None:
+            assign = np.full(self._capacity, -1, dtype=np.int32)
+            assign[:len(self._assign)] = self._assign
+            self._assign = assign
+
+    # ---- payload inverted index ----
+
+    def _index_payload(self, row: int, payload: Dict[str, Any]):
+        keys = []
+        for field in self._indexed_fields:
+            if field not in payload:
+                continue
+            key = _index_key(payload[field])
+            if key is None:
+                continue
+            self._inverted[field].setdefault(key, set()).add(row)
+            keys.append((field, key))
+        self._row_keys[row] = keys
+
+    def _unindex_row(self, row: int):
+        for field, key in self._row_keys.pop(row, []):
+            rows = self._inverted.get(field, {}).get(key)
+            if rows is not None:
+                rows.discard(row)
+                if not rows:
+                    del self._inverted[field][key]
+
+    def _ensure_field_index(self, field: str):
+        """按需为未索引字段补建倒排索引（扫描一次payload）"""
+        if field in self._indexed_fields:
+            return
+        index: Dict[Tuple[str, Any], Set[int]] = {}
+        for row, payload in self._conn.execute("SELECT row, payload FROM points"):
+            value = (json.loads(payload) if payload else {}).get(field)
+            key = _index_key(value)
+            if key is None:
+                continue
+            index.setdefault(key, set()).add(row)
+            self._row_keys.setdefault(row, []).append((field, key))
+        self._inverted[field] = index
+        self._indexed_fields.add(field)
+        logger.debug(f"为字段 {field} 建立倒排索引: {len(index)} 个取值")
+
+    def _filter_rows(self, where: Optional[Dict[str, Any]]) -> Optional[np.ndarray]:
+        """where 等值条件 -> 命中行（None 表示不过滤）；与Qdrant后端一致，只处理标量条件"""
+        if not where:
+            return None
+        candidate: Optional[Set[int]] = None
+        for field, value in where.items():
+            key = _index_key(value)
+            if key is None:
+                continue
+            self._ensure_field_index(field)
+            rows = self._inverted[field].get(key, set())
+            candidate = set(rows) if candidate is None else candidate & rows
+            if not candidate:
+                return np.empty(0, dtype=np.int64)
+        if candidate is None:
+            return None
+        return np.fromiter(candidate, dtype=np.int64, count=len(candidate))
+
+    # ---- IVF ----
+
+    def _reset_ivf(self):
+        self._centroids: Optional[np.ndarray] = None
+        self._assign: Optional[np.ndarray] = None
+        self._lists: List[Set[int]] = []
+        self._list_cache: Dict[int, np.ndarray] = {}
+        self._trained_points = 0
+
+    def _nearest_centroids(self, x: np.ndarray, k: int = 1) -> np.ndarray:
+        """L2 意义下最近的聚类中心：argmax(x·c - |c|²/2)"""
+        scores = x @ self._centroids.T - 0.5 * self._centroid_norms
+        if k == 1:
+            return np.argmax(scores, axis=1)
+        k = min(k, scores.shape[1])
+        return np.argpartition(-scores, k - 1, axis=1)[:, :k]
+
+    def _maybe_train_ivf(self):
+        n_alive = len(self._id_rows)
+        if n_alive < self.ivf_min_points:
+            if self._centroids is not None:
+                self._reset_ivf()
+            return
+        if self._centroids is not None and n_alive < 2 * self._trained_points:
+            return
+
+        rows = np.flatnonzero(self._alive[:self._next_row])
+        nlist = int(min(4096, max(16, np.sqrt(len(rows)))))
+        rng = np.random.default_rng(0)
+        sample = rows if len(rows) <= nlist * 64 else rng.choice(rows, nlist * 64, replace=False)
+        sample.sort()
+        x = np.asarray(self._vecs[sample])
+        centroids = x[rng.choice(len(x), nlist, replace=False)].copy()
+        for _ in range(10):
+            norms = np.einsum("ij,ij->i", centroids, centroids)
+            assign = np.argmax(x @ centroids.T - 0.5 * norms, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assign, x)
+            counts = np.bincount(assign, minlength=nlist)
+            nonempty = counts > 0
+            centroids[nonempty] = sums[nonempty] / counts[nonempty, None]
+
+        self._centroids = centroids.astype(np.float32)
+        self._centroid_norms = np.einsum("ij,ij->i", self._centroids, self._centroids)
+        self._assign = np.full(self._capacity, -1, dtype=np.int32)
+        self._lists = [set() for _ in range(nlist)]
+        self._list_cache = {}
+        for start in range(0, len(rows), 65536):
+            part = rows[start:start + 65536]
+            labels = self._nearest_centroids(np.asarray(self._vecs[part]))
+            self._assign[part] = labels
+            for row, label in zip(part.tolist(), labels.tolist()):
+                self._lists[label].add(row)
+        self._trained_points = n_alive
+        logger.info(f"[Embedded] IVF trained: collection={self.collection_name} points={n_alive} nlist={nlist}")
+
+    def _ivf_add(self, rows: np.ndarray):
+        if self._centroids is None or len(rows) == 0:
+            return
+        labels = self._nearest_centroids(np.asarray(self._vecs[rows]))
+        for row, label in zip(rows.tolist(), labels.tolist()):
+            self._ivf_remove(row)
+            self._assign[row] = label
+            self._lists[label].add(row)
+            self._list_cache.pop(label, None)
+
+    def _ivf_remove(self, row: int):
+        if self._assign is None:
+            return
+        label = int(self._assign[row])
+        if label >= 0:
+            self._lists[label].discard(row)
+            self._list_cache.pop(label, None)
+            self._assign[row] = -1
+
+    def _ivf_candidates(self, query: np.ndarray) -> np.ndarray:
+        probes = self._nearest_centroids(query.reshape(1, -1), k=self.nprobe)[0]
+        parts = []
+        for label in probes.tolist():
+            arr = self._list_cache.get(label)
+            if arr is None:
+                members = self._lists[label]
+                arr = np.fromiter(members, dtype=np.int64, count=len(members))
+                self._list_cache[label] = arr
+            parts.append(arr)
+        return np.concatenate(parts) if parts else np.empty(0, dtype=np.int64)
+
+    # ---- VectorStore contract ----
+
+    def _prepare_payload(self, meta: Dict[str, Any], ts: int, copy: bool = True) -> Dict[str, Any]:
+        """补充时间戳并规范化 payload（与Qdrant后端一致）"""
+        payload = meta.copy() if copy else meta
+        payload["timestamp"] = ts
+        payload["added_at"] = ts
+        if "external" in payload and not isinstance(payload.get("external"), bool):
+            val = payload.get("external")
+            payload["external"] = True if str(val).lower() in ("1", "true", "yes") else False
+        return payload
+
+    def _as_matrix(self, vectors: Union[List[List[float]], np.ndarray]) -> Tuple[Optional[np.ndarray], Optional[np.ndarray]]:
+        """转换为 float32 (n, d) 矩阵；返回 (矩阵, 有效行掩码)，列表输入中维度不符的向量被跳过"""
+        valid = None
+        if isinstance(vectors, np.ndarray):
+            mat = vectors if vectors.ndim == 2 else vectors.reshape(1, -1)
+            if mat.shape[1] != self.vector_size:
+                logger.warning(f"⚠️ 向量维度不匹配: 期望{self.vector_size}, 实际{mat.shape[1]}")
+                return None, None
+            mat = mat.astype(np.float32, copy=True)
+        else:
+            valid = np.array([v is not None and len(v) == self.vector_size for v in vectors], dtype=bool)
+            if not valid.all():
+                logger.warning(f"⚠️ 向量维度不匹配: {int((~valid).sum())} 条期望{self.vector_size}维，已跳过")
+            if not valid.any():
+                return None, valid
+            mat = np.asarray([v for v, ok in zip(vectors, valid) if ok], dtype=np.float32)
+        if self.distance == "cosine":
+            norms = np.linalg.norm(mat, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            mat /= norms
+        return mat, valid
+
+    def add_vectors(
+        self,
+        vectors: Union[List[List[float]], np.ndarray],
+        metadata: List[Dict[str, Any]],
+        ids: Optional[List[str]] = None,
+        copy_metadata: bool = True
+    ) -> bool:
+        """
+        添加向量（已存在的ID原地覆盖）
+
+        Args:
+            vectors: 向量列表，或 float32 矩阵 (n, d)
+            metadata: 元数据列表
+            ids: 可选的ID列表
+            copy_metadata: 是否复制元数据后再补充时间戳
+
+        Returns:
+            bool: 是否成功
+        """
+        try:
+            if vectors is None or len(vectors) == 0:
+                logger.warning("⚠️ 向量列表为空")
+                return False
+            if ids is None:
+                ids = [f"vec_{i}_{int(datetime.now().timestamp() * 1000000)}" for i in range(len(vectors))]
+
+            mat, valid = self._as_matrix(vectors)
+            if mat is None:
+                return False
+            metas = list(metadata)
+            point_ids = [str(pid) for pid in ids]
+            if valid is not None and not valid.all():
+                metas = [m for m, ok in zip(metas, valid) if ok]
+                point_ids = [p for p, ok in zip(point_ids, valid) if ok]
+            n = min(len(mat), len(metas), len(point_ids))
+            if n == 0:
+                logger.warning("⚠️ 没有有效的向量点")
+                return False
+
+            now_ts = int(datetime.now().timestamp())
+            payloads = [self._prepare_payload(m, now_ts, copy_metadata) for m in metas[:n]]
+            with self._lock:
+                # 批内重复ID以最后一次为准
+                latest: Dict[str, int] = {}
+                for i, pid in enumerate(point_ids[:n]):
+                    latest[pid] = i
+                order = sorted(latest.values())
+
+                rows = np.empty(len(order), dtype=np.int64)
+                for j, i in enumerate(order):
+                    pid = point_ids[i]
+                    row = self._id_rows.get(pid)
+                    if row is None:
+                        row = self._free_rows.pop() if self._free_rows else self._next_row
+                        self._next_row = max(self._next_row, row + 1)
+                    rows[j] = row
+                self._ensure_capacity(self._next_row)
+
+                self._vecs[rows] = mat[order]
+                self._vecs.flush()
+                records = []
+                for j, i in enumerate(order):
+                    row = int(rows[j])
+                    pid = point_ids[i]
+                    self._unindex_row(row)
+                    self._id_rows[pid] = row
+                    self._row_ids[row] = pid
+                    self._index_payload(row, payloads[i])
+                    records.append((pid, row, json.dumps(payloads[i], ensure_ascii=False, default=str)))
+                self._conn.executemany("INSERT OR REPLACE INTO points (point_id, row, payload) VALUES (?, ?, ?)", records)
+                self._conn.commit()
+                self._alive[rows] = True
+
+                self._ivf_add(rows)
+                self._maybe_train_ivf()
+
+            logger.info(f"✅ 成功添加 {len(order)} 个向量到嵌入式集合 {self.collection_name}")
+            return True
+        except Exception as e:
+            logger.error(f"❌ 添加向量失败: {e}")
+            return False
+
+    def _score(self, rows: np.ndarray, queries: np.ndarray) -> np.ndarray:
+        """rows x queries 得分矩阵（euclidean 为距离）"""
+        mat = np.asarray(self._vecs[rows])
+        if self.distance == "euclidean":
+            sq = np.einsum("ij,ij->i", mat, mat)[:, None] - 2.0 * (mat @ queries.T) + np.einsum("ij,ij->i", queries, queries)[None, :]
+            return np.sqrt(np.maximum(sq, 0.0))
+        return mat @ queries.T
+
+    def _prepare_queries(self, query_vectors: Union[List[List[float]], np.ndarray]) -> Optional[np.ndarray]:
+        queries = np.asarray(query_vectors, dtype=np.float32)
+        if queries.ndim == 1:
+            queries = queries.reshape(1, -1)
+        if queries.shape[1] != self.vector_size:
+            logger.error(f"❌ 查询向量维度错误: 期望{self.vector_size}, 实际{queries.shape[1]}")
+            return None
+        if self.distance == "cosine":
+            norms = np.linalg.norm(queries, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            queries = queries / norms
+        return queries
+
+    def _candidates(self, query: np.ndarray, filtered: Optional[np.ndarray], limit: int) -> Optional[np.ndarray]:
+        """IVF探测候选行；未训练IVF、过滤后集合较小或候选不足时返回 None（精确搜索）"""
+        if self._centroids is None or (filtered is not None and len(filtered) < self.ivf_min_points):
+            return None
+        rows = self._ivf_candidates(query)
+        if filtered is not None:
+            rows = np.intersect1d(rows, filtered, assume_unique=True)
+        return rows if len(rows) >= limit else None
+
+    def _top_k(self, rows: np.ndarray, scores: np.ndarray, limit: int, score_threshold: Optional[float]) -> List[Tuple[int, float]]:
+        ascending = self.distance == "euclidean"
+        if score_threshold is not None:
+            keep = scores <= score_threshold if ascending else scores >= score_threshold
+            rows, scores = rows[keep], scores[keep]
+        k = min(limit, len(rows))
+        if k <= 0:
+            return []
+        order_key = scores if ascending else -scores
+        top = np.argpartition(order_key, k - 1)[:k] if k < len(rows) else np.arange(len(rows))
+        top = top[np.argsort(order_key[top], kind="stable")]
+        return [(int(r), float(sc)) for r, sc in zip(rows[top], scores[top])]
+
+    def _search_locked(
+        self,
+        queries: np.ndarray,
+        limit: int,
+        score_threshold: Optional[float],
+        where: Optional[Dict[str, Any]]
+    ) -> List[List[Dict[str, Any]]]:
+        filtered = self._filter_rows(where)
+        if filtered is not None and len(filtered) == 0:
+            return [[] for _ in range(len(queries))]
+        exact_rows = filtered if filtered is not None else np.flatnonzero(self._alive[:self._next_row])
+
+        ranked: List[List[Tuple[int, float]]] = [[] for _ in range(len(queries))]
+        exact: List[int] = []
+        for qi in range(len(queries)):
+            rows = self._candidates(queries[qi], filtered, limit)
+            if rows is None:
+                exact.append(qi)
+                continue
+            ranked[qi] = self._top_k(rows, self._score(rows, queries[qi:qi + 1])[:, 0], limit, score_threshold)
+        if exact and len(exact_rows):
+            # 精确路径：所有查询共享一次矩阵乘
+            scores = self._score(exact_rows, queries[exact])
+            for j, qi in enumerate(exact):
+                ranked[qi] = self._top_k(exact_rows, scores[:, j], limit, score_threshold)
+
+        point_ids = {self._row_ids[r] for hits in ranked for r, _ in hits}
+        payloads = self._fetch_payloads(list(point_ids))
+        results = []
+        for hits in ranked:
+            results.append([
+                {"id": self._row_ids[r], "score": sc, "metadata": payloads.get(self._row_ids[r], {})}
+                for r, sc in hits
+            ])
+        return results
+
+    def search_similar(
+        self,
+        query_vector: Union[List[float], np.ndarray],
+        limit: int = 10,
+        score_threshold: Optional[float] = None,
+        where: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        搜索相似向量
+
+        Args:
+            query_vector: 查询向量（列表或一维 ndarray）
+            limit: 返回结果数量限制
+            score_threshold: 相似度阈值（euclidean 为最大距离）
+            where: 过滤条件（字段等值）
+
+        Returns:
+            List[Dict]: 搜索结果
+        """
+        try:
+            if len(query_vector) != self.vector_size:
+                logger.error(f"❌ 查询向量维度错误: 期望{self.vector_size}, 实际{len(query_vector)}")
+                return []
+            queries = self._prepare_queries(query_vector)
+            with self._lock:
+                results = self._search_locked(queries, limit, score_threshold, where)[0]
+            logger.debug(f"🔍 嵌入式搜索返回 {len(results)} 个结果")
+            return results
+        except Exception as e:
+            logger.error(f"❌ 向量搜索失败: {e}")
+            return []
+
+    def search_similar_batch(
+        self,
+        query_vectors: Union[List[List[float]], np.ndarray],
+        limit: int = 10,
+        score_threshold: Optional[float] = None,
+        where: Optional[Dict[str, Any]] = None
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        批量搜索相似向量（过滤条件只求值一次，精确路径一次矩阵乘完成全部查询）
+
+        Args:
+            query_vectors: 查询向量列表，或 float32 矩阵 (n, d)
+            limit: 每个查询的返回结果数量
+            score_threshold: 相似度阈值
+            where: 过滤条件
+
+        Returns:
+            List[List[Dict]]: 与输入顺序一致的每个查询的结果
+        """
+        n = len(query_vectors)
+        if n == 0:
+            return []
+        try:
+            queries = self._prepare_queries(query_vectors)
+            if queries is None:
+                return [[] for _ in range(n)]
+            with self._lock:
+                return self._search_locked(queries, limit, score_threshold, where)
+        except Exception as e:
+            logger.error(f"❌ 批量向量搜索失败: {e}")
+            return [[] for _ in range(n)]
+
+    def _fetch_payloads(self, point_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        out: Dict[str, Dict[str, Any]] = {}
+        for start in range(0, len(point_ids), 500):
+            part = point_ids[start:start + 500]
+            placeholders = ",".join("?" * len(part))
+            for pid, payload in self._conn.execute(
+                f"SELECT point_id, payload FROM points WHERE point_id IN ({placeholders})", part
+            ):
+                out[pid] = json.loads(payload) if payload else {}
+        return out
+
+    def _delete_rows_locked(self, point_ids: List[str]) -> int:
+        removed = []
+        for pid in point_ids:
+            row = self._id_rows.pop(pid, None)
+            if row is None:
+                continue
+            self._row_ids.pop(row, None)
+            self._unindex_row(row)
+            self._ivf_remove(row)
+            self._alive[row] = False
+            self._free_rows.append(row)
+            removed.append((pid,))
+        if removed:
+            self._conn.executemany("DELETE FROM points WHERE point_id = ?", removed)
+            self._conn.commit()
+            self._free_rows.sort(reverse=True)
+        return len(removed)
+
+    def delete_vectors(self, ids: List[str]) -> bool:
+        """
+        删除向量
+
+        Args:
+            ids: 要删除的向量ID列表
+
+        Returns:
+            bool: 是否成功
+        """
+        try:
+            if not ids:
+                return True
+            with self._lock:
+                n = self._delete_rows_locked([str(i) for i in ids])
+                self._maybe_train_ivf()
+            logger.info(f"✅ 成功删除 {n} 个向量")
+            return True
+        except Exception as e:
+            logger.error(f"❌ 删除向量失败: {e}")
+            return False
+
+    def delete_memories(self, memory_ids: List[str]):
+        """删除指定记忆（通过payload中的 memory_id 倒排索引定位）"""
+        try:
+            if not memory_ids:
+                return
+            with self._lock:
+                self._ensure_field_index("memory_id")
+                rows: Set[int] = set()
+                index = self._inverted["memory_id"]
+                for mid in memory_ids:
+                    key = _index_key(mid)
+                    if key is not None:
+                        rows |= index.get(key, set())
+                n = self._delete_rows_locked([self._row_ids[r] for r in rows if r in self._row_ids])
+            logger.info(f"✅ 成功按memory_id删除 {n} 个嵌入式向量")
+        except Exception as e:
+            logger.error(f"❌ 删除记忆失败: {e}")
+            raise
+
+    def clear_collection(self) -> bool:
+        """
+        清空集合
+
+        Returns:
+            bool: 是否成功
+        """
+        try:
+            with self._lock:
+                self._vecs.flush()
+                del self._vecs
+                self._reset_storage()
+                self._load()
+            logger.info(f"✅ 成功清空嵌入式集合: {self.collection_name}")
+            return True
+        except Exception as e:
+            logger.error(f"❌ 清空集合失败: {e}")
+            return False
+
+    def get_collection_info(self) -> Dict[str, Any]:
+        """
+        获取集合信息
+
+        Returns:
+            Dict: 集合信息
+        """
+        with self._lock:
+            return {
+                "name": self.collection_name,
+                "points_count": len(self._id_rows),
+                "vectors_count": len(self._id_rows),
+                "capacity": self._capacity,
+                "index": "ivf" if self._centroids is not None else "flat",
+                "nlist": len(self._lists),
+                "indexed_fields": sorted(self._indexed_fields),
+                "config": {
+                    "vector_size": self.vector_size,
+                    "distance": self.distance,
+                },
+            }
+
+    def get_collection_stats(self) -> Dict[str, Any]:
+        """
+        获取集合统计信息（兼容抽象接口）
+        """
+        info = self.get_collection_info()
+        info["store_type"] = "embedded"
+        return info
+
+    def health_check(self) -> bool:
+        """
+        健康检查
+
+        Returns:
+            bool: 存储是否可用
+        """
+        try:
+            self._conn.execute("SELECT 1").fetchone()
+            return True
+        except Exception as e:
+            logger.error(f"❌ 嵌入式存储健康检查失败: {e}")
+            return False
@@ -11,6 +11,8 @@ from typing import Dict, List, Optional, Any, Union
 import numpy as np
 from datetime import datetime
 
+from .vector_store import VectorStore
+
 try:
     from qdrant_client import QdrantClient
     from qdrant_client.http import models
@@ -67,7 +69,7 @@ class QdrantConnectionManager:
             
         return cls._instances[key]
 
-class QdrantVectorStore:
+class QdrantVectorStore(VectorStore):
     """Qdrant向量数据库存储实现"""
     
     def __init__(
@@ -241,25 +243,51 @@ class QdrantVectorStore:
         except Exception as e:
             logger.debug(f"创建payload索引时出错: {e}")
     
+    def _prepare_payload(self, meta: Dict[str, Any], ts: int, copy: bool = True) -> Dict[str, Any]:
+        """补充时间戳并规范化 payload（copy=False 时原地修改）"""
+        payload = meta.copy() if copy else meta
+        payload["timestamp"] = ts
+        payload["added_at"] = ts
+        if "external" in payload and not isinstance(payload.get("external"), bool):
+            # normalize to bool
+            val = payload.get("external")
+            payload["external"] = True if str(val).lower() in ("1", "true", "yes") else False
+        return payload
+
+    @staticmethod
+    def _safe_point_id(point_id: Any) -> Any:
+        """确保点ID是Qdrant接受的类型（无符号整数或UUID字符串）"""
+        if isinstance(point_id, int):
+            return point_id
+        if isinstance(point_id, str):
+            try:
+                uuid.UUID(point_id)
+                return point_id
+            except Exception:
+                pass
+        return str(uuid.uuid4())
+
     def add_vectors(
         self, 
-        vectors: List[List[float]], 
+        vectors: Union[List[List[float]], np.ndarray], 
         metadata: List[Dict[str, Any]], 
-        ids: Optional[List[str]] = None
+        ids: Optional[List[str]] = None,
+        copy_metadata: bool = True
     ) -> bool:
         """
         添加向量到Qdrant
         
         Args:
-            vectors: 向量列表
+            vectors: 向量列表，或 float32 矩阵 (n, d)（整批校验维度，不逐条转换）
             metadata: 元数据列表
             ids: 可选的ID列表
+            copy_metadata: 是否复制元数据后再补充时间戳；调用方新建的元数据可传 False 原地修改
         
         Returns:
             bool: 是否成功
         """
         try:
-            if not vectors:
+            if vectors is None or len(vectors) == 0:
                 logger.warning("⚠️ 向量列表为空")
                 return False
                 
@@ -268,8 +296,12 @@ class QdrantVectorStore:
                 ids = [f"vec_{i}_{int(datetime.now().timestamp() * 1000000)}" 
                        for i in range(len(vectors))]
             
-            # 构建点数据
+            now_ts = int(datetime.now().timestamp())
             logger.info(f"[Qdrant] add_vectors start: n_vectors={len(vectors)} n_meta={len(metadata)} collection={self.collection_name}")
+            if isinstance(vectors, np.ndarray):
+                return self._add_matrix(vectors, metadata, ids, now_ts, copy_metadata)
+
+            # 构建点数据
             points = []
             for i, (vector, meta, point_id) in enumerate(zip(vectors, metadata, ids)):
                 # 确保向量是正确的维度
@@ -281,32 +313,11 @@ class QdrantVectorStore:
                 if vlen != self.vector_size:
                     logger.warning(f"⚠️ 向量维度不匹配: 期望{self.vector_size}, 实际{len(vector)}")
                     continue
-                    
-                # 添加时间戳到元数据
-                meta_with_timestamp = meta.copy()
-                meta_with_timestamp["timestamp"] = int(datetime.now().timestamp())
-                meta_with_timestamp["added_at"] = int(datetime.now().timestamp())
-                if "external" in meta_with_timestamp and not isinstance(meta_with_timestamp.get("external"), bool):
-                    # normalize to bool
-                    val = meta_with_timestamp.get("external")
-                    meta_with_timestamp["external"] = True if str(val).lower() in ("1", "true", "yes") else False
-                # 确保点ID是Qdrant接受的类型（无符号整数或UUID字符串）
-                safe_id: Any
-                if isinstance(point_id, int):
-                    safe_id = point_id
-                elif isinstance(point_id, str):
-                    try:
-                        uuid.UUID(point_id)
-                        safe_id = point_id
-                    except Exception:
-                        safe_id = str(uuid.uuid4())
-                else:
-                    safe_id = str(uuid.uuid4())
 
                 point = PointStruct(
-                    id=safe_id,
+                    id=self._safe_point_id(point_id),
                     vector=vector,
-                    payload=meta_with_timestamp
+                    payload=self._prepare_payload(meta, now_ts, copy_metadata)
                 )
                 points.append(point)
             
@@ -329,10 +340,78 @@ class QdrantVectorStore:
         except Exception as e:
             logger.error(f"❌ 添加向量失败: {e}")
             return False
+
+    def _add_matrix(
+        self,
+        matrix: np.ndarray,
+        metadata: List[Dict[str, Any]],
+        ids: List[Any],
+        ts: int,
+        copy_metadata: bool
+    ) -> bool:
+        """以列式 Batch 写入整块矩阵：维度一次性校验，向量不拆分为逐点对象"""
+        mat = matrix if matrix.ndim == 2 else matrix.reshape(1, -1)
+        if mat.shape[1] != self.vector_size:
+            logger.warning(f"⚠️ 向量维度不匹配: 期望{self.vector_size}, 实际{mat.shape[1]}")
+            return False
+        n = min(mat.shape[0], len(metadata), len(ids))
+        if n == 0:
+            logger.warning("⚠️ 没有有效的向量点")
+            return False
+        mat = mat[:n]
+        point_ids = [self._safe_point_id(pid) for pid in ids[:n]]
+        payloads = [self._prepare_payload(meta, ts, copy_metadata) for meta in metadata[:n]]
+        try:
+            batch = models.Batch(ids=point_ids, vectors=mat, payloads=payloads)
+        except Exception:
+            # 旧版客户端的 Batch 不接受 ndarray，整体转换一次
+            batch = models.Batch(ids=point_ids, vectors=mat.tolist(), payloads=payloads)
+
+        logger.info(f"[Qdrant] upsert begin: points={n}")
+        self.client.upsert(
+            collection_name=self.collection_name,
+            points=batch,
+            wait=True
+        )
+        logger.info("[Qdrant] upsert done")
+        logger.info(f"✅ 成功添加 {n} 个向量到Qdrant")
+        return True
     
+    def _build_filter(self, where: Optional[Dict[str, Any]]):
+        """where 等值条件 -> Qdrant Filter（仅处理标量值）"""
+        if not where:
+            return None
+        conditions = []
+        for key, value in where.items():
+            if isinstance(value, (str, int, float, bool)):
+                conditions.append(
+                    FieldCondition(
+                        key=key,
+                        match=MatchValue(value=value)
+                    )
+                )
+        return Filter(must=conditions) if conditions else None
+
+    def _search_params(self):
+        try:
+            return models.SearchParams(hnsw_ef=self.search_ef, exact=self.search_exact)
+        except Exception:
+            return None
+
+    @staticmethod
+    def _to_results(points) -> List[Dict[str, Any]]:
+        return [
+            {
+                "id": hit.id,
+                "score": hit.score,
+                "metadata": hit.payload or {}
+            }
+            for hit in points
+        ]
+
     def search_similar(
         self, 
-        query_vector: List[float], 
+        query_vector: Union[List[float], np.ndarray], 
         limit: int = 10, 
         score_threshold: Optional[float] = None,
         where: Optional[Dict[str, Any]] = None
@@ -341,7 +420,7 @@ class QdrantVectorStore:
         搜索相似向量
         
         Args:
-            query_vector: 查询向量
+            query_vector: 查询向量（列表或一维 ndarray）
             limit: 返回结果数量限制
             score_threshold: 相似度阈值
             where: 过滤条件
@@ -354,29 +433,9 @@ class QdrantVectorStore:
                 logger.error(f"❌ 查询向量维度错误: 期望{self.vector_size}, 实际{len(query_vector)}")
                 return []
             
-            # 构建过滤器
-            query_filter = None
-            if where:
-                conditions = []
-                for key, value in where.items():
-                    if isinstance(value, (str, int, float, bool)):
-                        conditions.append(
-                            FieldCondition(
-                                key=key,
-                                match=MatchValue(value=value)
-                            )
-                        )
-                
-                if conditions:
-                    query_filter = Filter(must=conditions)
-            
-            # 执行搜索
-            # 搜索参数
-            search_params = None
-            try:
-                search_params = models.SearchParams(hnsw_ef=self.search_ef, exact=self.search_exact)
-            except Exception:
-                search_params = None
+            # 构建过滤器与搜索参数
+            query_filter = self._build_filter(where)
+            search_params = self._search_params()
 
             # 兼容新旧 qdrant-client API
             # 1.16.0+ 使用 query_points(), <1.16.0 使用 search()
@@ -407,14 +466,7 @@ class QdrantVectorStore:
                 )
 
             # 转换结果格式
-            results = []
-            for hit in search_result:
-                result = {
-                    "id": hit.id,
-                    "score": hit.score,
-                    "metadata": hit.payload or {}
-                }
-                results.append(result)
+            results = self._to_results(search_result)
 
             logger.debug(f"🔍 Qdrant搜索返回 {len(results)} 个结果")
             return results
@@ -422,6 +474,90 @@ class QdrantVectorStore:
         except Exception as e:
             logger.error(f"❌ 向量搜索失败: {e}")
             return []
+
+    def search_similar_batch(
+        self,
+        query_vectors: Union[List[List[float]], np.ndarray],
+        limit: int = 10,
+        score_threshold: Optional[float] = None,
+        where: Optional[Dict[str, Any]] = None
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        批量搜索相似向量（一次往返完成多个查询，过滤条件共享）
+        
+        Args:
+            query_vectors: 查询向量列表，或 float32 矩阵 (n, d)
+            limit: 每个查询的返回结果数量
+            score_threshold: 相似度阈值
+            where: 过滤条件
+        
+        Returns:
+            List[List[Dict]]: 与输入顺序一致的每个查询的结果
+        """
+        n = len(query_vectors)
+        if n == 0:
+            return []
+        try:
+            if isinstance(query_vectors, np.ndarray):
+                mat = query_vectors if query_vectors.ndim == 2 else query_vectors.reshape(1, -1)
+                if mat.shape[1] != self.vector_size:
+                    logger.error(f"❌ 查询向量维度错误: 期望{self.vector_size}, 实际{mat.shape[1]}")
+                    return [[] for _ in range(n)]
+                vectors = mat.astype(np.float32, copy=False).tolist()
+            else:
+                vectors = [list(map(float, v)) for v in query_vectors]
+                if any(len(v) != self.vector_size for v in vectors):
+                    logger.error(f"❌ 查询向量维度错误: 期望{self.vector_size}")
+                    return [[] for _ in range(n)]
+
+            query_filter = self._build_filter(where)
+            search_params = self._search_params()
+
+            # 兼容新旧 qdrant-client API
+            # 1.10.0+ 使用 query_batch_points(), 更早版本使用 search_batch()
+            try:
+                requests = [
+                    models.QueryRequest(
+                        query=v,
+                        filter=query_filter,
+                        limit=limit,
+                        score_threshold=score_threshold,
+                        with_payload=True,
+                        with_vector=False,
+                        params=search_params
+                    )
+                    for v in vectors
+                ]
+                responses = self.client.query_batch_points(
+                    collection_name=self.collection_name,
+                    requests=requests
+                )
+                batches = [r.points for r in responses]
+            except AttributeError:
+                requests = [
+                    SearchRequest(
+                        vector=v,
+                        filter=query_filter,
+                        limit=limit,
+                        score_threshold=score_threshold,
+                        with_payload=True,
+                        with_vector=False,
+                        params=search_params
+                    )
+                    for v in vectors
+                ]
+                batches = self.client.search_batch(
+                    collection_name=self.collection_name,
+                    requests=requests
+                )
+
+            results = [self._to_results(points) for points in batches]
+            logger.debug(f"🔍 Qdrant批量搜索: {n} 个查询")
+            return results
+
+        except Exception as e:
+            logger.error(f"❌ 批量向量搜索失败: {e}")
+            return [[] for _ in range(n)]
     
     def delete_vectors(self, ids: List[str]) -> bool:
         """
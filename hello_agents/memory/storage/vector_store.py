@@ -0,0 +1,167 @@
+"""
+向量存储抽象接口与后端选择
+
+所有记忆类型与RAG管道只依赖 VectorStore 契约：
+add_vectors / search_similar(where=...) / search_similar_batch / delete_vectors / delete_memories /
+clear_collection / get_collection_stats / health_check
+
+后端通过环境变量 VECTOR_STORE_BACKEND 选择：
+- qdrant（默认）：QdrantVectorStore，需要Qdrant服务
+- embedded：EmbeddedVectorStore，进程内索引（内存映射float32矩阵 + IVF + payload倒排索引），
+  数据目录由 EMBEDDED_VECTOR_PATH 指定（默认 ./memory_data/vector_index）
+"""
+
+import os
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional, Any, Union
+import numpy as np
+
+
+class VectorStore(ABC):
+    """向量存储抽象基类"""
+
+    collection_name: str
+    vector_size: int
+
+    @abstractmethod
+    def add_vectors(
+        self,
+        vectors: Union[List[List[float]], np.ndarray],
+        metadata: List[Dict[str, Any]],
+        ids: Optional[List[str]] = None,
+        copy_metadata: bool = True
+    ) -> bool:
+        """添加（或按ID覆盖）向量及其payload"""
+        pass
+
+    @abstractmethod
+    def search_similar(
+        self,
+        query_vector: Union[List[float], np.ndarray],
+        limit: int = 10,
+        score_threshold: Optional[float] = None,
+        where: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
+        """相似度搜索；where 为字段等值过滤，返回 [{"id", "score", "metadata"}]"""
+        pass
+
+    def search_similar_batch(
+        self,
+        query_vectors: Union[List[List[float]], np.ndarray],
+        limit: int = 10,
+        score_threshold: Optional[float] = None,
+        where: Optional[Dict[str, Any]] = None
+    ) -> List[List[Dict[str, Any]]]:
+        """批量相似度搜索，结果与输入顺序一致；默认逐个调用 search_similar，后端可覆盖为单次往返"""
+        return [
+            self.search_similar(query_vector=qv, limit=limit, score_threshold=score_threshold, where=where)
+            for qv in query_vectors
+        ]
+
+    @abstractmethod
+    def delete_vectors(self, ids: List[str]) -> bool:
+        """按点ID删除向量"""
+        pass
+
+    @abstractmethod
+    def delete_memories(self, memory_ids: List[str]):
+        """按payload中的memory_id删除向量"""
+        pass
+
+    @abstractmethod
+    def clear_collection(self) -> bool:
+        """清空集合"""
+        pass
+
+    @abstractmethod
+    def get_collection_stats(self) -> Dict[str, Any]:
+        """集合统计信息（含 store_type）"""
+        pass
+
+    @abstractmethod
+    def health_check(self) -> bool:
+        """健康检查"""
+        pass
+
+
+def get_vector_backend() -> str:
+    return os.getenv("VECTOR_STORE_BACKEND", "qdrant").strip().lower()
+
+
+def get_vector_store(
+    url: Optional[str] = None,
+    api_key: Optional[str] = None,
+    collection_name: str = "hello_agents_vectors",
+    vector_size: int = 384,
+    distance: str = "cosine",
+    timeout: int = 30,
+    backend: Optional[str] = None,
+    **kwargs
+) -> VectorStore:
+    """
+    获取共享的向量存储实例（按后端与集合复用）
+
+    qdrant 后端委托给 QdrantConnectionManager；embedded 后端按 (数据目录, 集合) 复用，
+    同一进程内多个调用方看到同一份索引。
+    """
+    backend = backend or get_vector_backend()
+    if backend == "embedded":
+        from .embedded_store import EmbeddedStoreManager
+        return EmbeddedStoreManager.get_instance(
+            collection_name=collection_name,
+            vector_size=vector_size,
+            distance=distance,
+            **kwargs
+        )
+    if backend != "qdrant":
+        raise ValueError(f"不支持的向量存储后端: {backend}（可选: qdrant, embedded）")
+    from .qdrant_store import QdrantConnectionManager
+    return QdrantConnectionManager.get_instance(
+        url=url,
+        api_key=api_key,
+        collection_name=collection_name,
+        vector_size=vector_size,
+        distance=distance,
+        timeout=timeout,
+        **kwargs
+    )
+
+
+def create_vector_store(
+    url: Optional[str] = None,
+    api_key: Optional[str] = None,
+    collection_name: str = "hello_agents_vectors",
+    vector_size: int = 384,
+    distance: str = "cosine",
+    timeout: int = 30,
+    backend: Optional[str] = None,
+    **kwargs
+) -> VectorStore:
+    """
+    创建向量存储实例
+
+    qdrant 后端每次新建客户端连接；embedded 后端的数据与索引归进程内单例所有，
+    因此同样返回共享实例。
+    """
+    backend = backend or get_vector_backend()
+    if backend == "qdrant":
+        from .qdrant_store import QdrantVectorStore
+        return QdrantVectorStore(
+            url=url,
+            api_key=api_key,
+            collection_name=collection_name,
+            vector_size=vector_size,
+            distance=distance,
+            timeout=timeout,
+            **kwargs
+        )
+    return get_vector_store(
+        url=url,
+        api_key=api_key,
+        collection_name=collection_name,
+        vector_size=vector_size,
+        distance=distance,
+        timeout=timeout,
+        backend=backend,
+        **kwargs
+    )
@@ -9,6 +9,9 @@
 
 from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime, timedelta
+import bisect
+import heapq
+import itertools
 import os
 import math
 import json
@@ -18,7 +21,8 @@ logger = logging.getLogger(__name__)
 
 from ..base import BaseMemory, MemoryItem, MemoryConfig
 from ..storage import SQLiteDocumentStore, QdrantVectorStore
-from ..embedding import get_text_embedder, get_dimension
+from ..storage.document_utils import DocumentCache
+from ..embedding import get_text_embedder, get_dimension, embed_query_memoized
 
 class Episode:
     """情景记忆中的单个情景"""
@@ -56,9 +60,20 @@ class EpisodicMemory(BaseMemory):
     def __init__(self, config: MemoryConfig, storage_backend=None):
         super().__init__(config, storage_backend)
         
-        # 本地缓存（内存）
-        self.episodes: List[Episode] = []
-        self.sessions: Dict[str, List[str]] = {}  # session_id -> episode_ids
+        # 本地缓存（内存）与二级索引，在 add/update/remove/forget/clear 中同步维护，增删均为 O(1)；
+        # 公开的 episodes / sessions 列表视图由这些索引按需生成
+        self._by_id: Dict[str, Episode] = {}  # episode_id -> Episode（保持插入顺序）
+        self._by_user: Dict[str, Dict[str, None]] = {}  # user_id -> 有序episode_id集合
+        self._by_session: Dict[str, Dict[str, None]] = {}  # session_id -> 有序episode_id集合
+        self._episodes_view: Optional[List[Episode]] = None
+        self._sessions_view: Optional[Dict[str, List[str]]] = None
+        # 时间索引 (timestamp, seq, episode_id)：追加写入，乱序时在下次按时间读取前重新排序；
+        # 删除只从 _time_keys 去掉（惰性删除），失效条目过半时整体压缩
+        self._timeline: List[Tuple[float, int, str]] = []
+        self._timeline_sorted = True
+        self._timeline_stale = 0
+        self._time_keys: Dict[str, Tuple[float, int, str]] = {}  # episode_id -> 当前有效的时间键
+        self._seq = itertools.count()
         
         # 模式识别缓存
         self.patterns_cache = {}
@@ -69,15 +84,17 @@ class EpisodicMemory(BaseMemory):
         os.makedirs(db_dir, exist_ok=True)
         db_path = os.path.join(db_dir, "memory.db")
         self.doc_store = SQLiteDocumentStore(db_path=db_path)
+        # 检索时读取的已解码记录（LRU），在 add/update/remove/clear 中失效
+        self._doc_cache = DocumentCache(self.doc_store)
 
         # 统一嵌入模型（多语言，默认384维）
         self.embedder = get_text_embedder()
 
-        # 向量存储（Qdrant - 使用连接管理器避免重复连接）
-        from ..storage.qdrant_store import QdrantConnectionManager
+        # 向量存储（默认Qdrant，VECTOR_STORE_BACKEND=embedded 时为进程内索引；共享实例避免重复连接）
+        from ..storage.vector_store import get_vector_store
         qdrant_url = os.getenv("QDRANT_URL")
         qdrant_api_key = os.getenv("QDRANT_API_KEY")
-        self.vector_store = QdrantConnectionManager.get_instance(
+        self.vector_store = get_vector_store(
             url=qdrant_url,
             api_key=qdrant_api_key,
             collection_name=os.getenv("QDRANT_COLLECTION", "hello_agents_vectors"),
@@ -85,6 +102,20 @@ class EpisodicMemory(BaseMemory):
             distance=os.getenv("QDRANT_DISTANCE", "cosine")
         )
     
+    @property
+    def episodes(self) -> List[Episode]:
+        """全部情景（按加入顺序）"""
+        if self._episodes_view is None:
+            self._episodes_view = list(self._by_id.values())
+        return self._episodes_view
+
+    @property
+    def sessions(self) -> Dict[str, List[str]]:
+        """session_id -> episode_ids（按加入顺序）"""
+        if self._sessions_view is None:
+            self._sessions_view = {sid: list(ids) for sid, ids in self._by_session.items()}
+        return self._sessions_view
+
     def add(self, memory_item: MemoryItem) -> str:
         """添加情景记忆"""
         # 从元数据中提取情景信息
@@ -105,10 +136,7 @@ class EpisodicMemory(BaseMemory):
             outcome=outcome,
             importance=memory_item.importance
         )
-        self.episodes.append(episode)
-        if session_id not in self.sessions:
-            self.sessions[session_id] = []
-        self.sessions[session_id].append(episode.episode_id)
+        self._index_episode(episode)
 
         # 1) 权威存储（SQLite）
         ts_int = int(memory_item.timestamp.timestamp())
@@ -127,6 +155,7 @@ class EpisodicMemory(BaseMemory):
                 "tags": tags
             }
         )
+        self._doc_cache.invalidate(memory_item.id)
 
         # 2) 向量索引（Qdrant）
         try:
@@ -173,9 +202,11 @@ class EpisodicMemory(BaseMemory):
             )
             candidate_ids = {d["memory_id"] for d in docs}
 
-        # 向量检索（Qdrant）
+        # 向量检索（Qdrant）；调用方可通过 query_vector 传入已计算好的查询向量
         try:
-            query_vec = self.embedder.encode(query)
+            query_vec = kwargs.get("query_vector")
+            if query_vec is None:
+                query_vec = embed_query_memoized(query, self.embedder)
             if hasattr(query_vec, "tolist"):
                 query_vec = query_vec.tolist()
             where = {"memory_type": "episodic"}
@@ -189,9 +220,8 @@ class EpisodicMemory(BaseMemory):
         except Exception:
             hits = []
 
-        # 过滤与重排
-        now_ts = int(datetime.now().timestamp())
-        results: List[Tuple[float, MemoryItem]] = []
+        # 过滤候选命中（去重、已遗忘、结构化条件）
+        candidates: List[Tuple[str, Dict[str, Any]]] = []
         seen = set()
         for hit in hits:
             meta = hit.get("metadata", {})
@@ -200,7 +230,7 @@ class EpisodicMemory(BaseMemory):
                 continue
             
             # 检查是否已遗忘
-            episode = next((e for e in self.episodes if e.episode_id == mem_id), None)
+            episode = self._by_id.get(mem_id)
             if episode and episode.context.get("forgotten", False):
                 continue  # 跳过已遗忘的记忆
                 
@@ -208,9 +238,17 @@ class EpisodicMemory(BaseMemory):
                 continue
             if session_id and meta.get("session_id") != session_id:
                 continue
+            seen.add(mem_id)
+            candidates.append((mem_id, hit))
+
+        # 过滤后再统一从权威库读取完整记录
+        docs_by_id = self._doc_cache.fetch(mem_id for mem_id, _ in candidates)
 
-            # 从权威库读取完整记录
-            doc = self.doc_store.get_memory(mem_id)
+        # 重排
+        now_ts = int(datetime.now().timestamp())
+        results: List[Tuple[float, MemoryItem]] = []
+        for mem_id, hit in candidates:
+            doc = docs_by_id.get(mem_id)
             if not doc:
                 continue
 
@@ -245,7 +283,6 @@ class EpisodicMemory(BaseMemory):
                 }
             )
             results.append((combined, item))
-            seen.add(mem_id)
 
         # 若向量检索无结果，回退到简单关键词匹配（内存缓存）
         if not results:
@@ -287,18 +324,17 @@ class EpisodicMemory(BaseMemory):
     ) -> bool:
         """更新情景记忆（SQLite为权威，Qdrant按需重嵌入）"""
         updated = False
-        for episode in self.episodes:
-            if episode.episode_id == memory_id:
-                if content is not None:
-                    episode.content = content
-                if importance is not None:
-                    episode.importance = importance
-                if metadata is not None:
-                    episode.context.update(metadata.get("context", {}))
-                    if "outcome" in metadata:
-                        episode.outcome = metadata["outcome"]
-                updated = True
-                break
+        episode = self._by_id.get(memory_id)
+        if episode is not None:
+            if content is not None:
+                episode.content = content
+            if importance is not None:
+                episode.importance = importance
+            if metadata is not None:
+                episode.context.update(metadata.get("context", {}))
+                if "outcome" in metadata:
+                    episode.outcome = metadata["outcome"]
+            updated = True
 
         # 更新SQLite
         doc_updated = self.doc_store.update_memory(
@@ -307,6 +343,7 @@ class EpisodicMemory(BaseMemory):
             importance=importance,
             properties=metadata
         )
+        self._doc_cache.invalidate(memory_id)
 
         # 如内容变更，重嵌入并upsert到Qdrant
         if content is not None:
@@ -336,20 +373,11 @@ class EpisodicMemory(BaseMemory):
     
     def remove(self, memory_id: str) -> bool:
         """删除情景记忆（SQLite + Qdrant）"""
-        removed = False
-        for i, episode in enumerate(self.episodes):
-            if episode.episode_id == memory_id:
-                removed_episode = self.episodes.pop(i)
-                session_id = removed_episode.session_id
-                if session_id in self.sessions:
-                    self.sessions[session_id].remove(memory_id)
-                    if not self.sessions[session_id]:
-                        del self.sessions[session_id]
-                removed = True
-                break
+        removed = self._unindex_episode(memory_id) is not None
 
         # 权威库删除
         doc_deleted = self.doc_store.delete_memory(memory_id)
+        self._doc_cache.invalidate(memory_id)
         
         # 向量库删除
         try:
@@ -361,13 +389,20 @@ class EpisodicMemory(BaseMemory):
     
     def has_memory(self, memory_id: str) -> bool:
         """检查记忆是否存在"""
-        return any(episode.episode_id == memory_id for episode in self.episodes)
+        return memory_id in self._by_id
     
     def clear(self):
         """清空所有情景记忆（仅清理episodic，不影响其他类型）"""
         # 内存缓存
-        self.episodes.clear()
-        self.sessions.clear()
+        self._by_id.clear()
+        self._by_user.clear()
+        self._by_session.clear()
+        self._episodes_view = None
+        self._sessions_view = None
+        self._timeline.clear()
+        self._timeline_sorted = True
+        self._timeline_stale = 0
+        self._time_keys.clear()
         self.patterns_cache.clear()
 
         # SQLite内的episodic全部删除
@@ -375,6 +410,7 @@ class EpisodicMemory(BaseMemory):
         ids = [d["memory_id"] for d in docs]
         for mid in ids:
             self.doc_store.delete_memory(mid)
+        self._doc_cache.clear()
 
         # Qdrant按ID删除对应向量
         try:
@@ -390,28 +426,23 @@ class EpisodicMemory(BaseMemory):
         
         to_remove = []  # 收集要删除的记忆ID
         
-        for episode in self.episodes:
-            should_forget = False
-            
-            if strategy == "importance_based":
-                # 基于重要性遗忘
-                if episode.importance < threshold:
-                    should_forget = True
-            elif strategy == "time_based":
-                # 基于时间遗忘
-                cutoff_time = current_time - timedelta(days=max_age_days)
-                if episode.timestamp < cutoff_time:
-                    should_forget = True
-            elif strategy == "capacity_based":
-                # 基于容量遗忘（保留最重要的）
-                if len(self.episodes) > self.config.max_capacity:
-                    sorted_episodes = sorted(self.episodes, key=lambda e: e.importance)
-                    excess_count = len(self.episodes) - self.config.max_capacity
-                    if episode in sorted_episodes[:excess_count]:
-                        should_forget = True
-            
-            if should_forget:
-                to_remove.append(episode.episode_id)
+        if strategy == "importance_based":
+            # 基于重要性遗忘
+            to_remove = [eid for eid, e in self._by_id.items() if e.importance < threshold]
+        elif strategy == "time_based":
+            # 基于时间遗忘：时间索引上二分定位截止点，之前的全部删除
+            cutoff_ts = (current_time - timedelta(days=max_age_days)).timestamp()
+            timeline = self._sorted_timeline()
+            end = bisect.bisect_left(timeline, (cutoff_ts,))
+            to_remove = [key[2] for key in timeline[:end] if self._is_live(key)]
+        elif strategy == "capacity_based":
+            # 基于容量遗忘（保留最重要的）
+            excess_count = len(self._by_id) - self.config.max_capacity
+            if excess_count > 0:
+                to_remove = [
+                    e.episode_id
+                    for e in heapq.nsmallest(excess_count, self._by_id.values(), key=lambda e: e.importance)
+                ]
         
         # 执行硬删除
         for episode_id in to_remove:
@@ -424,7 +455,7 @@ class EpisodicMemory(BaseMemory):
     def get_all(self) -> List[MemoryItem]:
         """获取所有情景记忆（转换为MemoryItem格式）"""
         memory_items = []
-        for episode in self.episodes:
+        for episode in self._by_id.values():
             memory_item = MemoryItem(
                 id=episode.episode_id,
                 content=episode.content,
@@ -440,7 +471,7 @@ class EpisodicMemory(BaseMemory):
     def get_stats(self) -> Dict[str, Any]:
         """获取情景记忆统计信息（合并SQLite与Qdrant）"""
         # 硬删除模式：所有episodes都是活跃的
-        active_episodes = self.episodes
+        active_episodes = list(self._by_id.values())
         
         db_stats = self.doc_store.get_database_stats()
         try:
@@ -450,8 +481,8 @@ class EpisodicMemory(BaseMemory):
         return {
             "count": len(active_episodes),  # 活跃记忆数量
             "forgotten_count": 0,  # 硬删除模式下已遗忘的记忆会被直接删除
-            "total_count": len(self.episodes),  # 总记忆数量
-            "sessions_count": len(self.sessions),
+            "total_count": len(self._by_id),  # 总记忆数量
+            "sessions_count": len(self._by_session),
             "avg_importance": sum(e.importance for e in active_episodes) / len(active_episodes) if active_episodes else 0.0,
             "time_span_days": self._calculate_time_span(),
             "memory_type": "episodic",
@@ -461,11 +492,7 @@ class EpisodicMemory(BaseMemory):
     
     def get_session_episodes(self, session_id: str) -> List[Episode]:
         """获取指定会话的所有情景"""
-        if session_id not in self.sessions:
-            return []
-        
-        episode_ids = self.sessions[session_id]
-        return [e for e in self.episodes if e.episode_id in episode_ids]
+        return [self._by_id[eid] for eid in self._by_session.get(session_id, ())]
     
     def find_patterns(self, user_id: str = None, min_frequency: int = 2) -> List[Dict[str, Any]]:
         """发现用户行为模式"""
@@ -477,7 +504,7 @@ class EpisodicMemory(BaseMemory):
             return self.patterns_cache[cache_key]
         
         # 过滤情景
-        episodes = [e for e in self.episodes if user_id is None or e.user_id == user_id]
+        episodes = self._filter_episodes(user_id=user_id)
         
         # 简单的模式识别：基于内容关键词
         keyword_patterns = {}
@@ -527,11 +554,16 @@ class EpisodicMemory(BaseMemory):
     
     def get_timeline(self, user_id: str = None, limit: int = 50) -> List[Dict[str, Any]]:
         """获取时间线视图"""
-        episodes = [e for e in self.episodes if user_id is None or e.user_id == user_id]
-        episodes.sort(key=lambda x: x.timestamp, reverse=True)
+        if user_id is None:
+            # 时间索引已有序，直接倒序取最近的limit条
+            live = (key for key in reversed(self._sorted_timeline()) if self._is_live(key))
+            episodes = [self._by_id[eid] for _, _, eid in itertools.islice(live, limit)]
+        else:
+            user_ids = self._by_user.get(user_id, {})
+            episodes = heapq.nlargest(limit, (self._by_id[eid] for eid in user_ids), key=lambda e: self._time_keys[e.episode_id])
         
         timeline = []
-        for episode in episodes[:limit]:
+        for episode in episodes:
             timeline.append({
                 "episode_id": episode.episode_id,
                 "timestamp": episode.timestamp.isoformat(),
@@ -549,31 +581,97 @@ class EpisodicMemory(BaseMemory):
         session_id: str = None,
         time_range: Tuple[datetime, datetime] = None
     ) -> List[Episode]:
-        """过滤情景"""
-        filtered = self.episodes
+        """过滤情景：从最小的候选索引（用户/会话集合或时间区间）出发，再校验其余条件"""
+        candidates: List[List[str]] = []
+        if user_id:
+            candidates.append(list(self._by_user.get(user_id, ())))
+        if session_id:
+            candidates.append(list(self._by_session.get(session_id, ())))
+        if time_range:
+            start, end = self._time_slice(*time_range)
+            candidates.append([key[2] for key in self._timeline[start:end] if self._is_live(key)])
+        
+        if not candidates:
+            return list(self._by_id.values())
         
+        ids = min(candidates, key=len)
+        filtered = [self._by_id[eid] for eid in ids]
         if user_id:
             filtered = [e for e in filtered if e.user_id == user_id]
-        
         if session_id:
             filtered = [e for e in filtered if e.session_id == session_id]
-        
         if time_range:
             start_time, end_time = time_range
             filtered = [e for e in filtered if start_time <= e.timestamp <= end_time]
         
         return filtered
+
+    def _time_slice(self, start_time: datetime, end_time: datetime) -> Tuple[int, int]:
+        """时间区间 [start_time, end_time] 在 _timeline 中的下标范围（二分查找，区间内可能含失效条目）"""
+        timeline = self._sorted_timeline()
+        start = bisect.bisect_left(timeline, (start_time.timestamp(),))
+        end = bisect.bisect_right(timeline, (end_time.timestamp(), float("inf")))
+        return start, end
     
     def _calculate_time_span(self) -> float:
         """计算记忆时间跨度（天）"""
-        if not self.episodes:
+        if not self._time_keys:
             return 0.0
         
-        timestamps = [e.timestamp for e in self.episodes]
-        min_time = min(timestamps)
-        max_time = max(timestamps)
+        timeline = self._sorted_timeline()
+        first = next(key for key in timeline if self._is_live(key))
+        last = next(key for key in reversed(timeline) if self._is_live(key))
+        min_time = self._by_id[first[2]].timestamp
+        max_time = self._by_id[last[2]].timestamp
         
         return (max_time - min_time).days
+
+    def _index_episode(self, episode: Episode):
+        """写入内存缓存与全部二级索引（同ID重复写入时先移除旧条目）"""
+        eid = episode.episode_id
+        if eid in self._by_id:
+            self._unindex_episode(eid)
+        self._by_id[eid] = episode
+        self._by_user.setdefault(episode.user_id, {})[eid] = None
+        self._by_session.setdefault(episode.session_id, {})[eid] = None
+        self._episodes_view = None
+        self._sessions_view = None
+        key = (episode.timestamp.timestamp(), next(self._seq), eid)
+        if self._timeline and key < self._timeline[-1]:
+            self._timeline_sorted = False
+        self._timeline.append(key)
+        self._time_keys[eid] = key
+
+    def _unindex_episode(self, episode_id: str) -> Optional[Episode]:
+        """从内存缓存与全部二级索引中移除，返回被移除的情景"""
+        episode = self._by_id.pop(episode_id, None)
+        if episode is None:
+            return None
+        for index, key in ((self._by_user, episode.user_id), (self._by_session, episode.session_id)):
+            members = index.get(key)
+            if members is not None:
+                members.pop(episode_id, None)
+                if not members:
+                    del index[key]
+        self._episodes_view = None
+        self._sessions_view = None
+        if self._time_keys.pop(episode_id, None) is not None:
+            self._timeline_stale += 1
+            if self._timeline_stale * 2 > len(self._timeline):
+                self._timeline = [key for key in self._timeline if self._is_live(key)]
+                self._timeline_stale = 0
+        return episode
+
+    def _is_live(self, key: Tuple[float, int, str]) -> bool:
+        """时间索引条目是否仍有效（未被删除或被同ID新条目取代）"""
+        return self._time_keys.get(key[2]) == key
+
+    def _sorted_timeline(self) -> List[Tuple[float, int, str]]:
+        """按时间有序的时间索引（含失效条目，读取方用 _is_live 过滤）"""
+        if not self._timeline_sorted:
+            self._timeline.sort()
+            self._timeline_sorted = True
+        return self._timeline
     
     def _persist_episode(self, episode: Episode):
         """持久化情景到存储后端"""
@@ -17,8 +17,9 @@ import logging
 logger = logging.getLogger(__name__)
 
 from ..base import BaseMemory, MemoryItem, MemoryConfig
-from ..storage import SQLiteDocumentStore, QdrantVectorStore
-from ..embedding import get_text_embedder, get_dimension
+from ..storage import SQLiteDocumentStore, VectorStore
+from ..storage.document_utils import DocumentCache
+from ..embedding import get_text_embedder, get_dimension, embed_query_memoized
 
 class Perception:
     """感知数据实体"""
@@ -76,6 +77,8 @@ class PerceptualMemory(BaseMemory):
         os.makedirs(db_dir, exist_ok=True)
         db_path = os.path.join(db_dir, "memory.db")
         self.doc_store = SQLiteDocumentStore(db_path=db_path)
+        # 检索时读取的已解码记录（LRU），在 add/update/remove/clear 中失效
+        self._doc_cache = DocumentCache(self.doc_store)
 
         # 嵌入维度（与统一文本嵌入保持一致）
         self.text_embedder = get_text_embedder()
@@ -111,16 +114,16 @@ class PerceptualMemory(BaseMemory):
             self._clap_processor = None
             self._audio_dim = self.vector_dim
 
-        # 向量存储（Qdrant）— 按模态拆分集合，避免维度冲突，使用连接管理器避免重复连接
-        from ..storage.qdrant_store import QdrantConnectionManager
+        # 向量存储 — 按模态拆分集合，避免维度冲突，共享实例避免重复连接（VECTOR_STORE_BACKEND 选择后端）
+        from ..storage.vector_store import get_vector_store
         qdrant_url = os.getenv("QDRANT_URL")
         qdrant_api_key = os.getenv("QDRANT_API_KEY")
         base_collection = os.getenv("QDRANT_COLLECTION", "hello_agents_vectors")
         distance = os.getenv("QDRANT_DISTANCE", "cosine")
         
-        self.vector_stores: Dict[str, QdrantVectorStore] = {}
+        self.vector_stores: Dict[str, VectorStore] = {}
         # 文本集合
-        self.vector_stores["text"] = QdrantConnectionManager.get_instance(
+        self.vector_stores["text"] = get_vector_store(
             url=qdrant_url,
             api_key=qdrant_api_key,
             collection_name=f"{base_collection}_perceptual_text",
@@ -128,7 +131,7 @@ class PerceptualMemory(BaseMemory):
             distance=distance
         )
         # 图像集合（若CLIP不可用，维度退化为text维度）
-        self.vector_stores["image"] = QdrantConnectionManager.get_instance(
+        self.vector_stores["image"] = get_vector_store(
             url=qdrant_url,
             api_key=qdrant_api_key,
             collection_name=f"{base_collection}_perceptual_image",
@@ -136,7 +139,7 @@ class PerceptualMemory(BaseMemory):
             distance=distance
         )
         # 音频集合（若CLAP不可用，维度退化为text维度）
-        self.vector_stores["audio"] = QdrantConnectionManager.get_instance(
+        self.vector_stores["audio"] = get_vector_store(
             url=qdrant_url,
             api_key=qdrant_api_key,
             collection_name=f"{base_collection}_perceptual_audio",
@@ -185,6 +188,7 @@ class PerceptualMemory(BaseMemory):
                 "tags": memory_item.metadata.get("tags", []),
             }
         )
+        self._doc_cache.invalidate(memory_item.id)
 
         # 2) Qdrant 向量入库（按模态写入对应集合）
         try:
@@ -215,7 +219,9 @@ class PerceptualMemory(BaseMemory):
 
         # 仅在同模态情况下进行向量检索（跨模态需要CLIP/CLAP，此处保留简单回退）
         try:
-            qvec = self._encode_data(query, query_modality)
+            qvec = kwargs.get("query_vector") if query_modality == "text" else None
+            if qvec is None:
+                qvec = self._encode_data(query, query_modality)
             where = {"memory_type": "perceptual"}
             if user_id:
                 where["user_id"] = user_id
@@ -230,9 +236,8 @@ class PerceptualMemory(BaseMemory):
         except Exception:
             hits = []
 
-        # 融合排序
-        now_ts = int(datetime.now().timestamp())
-        results: List[Tuple[float, MemoryItem]] = []
+        # 候选命中去重与模态过滤，再统一从权威库读取完整记录
+        candidates: List[Tuple[str, Dict[str, Any]]] = []
         seen = set()
         for hit in hits:
             meta = hit.get("metadata", {})
@@ -241,7 +246,15 @@ class PerceptualMemory(BaseMemory):
                 continue
             if target_modality and meta.get("modality") != target_modality:
                 continue
-            doc = self.doc_store.get_memory(mem_id)
+            seen.add(mem_id)
+            candidates.append((mem_id, hit))
+        docs_by_id = self._doc_cache.fetch(mem_id for mem_id, _ in candidates)
+
+        # 融合排序
+        now_ts = int(datetime.now().timestamp())
+        results: List[Tuple[float, MemoryItem]] = []
+        for mem_id, hit in candidates:
+            doc = docs_by_id.get(mem_id)
             if not doc:
                 continue
             vec_score = float(hit.get("score", 0.0))
@@ -270,7 +283,6 @@ class PerceptualMemory(BaseMemory):
                           "vector_score": vec_score, "recency_score": recency_score}
             )
             results.append((combined, item))
-            seen.add(mem_id)
 
         # 简单回退：若无命中且有目标模态，则按SQLite结构化过滤+关键词兜底
         if not results:
@@ -318,6 +330,7 @@ class PerceptualMemory(BaseMemory):
             importance=importance,
             properties=metadata
         )
+        self._doc_cache.invalidate(memory_id)
 
         # 如内容或原始数据改变，则重嵌入并upsert到Qdrant
         if content is not None or (metadata and "raw_data" in metadata):
@@ -363,6 +376,7 @@ class PerceptualMemory(BaseMemory):
 
         # 权威库删除
         self.doc_store.delete_memory(memory_id)
+        self._doc_cache.invalidate(memory_id)
         # 向量库删除（所有模态集合尝试删除）
         for store in self.vector_stores.values():
             try:
@@ -424,6 +438,7 @@ class PerceptualMemory(BaseMemory):
         ids = [d["memory_id"] for d in docs]
         for mid in ids:
             self.doc_store.delete_memory(mid)
+        self._doc_cache.clear()
         # 删除Qdrant向量（所有模态集合）
         for store in self.vector_stores.values():
             try:
@@ -557,8 +572,8 @@ class PerceptualMemory(BaseMemory):
         return vec
     
     def _text_encoder(self, text: str) -> List[float]:
-        """文本编码器（使用嵌入模型）"""
-        emb = self.text_embedder.encode(text or "")
+        """文本编码器（使用嵌入模型；请求作用域内相同文本只编码一次）"""
+        emb = embed_query_memoized(text or "", self.text_embedder)
         if hasattr(emb, "tolist"):
             emb = emb.tolist()
         return emb
@@ -696,7 +711,7 @@ class PerceptualMemory(BaseMemory):
             except Exception:
                 pass
 
-    def _get_vector_store_for_modality(self, modality: Optional[str]) -> QdrantVectorStore:
+    def _get_vector_store_for_modality(self, modality: Optional[str]) -> VectorStore:
         mod = (modality or "text").lower()
         return self.vector_stores.get(mod, self.vector_stores["text"])
 
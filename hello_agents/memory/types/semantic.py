@@ -15,7 +15,7 @@ import math
 import numpy as np
 
 from ..base import BaseMemory, MemoryItem, MemoryConfig
-from ..embedding import get_text_embedder, get_dimension
+from ..embedding import get_text_embedder, get_dimension, embed_query_memoized
 
 
 # 配置日志
@@ -125,10 +125,9 @@ class SemanticMemory(BaseMemory):
         """初始化统一嵌入模型（由 embedding_provider 管理）。"""
         try:
             self.embedding_model = get_text_embedder()
-            # 轻量健康检查与日志
+            # 只读取维度用于日志，不做试编码（远程模型每次编码都是一次网络往返）
             try:
-                test_vec = self.embedding_model.encode("health_check")
-                dim = getattr(self.embedding_model, "dimension", len(test_vec))
+                dim = self.embedding_model.dimension
                 logger.info(f"✅ 嵌入模型就绪，维度: {dim}")
             except Exception:
                 logger.info("✅ 嵌入模型就绪")
@@ -143,12 +142,12 @@ class SemanticMemory(BaseMemory):
             # 获取数据库配置
             db_config = get_database_config()
             
-            # 初始化Qdrant向量数据库（使用连接管理器避免重复连接）
-            from ..storage.qdrant_store import QdrantConnectionManager
+            # 初始化向量数据库（VECTOR_STORE_BACKEND 选择后端，共享实例避免重复连接）
+            from ..storage.vector_store import get_vector_store
             qdrant_config = db_config.get_qdrant_config() or {}
             qdrant_config["vector_size"] = get_dimension()
-            self.vector_store = QdrantConnectionManager.get_instance(**qdrant_config)
-            logger.info("✅ Qdrant向量数据库初始化完成")
+            self.vector_store = get_vector_store(**qdrant_config)
+            logger.info("✅ 向量数据库初始化完成")
             
             # 初始化Neo4j图数据库
             try:
@@ -289,8 +288,8 @@ class SemanticMemory(BaseMemory):
         try:
             user_id = kwargs.get("user_id")
 
-            # 1. 向量检索
-            vector_results = self._vector_search(query, limit * 2, user_id)
+            # 1. 向量检索（可复用调用方传入的 query_vector）
+            vector_results = self._vector_search(query, limit * 2, user_id, query_vector=kwargs.get("query_vector"))
             
             # 2. 图检索
             graph_results = self._graph_search(query, limit * 2, user_id)
@@ -358,11 +357,19 @@ class SemanticMemory(BaseMemory):
             logger.error(f"❌ 检索语义记忆失败: {e}")
             return []
     
-    def _vector_search(self, query: str, limit: int, user_id: Optional[str] = None) -> List[Dict[str, Any]]:
+    def _vector_search(
+        self,
+        query: str,
+        limit: int,
+        user_id: Optional[str] = None,
+        query_vector: Optional[List[float]] = None
+    ) -> List[Dict[str, Any]]:
         """Qdrant向量搜索"""
         try:
             # 生成查询向量
-            query_embedding = self.embedding_model.encode(query)
+            query_embedding = query_vector if query_vector is not None else embed_query_memoized(query, self.embedding_model)
+            if not hasattr(query_embedding, "tolist"):
+                query_embedding = np.asarray(query_embedding, dtype=np.float32)
             
             # 构建过滤条件
             where_filter = {"memory_type": "semantic"}
@@ -7,12 +7,179 @@
 - 自动清理机制
 """
 
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Set, Tuple
 from datetime import datetime, timedelta
+from collections import Counter
+import functools
 import heapq
+import itertools
+import math
+import re
+import threading
 
 from ..base import BaseMemory, MemoryItem, MemoryConfig
 
+# 与 sklearn TfidfVectorizer 默认分词一致（小写，至少两个字符的词）
+_TOKEN_RE = re.compile(r"(?u)\b\w\w+\b")
+
+
+def _synchronized(method):
+    """在实例锁内执行：检索也会做过期清理并读取倒排索引，不能与其他读写并发"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._lock:
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+class _TfidfIndex:
+    """增量维护的 TF-IDF 倒排索引
+
+    - postings: term -> {memory_id: tf}，随 add/remove 增量更新
+    - idf 采用平滑公式 ln((1+N)/(1+df)) + 1（与 sklearn 默认一致）
+    - 文档范数按当前 idf 缓存；累计变更超过语料的 refresh_ratio 后缓存整体过期，
+      由查询命中的文档按需重算，因此相似度是对精确余弦的近似，
+      但写入与检索代价只与文档长度和查询词的倒排表长度相关
+    - 同时缓存小写内容、空白分词集合与字符二元组倒排表，供关键词/子串匹配使用，
+      避免每次查询重新切分全部记忆（中文无空格时子串匹配是主要的关键词信号）
+    """
+
+    def __init__(self, refresh_ratio: float = 0.1):
+        self.refresh_ratio = refresh_ratio
+        self.postings: Dict[str, Dict[str, int]] = {}
+        self.word_postings: Dict[str, Set[str]] = {}
+        self.gram_postings: Dict[str, Set[str]] = {}
+        self.doc_terms: Dict[str, Counter] = {}
+        self.doc_words: Dict[str, Set[str]] = {}
+        self.doc_lower: Dict[str, str] = {}
+        self._norms: Dict[str, Tuple[int, float]] = {}  # memory_id -> (version, norm)
+        self._version = 0
+        self._mutations = 0
+
+    def __len__(self) -> int:
+        return len(self.doc_terms)
+
+    def _idf(self, term: str) -> float:
+        n_docs = len(self.doc_terms)
+        df = len(self.postings.get(term, ()))
+        return math.log((1 + n_docs) / (1 + df)) + 1.0
+
+    def _norm(self, terms: Counter) -> float:
+        return math.sqrt(sum((tf * self._idf(t)) ** 2 for t, tf in terms.items()))
+
+    @staticmethod
+    def _grams(text: str) -> Set[str]:
+        if len(text) < 2:
+            return {text} if text else set()
+        return {text[i:i + 2] for i in range(len(text) - 1)}
+
+    def _touch(self):
+        self._mutations += 1
+        if self._mutations > max(1.0, self.refresh_ratio * len(self.doc_terms)):
+            self._version += 1
+            self._mutations = 0
+
+    def _doc_norm(self, doc_id: str) -> float:
+        cached = self._norms.get(doc_id)
+        if cached is not None and cached[0] == self._version:
+            return cached[1]
+        norm = self._norm(self.doc_terms[doc_id])
+        self._norms[doc_id] = (self._version, norm)
+        return norm
+
+    def add(self, doc_id: str, text: str):
+        if doc_id in self.doc_terms:
+            self.remove(doc_id)
+        lower = text.lower()
+        terms = Counter(_TOKEN_RE.findall(lower))
+        words = set(lower.split())
+        self.doc_terms[doc_id] = terms
+        self.doc_words[doc_id] = words
+        self.doc_lower[doc_id] = lower
+        for term, tf in terms.items():
+            self.postings.setdefault(term, {})[doc_id] = tf
+        for word in words:
+            self.word_postings.setdefault(word, set()).add(doc_id)
+        for gram in self._grams(lower) | set(lower):
+            self.gram_postings.setdefault(gram, set()).add(doc_id)
+        self._touch()
+        self._norms[doc_id] = (self._version, self._norm(terms))
+
+    def remove(self, doc_id: str):
+        terms = self.doc_terms.pop(doc_id, None)
+        if terms is None:
+            return
+        for term in terms:
+            docs = self.postings.get(term)
+            if docs is not None:
+                docs.pop(doc_id, None)
+                if not docs:
+                    del self.postings[term]
+        for word in self.doc_words.pop(doc_id, ()):
+            docs = self.word_postings.get(word)
+            if docs is not None:
+                docs.discard(doc_id)
+                if not docs:
+                    del self.word_postings[word]
+        lower = self.doc_lower.pop(doc_id, "")
+        for gram in self._grams(lower) | set(lower):
+            docs = self.gram_postings.get(gram)
+            if docs is not None:
+                docs.discard(doc_id)
+                if not docs:
+                    del self.gram_postings[gram]
+        self._norms.pop(doc_id, None)
+        self._touch()
+
+    def clear(self):
+        self.postings.clear()
+        self.word_postings.clear()
+        self.gram_postings.clear()
+        self.doc_terms.clear()
+        self.doc_words.clear()
+        self.doc_lower.clear()
+        self._norms.clear()
+        self._version = 0
+        self._mutations = 0
+
+    def cosine_scores(self, query: str) -> Dict[str, float]:
+        """只遍历查询词的倒排表，返回 {memory_id: 余弦相似度}"""
+        q_terms = Counter(_TOKEN_RE.findall(query.lower()))
+        weights = {t: tf * self._idf(t) for t, tf in q_terms.items() if t in self.postings}
+        if not weights:
+            return {}
+        q_norm = math.sqrt(sum((tf * self._idf(t)) ** 2 for t, tf in q_terms.items()))
+        acc: Dict[str, float] = {}
+        for term, q_weight in weights.items():
+            idf = self._idf(term)
+            for doc_id, tf in self.postings[term].items():
+                acc[doc_id] = acc.get(doc_id, 0.0) + q_weight * tf * idf
+        scores: Dict[str, float] = {}
+        for doc_id, dot in acc.items():
+            norm = self._doc_norm(doc_id)
+            if norm > 0:
+                scores[doc_id] = min(1.0, dot / (q_norm * norm))
+        return scores
+
+    def word_candidates(self, words: Set[str]) -> Set[str]:
+        """包含任一查询词（空白分词）的记忆"""
+        out: Set[str] = set()
+        for word in words:
+            out |= self.word_postings.get(word, set())
+        return out
+
+    def substring_candidates(self, query_lower: str) -> Set[str]:
+        """包含完整查询串的记忆：先按字符二元组倒排表求交集，再逐个确认"""
+        grams = sorted(self._grams(query_lower), key=lambda g: len(self.gram_postings.get(g, ())))
+        if not grams:
+            return set()
+        candidates = set(self.gram_postings.get(grams[0], set()))
+        for gram in grams[1:]:
+            if not candidates:
+                break
+            candidates &= self.gram_postings.get(gram, set())
+        return {d for d in candidates if query_lower in self.doc_lower[d]}
+
 class WorkingMemory(BaseMemory):
     """工作记忆实现
     
@@ -34,95 +201,103 @@ class WorkingMemory(BaseMemory):
         self.current_tokens = 0
         self.session_start = datetime.now()
         
-        # 内存存储（工作记忆不需要持久化）
-        self.memories: List[MemoryItem] = []
+        # 内存存储（工作记忆不需要持久化）：id -> 记忆，保持插入顺序
+        self._by_id: Dict[str, MemoryItem] = {}
+        # 每条记忆的token数缓存（避免重复切分内容）
+        self._tokens: Dict[str, int] = {}
+        
+        # 优先级索引：小顶堆 (priority_key, seq, memory_id)，惰性删除；
+        # _heap_entry 记录每条记忆当前有效的堆条目，其余条目在弹出时跳过
+        self.memory_heap: List[Tuple[float, int, str]] = []
+        self._heap_entry: Dict[str, Tuple[float, int, str]] = {}
+        # TTL索引：按时间戳排序的小顶堆 (timestamp, seq, memory_id)
+        self._ttl_heap: List[Tuple[datetime, int, str]] = []
+        self._seq = itertools.count()
         
-        # 使用优先级队列管理记忆
-        self.memory_heap = []  # (priority, timestamp, memory_item)
+        # 检索索引：增量维护的 TF-IDF/关键词倒排索引
+        self._index = _TfidfIndex()
+        # 堆与倒排索引都不是线程安全的；上下文构建会在多个线程里同时检索/写入同一实例
+        self._lock = threading.RLock()
     
+    @property
+    def memories(self) -> List[MemoryItem]:
+        """当前所有工作记忆（按加入顺序）"""
+        with self._lock:
+            return list(self._by_id.values())
+    
+    @_synchronized
     def add(self, memory_item: MemoryItem) -> str:
         """添加工作记忆"""
         # 过期清理
         self._expire_old_memories()
-        # 计算优先级（重要性 + 时间衰减）
-        priority = self._calculate_priority(memory_item)
+        # 同ID重复添加视为替换
+        if memory_item.id in self._by_id:
+            self._discard(memory_item.id)
+        
+        self._by_id[memory_item.id] = memory_item
         
-        # 添加到堆中
-        heapq.heappush(self.memory_heap, (-priority, memory_item.timestamp, memory_item))
-        self.memories.append(memory_item)
+        # 加入优先级索引（重要性 + 时间衰减）与TTL索引
+        self._update_heap_priority(memory_item)
+        heapq.heappush(self._ttl_heap, (memory_item.timestamp, next(self._seq), memory_item.id))
+        self._index.add(memory_item.id, memory_item.content)
         
         # 更新token计数
-        self.current_tokens += len(memory_item.content.split())
+        tokens = len(memory_item.content.split())
+        self._tokens[memory_item.id] = tokens
+        self.current_tokens += tokens
         
         # 检查容量限制
         self._enforce_capacity_limits()
         
         return memory_item.id
     
+    @_synchronized
     def retrieve(self, query: str, limit: int = 5, user_id: str = None, **kwargs) -> List[MemoryItem]:
         """检索工作记忆 - 混合语义向量检索和关键词匹配"""
         # 过期清理
         self._expire_old_memories()
-        if not self.memories:
+        if not self._by_id:
             return []
 
-        # 过滤已遗忘的记忆
-        active_memories = [m for m in self.memories if not m.metadata.get("forgotten", False)]
-        
-        # 按用户ID过滤（如果提供）
-        filtered_memories = active_memories
-        if user_id:
-            filtered_memories = [m for m in active_memories if m.user_id == user_id]
+        # 候选集：只取与查询共享词项或包含查询串的记忆（倒排索引，代价与查询词数相关）
+        query_lower = query.lower()
+        query_words = set(query_lower.split())
+        vector_scores = self._index.cosine_scores(query)
+        candidate_ids = set(vector_scores)
+        candidate_ids |= self._index.word_candidates(query_words)
+        candidate_ids |= self._index.substring_candidates(query_lower)
+        if not candidate_ids:
+            return []
+
+        # 过滤已遗忘的记忆，按用户ID过滤（如果提供）
+        filtered_memories = []
+        for memory_id in candidate_ids:
+            memory = self._by_id.get(memory_id)
+            if memory is None or memory.metadata.get("forgotten", False):
+                continue
+            if user_id and memory.user_id != user_id:
+                continue
+            filtered_memories.append(memory)
 
         if not filtered_memories:
             return []
 
-        # 尝试语义向量检索（如果有嵌入模型）
-        vector_scores = {}
-        try:
-            # 简单的语义相似度计算（使用TF-IDF或其他轻量级方法）
-            from sklearn.feature_extraction.text import TfidfVectorizer
-            from sklearn.metrics.pairwise import cosine_similarity
-            import numpy as np
-            
-            # 准备文档
-            documents = [query] + [m.content for m in filtered_memories]
-            
-            # TF-IDF向量化
-            vectorizer = TfidfVectorizer(stop_words=None, lowercase=True)
-            tfidf_matrix = vectorizer.fit_transform(documents)
-            
-            # 计算相似度
-            query_vector = tfidf_matrix[0:1]
-            doc_vectors = tfidf_matrix[1:]
-            similarities = cosine_similarity(query_vector, doc_vectors).flatten()
-            
-            # 存储向量分数
-            for i, memory in enumerate(filtered_memories):
-                vector_scores[memory.id] = similarities[i]
-                
-        except Exception as e:
-            # 如果向量检索失败，回退到关键词匹配
-            vector_scores = {}
-
         # 计算最终分数
-        query_lower = query.lower()
         scored_memories = []
         
         for memory in filtered_memories:
-            content_lower = memory.content.lower()
+            content_lower = self._index.doc_lower[memory.id]
             
-            # 获取向量分数（如果有）
+            # 获取向量分数（TF-IDF余弦）
             vector_score = vector_scores.get(memory.id, 0.0)
             
-            # 关键词匹配分数
+            # 关键词匹配分数（使用缓存的分词集合）
             keyword_score = 0.0
             if query_lower in content_lower:
                 keyword_score = len(query_lower) / len(content_lower)
             else:
                 # 分词匹配
-                query_words = set(query_lower.split())
-                content_words = set(content_lower.split())
+                content_words = self._index.doc_words[memory.id]
                 intersection = query_words.intersection(content_words)
                 if intersection:
                     keyword_score = len(intersection) / len(query_words.union(content_words)) * 0.8
@@ -148,6 +323,7 @@ class WorkingMemory(BaseMemory):
         scored_memories.sort(key=lambda x: x[0], reverse=True)
         return [memory for _, memory in scored_memories[:limit]]
     
+    @_synchronized
     def update(
         self,
         memory_id: str,
@@ -156,55 +332,50 @@ class WorkingMemory(BaseMemory):
         metadata: Dict[str, Any] = None
     ) -> bool:
         """更新工作记忆"""
-        for memory in self.memories:
-            if memory.id == memory_id:
-                old_tokens = len(memory.content.split())
-                
-                if content is not None:
-                    memory.content = content
-                    # 更新token计数
-                    new_tokens = len(content.split())
-                    self.current_tokens = self.current_tokens - old_tokens + new_tokens
-                
-                if importance is not None:
-                    memory.importance = importance
-                
-                if metadata is not None:
-                    memory.metadata.update(metadata)
-                
-                # 重新计算优先级并更新堆
-                self._update_heap_priority(memory)
-                
-                return True
-        return False
+        memory = self._by_id.get(memory_id)
+        if memory is None:
+            return False
+        
+        if content is not None:
+            memory.content = content
+            # 更新token计数
+            new_tokens = len(content.split())
+            self.current_tokens += new_tokens - self._tokens.get(memory_id, 0)
+            self._tokens[memory_id] = new_tokens
+            # 重新索引内容
+            self._index.add(memory_id, content)
+        
+        if importance is not None:
+            memory.importance = importance
+            # 重新计算优先级（旧堆条目惰性失效）
+            self._update_heap_priority(memory)
+        
+        if metadata is not None:
+            memory.metadata.update(metadata)
+        
+        return True
     
+    @_synchronized
     def remove(self, memory_id: str) -> bool:
         """删除工作记忆"""
-        for i, memory in enumerate(self.memories):
-            if memory.id == memory_id:
-                # 从列表中删除
-                removed_memory = self.memories.pop(i)
-                
-                # 从堆中删除（标记删除）
-                self._mark_deleted_in_heap(memory_id)
-                
-                # 更新token计数
-                self.current_tokens -= len(removed_memory.content.split())
-                self.current_tokens = max(0, self.current_tokens)
-                
-                return True
-        return False
+        return self._discard(memory_id) is not None
     
     def has_memory(self, memory_id: str) -> bool:
         """检查记忆是否存在"""
-        return any(memory.id == memory_id for memory in self.memories)
+        return memory_id in self._by_id
     
+    @_synchronized
     def clear(self):
         """清空所有工作记忆"""
-        self.memories.clear()
+        self._by_id.clear()
+        self._tokens.clear()
         self.memory_heap.clear()
+        self._heap_entry.clear()
+        self._ttl_heap.clear()
+        self._index.clear()
         self.current_tokens = 0
     
+    @_synchronized
     def get_stats(self) -> Dict[str, Any]:
         """获取工作记忆统计信息"""
         # 过期清理（惰性）
@@ -228,28 +399,22 @@ class WorkingMemory(BaseMemory):
             "memory_type": "working"
         }
     
+    @_synchronized
     def get_recent(self, limit: int = 10) -> List[MemoryItem]:
         """获取最近的记忆"""
-        sorted_memories = sorted(
-            self.memories, 
-            key=lambda x: x.timestamp, 
-            reverse=True
-        )
-        return sorted_memories[:limit]
+        return heapq.nlargest(limit, self._by_id.values(), key=lambda x: x.timestamp)
     
+    @_synchronized
     def get_important(self, limit: int = 10) -> List[MemoryItem]:
         """获取重要记忆"""
-        sorted_memories = sorted(
-            self.memories,
-            key=lambda x: x.importance,
-            reverse=True
-        )
-        return sorted_memories[:limit]
+        return heapq.nlargest(limit, self._by_id.values(), key=lambda x: x.importance)
 
+    @_synchronized
     def get_all(self) -> List[MemoryItem]:
         """获取所有记忆"""
-        return self.memories.copy()
+        return self.memories
     
+    @_synchronized
     def get_context_summary(self, max_length: int = 500) -> str:
         """获取上下文摘要"""
         if not self.memories:
@@ -279,6 +444,7 @@ class WorkingMemory(BaseMemory):
         
         return "Working Memory Context:\n" + "\n".join(summary_parts)
     
+    @_synchronized
     def forget(self, strategy: str = "importance_based", threshold: float = 0.1, max_age_days: int = 1) -> int:
         """工作记忆遗忘机制"""
         forgotten_count = 0
@@ -345,67 +511,80 @@ class WorkingMemory(BaseMemory):
         return max(0.1, decay_factor)  # 最小保持10%的权重
     
     def _enforce_capacity_limits(self):
-        """强制执行容量限制"""
+        """强制执行容量限制（每次淘汰 O(log n)）"""
         # 检查记忆数量限制
-        while len(self.memories) > self.max_capacity:
+        while len(self._by_id) > self.max_capacity:
             self._remove_lowest_priority_memory()
         
         # 检查token限制
-        while self.current_tokens > self.max_tokens:
+        while self.current_tokens > self.max_tokens and self._by_id:
             self._remove_lowest_priority_memory()
 
     def _expire_old_memories(self):
-        """按TTL清理过期记忆，并同步更新堆与token计数"""
-        if not self.memories:
+        """按TTL清理过期记忆：只弹出时间索引中早于截止时间的条目"""
+        if not self._ttl_heap:
             return
         cutoff_time = datetime.now() - timedelta(minutes=self.max_age_minutes)
-        # 过滤保留的记忆
-        kept: List[MemoryItem] = []
-        removed_token_sum = 0
-        for m in self.memories:
-            if m.timestamp >= cutoff_time:
-                kept.append(m)
-            else:
-                removed_token_sum += len(m.content.split())
-        if len(kept) == len(self.memories):
-            return
-        # 覆盖列表与token
-        self.memories = kept
-        self.current_tokens = max(0, self.current_tokens - removed_token_sum)
-        # 重建堆
-        self.memory_heap = []
-        for mem in self.memories:
-            priority = self._calculate_priority(mem)
-            heapq.heappush(self.memory_heap, (-priority, mem.timestamp, mem))
+        while self._ttl_heap and self._ttl_heap[0][0] < cutoff_time:
+            timestamp, _, memory_id = heapq.heappop(self._ttl_heap)
+            memory = self._by_id.get(memory_id)
+            # 已删除的记忆留下的条目直接跳过
+            if memory is not None and memory.timestamp == timestamp:
+                self._discard(memory_id)
+    
+    def _priority_key(self, memory: MemoryItem) -> float:
+        """与时间无关的优先级排序键
+
+        priority = importance * decay^(hours_passed/6)，同一时刻所有记忆的衰减项共享
+        decay^(now/6)，因此按 ln(importance) + ln(decay) * (-timestamp_hours/6) 排序与按
+        当前优先级排序一致，堆中的键无需随时间重算（仅忽略了10%的衰减下限，
+        在TTL内不会触达）。
+        """
+        importance = max(float(memory.importance or 0.0), 1e-12)
+        key = math.log(importance)
+        decay = self.config.decay_factor
+        if 0 < decay < 1:
+            hours = memory.timestamp.timestamp() / 3600
+            key -= math.log(decay) * hours / 6
+        return key
+    
+    def _discard(self, memory_id: str) -> Optional[MemoryItem]:
+        """从所有索引中移除记忆（堆条目惰性删除）"""
+        memory = self._by_id.pop(memory_id, None)
+        if memory is None:
+            return None
+        self._mark_deleted_in_heap(memory_id)
+        self._index.remove(memory_id)
+        self.current_tokens = max(0, self.current_tokens - self._tokens.pop(memory_id, 0))
+        self._compact_heaps()
+        return memory
+    
+    def _compact_heaps(self):
+        """失效条目过多时重建堆，保持堆大小与活跃记忆数同阶"""
+        live = len(self._by_id)
+        if len(self.memory_heap) > 2 * live + 64:
+            self.memory_heap = list(self._heap_entry.values())
+            heapq.heapify(self.memory_heap)
+        if len(self._ttl_heap) > 2 * live + 64:
+            self._ttl_heap = [(m.timestamp, next(self._seq), mid) for mid, m in self._by_id.items()]
+            heapq.heapify(self._ttl_heap)
     
     def _remove_lowest_priority_memory(self):
-        """删除优先级最低的记忆"""
-        if not self.memories:
-            return
-        
-        # 找到优先级最低的记忆
-        lowest_priority = float('inf')
-        lowest_memory = None
-        
-        for memory in self.memories:
-            priority = self._calculate_priority(memory)
-            if priority < lowest_priority:
-                lowest_priority = priority
-                lowest_memory = memory
-        
-        if lowest_memory:
-            self.remove(lowest_memory.id)
+        """删除优先级最低的记忆：弹出堆顶，跳过失效条目"""
+        while self.memory_heap:
+            entry = heapq.heappop(self.memory_heap)
+            memory_id = entry[2]
+            if self._heap_entry.get(memory_id) is entry:
+                self._discard(memory_id)
+                return
     
     def _update_heap_priority(self, memory: MemoryItem):
-        """更新堆中记忆的优先级"""
-        # 简单实现：重建堆
-        self.memory_heap = []
-        for mem in self.memories:
-            priority = self._calculate_priority(mem)
-            heapq.heappush(self.memory_heap, (-priority, mem.timestamp, mem))
+        """写入记忆的新优先级条目，旧条目自动失效"""
+        entry = (self._priority_key(memory), next(self._seq), memory.id)
+        self._heap_entry[memory.id] = entry
+        heapq.heappush(self.memory_heap, entry)
     
     def _mark_deleted_in_heap(self, memory_id: str):
         """在堆中标记删除的记忆"""
-        # 由于heapq不支持直接删除，我们标记为已删除
-        # 在后续操作中会被清理
-        pass
+        # heapq不支持直接删除：移除有效条目登记，堆中残留条目在弹出或重建时被清理
+        self._heap_entry.pop(memory_id, None)
@@ -0,0 +1,221 @@
+"""批量生成引擎（用于 RLTrainingTool 的模型评估）
+
+逐条 tokenize + model.generate（batch size 1）会让 GPU/CPU 大部分时间空闲。BatchedGenerator：
+
+- 按提示词 token 长度分桶：先按长度排序再切分批次，同一批内长度接近，填充浪费最少
+- 左填充（decoder-only 模型生成时新 token 追加在右侧，填充必须在左侧）
+- 共享前缀 KV 缓存复用：评估提示词通常共享同一段 chat 模板/系统提示，先对公共 token 前缀
+  做一次前向得到 KV 缓存，每个批次复制该缓存后只需计算各自的后缀；
+  此时填充位于前缀与后缀之间，由 attention_mask 屏蔽，位置编码由 mask 累加得到，与左填充等价。
+  当前 transformers 版本或模型不支持时自动退化为普通左填充批量生成
+- 每个样本生成完成即回调（调用方据此流式写盘），并统计生成 token 数与吞吐量（tokens/s）
+
+贪婪解码，结果与逐条生成一致（批内数值误差除外）。
+"""
+
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+import copy
+import time
+
+
+def common_prefix_length(sequences: Sequence[Sequence[int]]) -> int:
+    """所有序列的最长公共 token 前缀长度"""
+    if not sequences:
+        return 0
+    first = sequences[0]
+    length = min(len(s) for s in sequences)
+    for seq in sequences[1:]:
+        i = 0
+        while i < length and seq[i] == first[i]:
+            i += 1
+        length = i
+        if length == 0:
+            break
+    return length
+
+
+def length_buckets(lengths: Sequence[int], batch_size: int) -> List[List[int]]:
+    """按长度排序后切分批次，返回每批的样本下标（长的批次在前，便于尽早暴露显存不足）"""
+    order = sorted(range(len(lengths)), key=lambda i: lengths[i], reverse=True)
+    return [order[i:i + batch_size] for i in range(0, len(order), batch_size)]
+
+
+def left_pad(
+    sequences: Sequence[Sequence[int]],
+    pad_id: int,
+    prefix: Sequence[int] = ()
+) -> Tuple[List[List[int]], List[List[int]]]:
+    """
+    左填充一批序列，返回 (input_ids, attention_mask)
+
+    给定 prefix 时填充放在前缀与各自后缀之间：[prefix][pad...][suffix]
+    """
+    width = max(len(s) for s in sequences)
+    input_ids, attention_mask = [], []
+    for seq in sequences:
+        pad = width - len(seq)
+        input_ids.append(list(prefix) + [pad_id] * pad + list(seq))
+        attention_mask.append([1] * len(prefix) + [0] * pad + [1] * len(seq))
+    return input_ids, attention_mask
+
+
+class BatchedGenerator:
+    """长度分桶 + 左填充 + 共享前缀 KV 缓存的批量贪婪生成"""
+
+    def __init__(
+        self,
+        model: Any,
+        tokenizer: Any,
+        device: str = "cpu",
+        batch_size: int = 16,
+        max_new_tokens: int = 128,
+        reuse_prefix_cache: bool = True,
+        min_prefix_tokens: int = 8
+    ):
+        """
+        Args:
+            model: transformers 因果语言模型
+            tokenizer: 对应的 tokenizer
+            device: 运行设备
+            batch_size: 每批样本数
+            max_new_tokens: 每个样本最多生成的 token 数
+            reuse_prefix_cache: 是否复用公共前缀的 KV 缓存
+            min_prefix_tokens: 公共前缀至少多长才启用缓存复用
+        """
+        self.model = model
+        self.tokenizer = tokenizer
+        self.device = device
+        self.batch_size = max(1, int(batch_size))
+        self.max_new_tokens = max_new_tokens
+        self.reuse_prefix_cache = reuse_prefix_cache
+        self.min_prefix_tokens = min_prefix_tokens
+        pad_id = tokenizer.pad_token_id
+        self.eos_id = tokenizer.eos_token_id
+        self.pad_id = pad_id if pad_id is not None else (self.eos_id if self.eos_id is not None else 0)
+        self.stats: Dict[str, Any] = {}
+
+    # ---- prefix cache ----
+
+    def _prefix_cache(self, prefix: List[int]):
+        import torch
+
+        with torch.no_grad():
+            out = self.model(input_ids=torch.tensor([prefix], device=self.device), use_cache=True)
+        return out.past_key_values
+
+    @staticmethod
+    def _expand_cache(cache: Any, n: int) -> Any:
+        """复制前缀缓存并沿 batch 维扩展到 n（generate 会原地追加缓存，每批必须独立一份）"""
+        cache = copy.deepcopy(cache)
+        if hasattr(cache, "batch_repeat_interleave"):
+            cache.batch_repeat_interleave(n)
+            return cache
+        if isinstance(cache, tuple):
+            return tuple(
+                tuple(t.expand(n, *t.shape[1:]).contiguous() for t in layer)
+                for layer in cache
+            )
+        raise TypeError(f"不支持的缓存类型: {type(cache).__name__}")
+
+    # ---- generation ----
+
+    def _generate_batch(self, input_ids: List[List[int]], attention_mask: List[List[int]], cache: Any = None):
+        import torch
+
+        kwargs = {
+            "input_ids": torch.tensor(input_ids, device=self.device),
+            "attention_mask": torch.tensor(attention_mask, device=self.device),
+            "max_new_tokens": self.max_new_tokens,
+            "do_sample": False,
+            "pad_token_id": self.pad_id,
+        }
+        if cache is not None:
+            kwargs["past_key_values"] = self._expand_cache(cache, len(input_ids))
+        with torch.no_grad():
+            outputs = self.model.generate(**kwargs)
+        return outputs[:, len(input_ids[0]):].tolist()
+
+    def _count_generated(self, tokens: List[int]) -> int:
+        """有效生成 token 数：截到第一个 eos（含），去掉其后的填充"""
+        for i, tok in enumerate(tokens):
+            if tok == self.eos_id:
+                return i + 1
+        n = len(tokens)
+        while n and tokens[n - 1] == self.pad_id:
+            n -= 1
+        return n
+
+    def generate(
+        self,
+        prompts: List[str],
+        on_result: Optional[Callable[[int, str, int], None]] = None,
+        progress: bool = True
+    ) -> List[str]:
+        """
+        批量生成
+
+        Args:
+            prompts: 提示词列表
+            on_result: 每个样本完成后的回调 on_result(下标, 生成文本, 生成token数)
+            progress: 是否打印进度
+
+        Returns:
+            与 prompts 顺序一致的生成文本列表
+        """
+        started = time.time()
+        encoded = self.tokenizer(list(prompts))["input_ids"]
+
+        prefix: List[int] = []
+        cache = None
+        if self.reuse_prefix_cache and len(encoded) > 1:
+            # 每个样本至少保留一个后缀 token
+            n = min(common_prefix_length(encoded), min(len(s) for s in encoded) - 1)
+            if n >= self.min_prefix_tokens:
+                try:
+                    cache = self._prefix_cache(encoded[0][:n])
+                    prefix = encoded[0][:n]
+                except Exception as e:
+                    print(f"  ⚠️  前缀缓存不可用，改为普通批量生成: {e}")
+        suffixes = [seq[len(prefix):] for seq in encoded]
+
+        completions: List[Optional[str]] = [None] * len(prompts)
+        generated_tokens = 0
+        batches = length_buckets([len(s) for s in suffixes], self.batch_size)
+        for b, batch in enumerate(batches, 1):
+            input_ids, attention_mask = left_pad([suffixes[i] for i in batch], self.pad_id, prefix)
+            try:
+                outputs = self._generate_batch(input_ids, attention_mask, cache)
+            except Exception as e:
+                if cache is None:
+                    raise
+                # 模型/版本不支持外部传入的前缀缓存：关闭复用，本批及后续批次走普通左填充
+                print(f"  ⚠️  前缀缓存复用失败，改为普通批量生成: {e}")
+                cache, prefix, suffixes = None, [], list(encoded)
+                input_ids, attention_mask = left_pad([suffixes[i] for i in batch], self.pad_id)
+                outputs = self._generate_batch(input_ids, attention_mask)
+
+            for i, tokens in zip(batch, outputs):
+                n = self._count_generated(tokens)
+                generated_tokens += n
+                completions[i] = self.tokenizer.decode(tokens[:n], skip_special_tokens=True)
+                if on_result is not None:
+                    on_result(i, completions[i], n)
+
+            if progress:
+                elapsed = time.time() - started
+                done = sum(len(x) for x in batches[:b])
+                print(f"  批次 {b}/{len(batches)} | 样本 {done}/{len(prompts)} | "
+                      f"{generated_tokens / elapsed if elapsed > 0 else 0:.1f} tokens/s")
+
+        elapsed = time.time() - started
+        self.stats = {
+            "num_samples": len(prompts),
+            "num_batches": len(batches),
+            "batch_size": self.batch_size,
+            "prompt_tokens": sum(len(s) for s in encoded),
+            "shared_prefix_tokens": len(prefix),
+            "generated_tokens": generated_tokens,
+            "elapsed_seconds": round(elapsed, 2),
+            "tokens_per_second": round(generated_tokens / elapsed, 2) if elapsed > 0 else 0.0,
+        }
+        return completions
@@ -37,6 +37,7 @@ import json
 from pathlib import Path
 from typing import Dict, Any, Optional, List
 from ..base import Tool, ToolParameter
+from .evaluation_runner import EvaluationRunner, default_checkpoint_path
 
 
 class BFCLEvaluationTool(Tool):
@@ -112,11 +113,34 @@ class BFCLEvaluationTool(Tool):
                 description="模型名称（用于BFCL官方评估）",
                 required=False,
                 default="Qwen/Qwen3-8B"
+            ),
+            ToolParameter(
+                name="max_workers",
+                type="integer",
+                description="并发评估的样本数（默认：EVAL_MAX_WORKERS 或 4）",
+                required=False,
+                default=None
+            ),
+            ToolParameter(
+                name="sample_timeout",
+                type="number",
+                description="单样本超时秒数（默认：EVAL_SAMPLE_TIMEOUT 或 300，0表示不限）",
+                required=False,
+                default=None
+            ),
+            ToolParameter(
+                name="resume",
+                type="boolean",
+                description="是否从检查点续跑中断的评估（同一智能体配置）",
+                required=False,
+                default=False
             )
         ]
 
     def run(self, agent: Any, category: str = "simple_python", max_samples: int = 5,
-            run_official_eval: bool = True, model_name: Optional[str] = None) -> Dict[str, Any]:
+            run_official_eval: bool = True, model_name: Optional[str] = None,
+            max_workers: Optional[int] = None, sample_timeout: Optional[float] = None,
+            resume: bool = False) -> Dict[str, Any]:
         """运行BFCL评估
 
         Args:
@@ -125,6 +149,9 @@ class BFCLEvaluationTool(Tool):
             max_samples: 评估样本数（默认：5，设为0表示全部）
             run_official_eval: 是否运行BFCL官方评估（默认：True）
             model_name: 模型名称（用于BFCL官方评估，默认：Qwen/Qwen3-8B）
+            max_workers: 并发评估的样本数（默认：EVAL_MAX_WORKERS 或 4）
+            sample_timeout: 单样本超时秒数（默认：EVAL_SAMPLE_TIMEOUT 或 300）
+            resume: 是否从 evaluation_results/checkpoints 下的检查点续跑（默认：False）
 
         Returns:
             评估结果字典，包含：
@@ -156,14 +183,23 @@ class BFCLEvaluationTool(Tool):
         dataset = BFCLDataset(bfcl_data_dir=str(self.bfcl_data_dir), category=category)
         evaluator = BFCLEvaluator(dataset=dataset, category=category)
 
-        if max_samples > 0:
-            results = evaluator.evaluate(agent, max_samples=max_samples)
-        else:
-            results = evaluator.evaluate(agent, max_samples=None)
+        runner = EvaluationRunner(
+            max_workers=max_workers,
+            sample_timeout=sample_timeout,
+            checkpoint_path=default_checkpoint_path("bfcl", agent, category, root=self.project_root),
+            resume=resume
+        )
+        results = runner.evaluate(
+            evaluator, agent, dataset.load(),
+            max_samples=max_samples if max_samples > 0 else None
+        )
 
         print(f"\n📊 评估结果:")
         print(f"   准确率: {results['overall_accuracy']:.2%}")
         print(f"   正确数: {results['correct_samples']}/{results['total_samples']}")
+        if runner.last_stats:
+            print(f"   吞吐量: {runner.last_stats['samples_per_minute']} 样本/分钟 "
+                  f"(并发 {runner.last_stats['max_workers']}, 耗时 {runner.last_stats['elapsed_seconds']}s)")
 
         # 步骤3: 导出BFCL格式结果
         print("\n" + "="*60)
@@ -0,0 +1,313 @@
+"""并发评估运行器
+
+BFCL/GAIA 评估器的 evaluate(agent, max_samples) 逐个样本串行调用 evaluate_sample，
+完整评估是一条很长的串行 LLM 调用链。EvaluationRunner 把单样本评估并发化：
+
+- max_workers 个工作线程并发执行 evaluator.evaluate_sample；每个工作线程使用独立的智能体副本
+  （浅拷贝并清空对话历史，LLM 客户端与工具共享），也可以通过 agent_factory 自行创建
+- 单样本超时（sample_timeout）：超时样本记为失败并立即补上新的样本；线程无法被强制终止，
+  超时样本在守护线程中自然结束，其结果被丢弃、不写入检查点
+- 每完成一个样本即追加写入 JSONL 检查点；显式 resume=True 时跳过检查点中已完成的样本。
+  检查点文件名包含智能体配置指纹（模型、系统提示词、工具等），换模型或改提示词不会误用旧结果
+- 定期打印进度、吞吐量与预计剩余时间
+
+聚合仍由评估器自己的 evaluate() 完成：运行器先并发算出所有样本结果，再让 evaluate()
+按原流程遍历样本、从预计算结果中取值，因此结果字典与导出格式保持不变。失败/超时的样本在
+evaluate() 中重新抛出原始异常，交给评估器原有的错误处理。
+
+环境变量：
+- EVAL_MAX_WORKERS: 默认并发数（默认 4）
+- EVAL_SAMPLE_TIMEOUT: 默认单样本超时（秒，0 表示不限，默认 300）
+"""
+
+from typing import Any, Callable, Dict, List, Optional
+from pathlib import Path
+import copy
+import hashlib
+import json
+import os
+import queue
+import threading
+import time
+
+
+def sample_key(sample: Any) -> str:
+    """样本唯一键：优先使用数据集自带的 id/task_id，否则取内容哈希"""
+    if isinstance(sample, dict):
+        for field in ("id", "task_id", "sample_id", "question_id"):
+            if sample.get(field) not in (None, ""):
+                return str(sample[field])
+    payload = json.dumps(sample, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def agent_fingerprint(agent: Any) -> str:
+    """智能体配置指纹：类型、名称、模型、温度、系统提示词与工具列表共同决定评估结果"""
+    llm = getattr(agent, "llm", None)
+    registry = getattr(agent, "tool_registry", None)
+    tools = registry.list_tools() if registry is not None and hasattr(registry, "list_tools") else []
+    config = {
+        "class": type(agent).__qualname__,
+        "name": getattr(agent, "name", None),
+        "provider": getattr(llm, "provider", None),
+        "model": getattr(llm, "model", None),
+        "base_url": getattr(llm, "base_url", None),
+        "temperature": getattr(llm, "temperature", None),
+        "system_prompt": getattr(agent, "system_prompt", None),
+        "tools": sorted(str(t) for t in tools),
+    }
+    payload = json.dumps(config, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:12]
+
+
+def clone_agent(agent: Any) -> Any:
+    """为工作线程创建智能体副本：共享LLM与工具，对话历史独立"""
+    clone = copy.copy(agent)
+    if hasattr(clone, "_history"):
+        clone._history = []
+    return clone
+
+
+class EvaluationRunner:
+    """并发、可断点续跑的样本评估运行器"""
+
+    def __init__(
+        self,
+        max_workers: Optional[int] = None,
+        sample_timeout: Optional[float] = None,
+        checkpoint_path: Optional[str] = None,
+        resume: bool = False,
+        progress_interval: float = 10.0
+    ):
+        """
+        Args:
+            max_workers: 并发数（默认取 EVAL_MAX_WORKERS 或 4）
+            sample_timeout: 单样本超时秒数（默认取 EVAL_SAMPLE_TIMEOUT 或 300，0 表示不限）
+            checkpoint_path: JSONL 检查点路径，None 表示不写检查点
+            resume: 是否从已有检查点续跑（默认 False：清空检查点重新开始）
+            progress_interval: 进度打印的最小间隔（秒）
+        """
+        self.max_workers = max(1, int(max_workers or os.getenv("EVAL_MAX_WORKERS", "4")))
+        timeout = sample_timeout if sample_timeout is not None else float(os.getenv("EVAL_SAMPLE_TIMEOUT", "300"))
+        self.sample_timeout = timeout if timeout and timeout > 0 else None
+        self.checkpoint_path = Path(checkpoint_path) if checkpoint_path else None
+        self.resume = resume
+        self.progress_interval = progress_interval
+        self.last_stats: Dict[str, Any] = {}
+        self._write_lock = threading.Lock()
+
+    # ---- checkpoint ----
+
+    def _load_checkpoint(self) -> Dict[str, Any]:
+        if self.checkpoint_path is None:
+            return {}
+        if not self.resume:
+            if self.checkpoint_path.exists():
+                self.checkpoint_path.unlink()
+            return {}
+        done = {}
+        if self.checkpoint_path.exists():
+            with open(self.checkpoint_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        # 中断时可能留下半行，忽略即可
+                        continue
+                    done[record["key"]] = record["result"]
+        return done
+
+    def _append_checkpoint(self, key: str, result: Any) -> None:
+        if self.checkpoint_path is None:
+            return
+        line = json.dumps({"key": key, "result": result}, ensure_ascii=False, default=str)
+        with self._write_lock:
+            self.checkpoint_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.checkpoint_path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+                f.flush()
+
+    # ---- run ----
+
+    def run_samples(
+        self,
+        agent: Any,
+        samples: List[Any],
+        evaluate_fn: Callable[[Any, Any], Any],
+        agent_factory: Optional[Callable[[], Any]] = None
+    ) -> Dict[str, Any]:
+        """
+        并发评估样本
+
+        Args:
+            agent: 智能体（并发时每个工作线程使用其副本）
+            samples: 样本列表
+            evaluate_fn: 单样本评估函数 evaluate_fn(agent, sample) -> 结果字典
+            agent_factory: 可选，为每个工作线程创建独立智能体
+
+        Returns:
+            {样本键: 结果字典或异常}
+        """
+        outcomes: Dict[str, Any] = {}
+        done = self._load_checkpoint()
+        pending = []
+        for sample in samples:
+            key = sample_key(sample)
+            if key in done:
+                outcomes[key] = done[key]
+            elif key not in outcomes:
+                outcomes[key] = None
+                pending.append((key, sample))
+        resumed = sum(1 for key in outcomes if key in done)
+        if resumed:
+            print(f"   ♻️  从检查点恢复 {resumed} 个已完成样本: {self.checkpoint_path}")
+
+        # 空闲智能体池：完成的样本归还智能体；超时样本的智能体仍被后台线程占用，直接丢弃
+        # 串行（max_workers=1）时直接使用传入的智能体
+        idle_agents: List[Any] = [agent] if self.max_workers == 1 and agent_factory is None else []
+        timed_out = set()
+
+        def acquire_agent():
+            if idle_agents:
+                return idle_agents.pop()
+            return agent_factory() if agent_factory else clone_agent(agent)
+
+        results: "queue.Queue" = queue.Queue()
+
+        def task(key, sample, worker):
+            try:
+                result = evaluate_fn(worker, sample)
+                if key not in timed_out:
+                    self._append_checkpoint(key, result)
+                results.put((key, result, None))
+            except Exception as e:
+                results.put((key, None, e))
+
+        started = time.time()
+        total = len(pending)
+        completed = failed = timeouts = 0
+        last_report = started
+        if total:
+            print(f"   🚀 并发评估 {total} 个样本（并发数 {self.max_workers}，"
+                  f"单样本超时 {self.sample_timeout or '不限'}）")
+
+        todo = iter(pending)
+        running: Dict[str, tuple] = {}
+
+        def start_next():
+            item = next(todo, None)
+            if item is None:
+                return
+            key, sample = item
+            worker = acquire_agent()
+            # 守护线程：超时样本不占用并发名额，也不阻止进程退出
+            thread = threading.Thread(target=task, args=(key, sample, worker), name=f"eval-{key}", daemon=True)
+            running[key] = (time.time(), worker)
+            thread.start()
+
+        for _ in range(self.max_workers):
+            start_next()
+
+        while running:
+            wait_for = None
+            if self.sample_timeout:
+                wait_for = max(0.0, min(t0 + self.sample_timeout for t0, _ in running.values()) - time.time())
+            try:
+                key, result, error = results.get(timeout=wait_for)
+                if key in running:
+                    _, worker = running.pop(key)
+                    idle_agents.append(worker)
+                    outcomes[key] = error if error is not None else result
+                    failed += error is not None
+                    completed += 1
+                    start_next()
+            except queue.Empty:
+                pass
+            now = time.time()
+            if self.sample_timeout:
+                for key, (t0, _) in list(running.items()):
+                    if now - t0 >= self.sample_timeout:
+                        running.pop(key)
+                        timed_out.add(key)
+                        outcomes[key] = TimeoutError(f"样本 {key} 超过 {self.sample_timeout} 秒未完成")
+                        timeouts += 1
+                        completed += 1
+                        start_next()
+            if now - last_report >= self.progress_interval or not running:
+                last_report = now
+                self._print_progress(completed, total, started)
+
+        elapsed = time.time() - started
+        self.last_stats = {
+            "total_samples": len(samples),
+            "evaluated": completed,
+            "resumed": resumed,
+            "failed": failed,
+            "timeouts": timeouts,
+            "max_workers": self.max_workers,
+            "elapsed_seconds": round(elapsed, 2),
+            "samples_per_minute": round(completed / elapsed * 60, 2) if elapsed > 0 else 0.0,
+            "checkpoint": str(self.checkpoint_path) if self.checkpoint_path else None,
+        }
+        return outcomes
+
+    @staticmethod
+    def _print_progress(completed: int, total: int, started: float) -> None:
+        elapsed = time.time() - started
+        rate = completed / elapsed if elapsed > 0 else 0.0
+        eta = (total - completed) / rate if rate > 0 else 0.0
+        print(f"   ⏱️  进度 {completed}/{total} | 吞吐 {rate * 60:.1f} 样本/分钟 | "
+              f"已用 {elapsed:.0f}s | 预计剩余 {eta:.0f}s")
+
+    def evaluate(
+        self,
+        evaluator: Any,
+        agent: Any,
+        samples: List[Any],
+        max_samples: Optional[int] = None,
+        agent_factory: Optional[Callable[[], Any]] = None
+    ) -> Dict[str, Any]:
+        """
+        用评估器的 evaluate_sample 并发评估，再交给评估器自身的 evaluate() 聚合
+
+        评估器没有 evaluate_sample 时退化为原来的串行 evaluate()。
+        """
+        if not callable(getattr(evaluator, "evaluate_sample", None)):
+            return evaluator.evaluate(agent, max_samples)
+
+        selected = samples[:max_samples] if max_samples else list(samples)
+        original = evaluator.evaluate_sample
+        outcomes = self.run_samples(agent, selected, original, agent_factory=agent_factory)
+
+        def replay(agent_arg, sample):
+            outcome = outcomes.get(sample_key(sample))
+            if outcome is None:
+                # 评估器遍历到运行器未覆盖的样本时按原方式现场评估
+                return original(agent_arg, sample)
+            if isinstance(outcome, BaseException):
+                raise outcome
+            return outcome
+
+        patched_instance = "evaluate_sample" in vars(evaluator)
+        evaluator.evaluate_sample = replay
+        try:
+            results = evaluator.evaluate(agent, max_samples)
+        finally:
+            if patched_instance:
+                evaluator.evaluate_sample = original
+            else:
+                del evaluator.evaluate_sample
+
+        if isinstance(results, dict):
+            results["run_stats"] = dict(self.last_stats)
+        return results
+
+
+def default_checkpoint_path(benchmark: str, agent: Any, *parts: Any, root: Optional[Any] = None) -> str:
+    """{root}/evaluation_results/checkpoints/{benchmark}_{parts}_{智能体名}_{配置指纹}.jsonl"""
+    parts = parts + (getattr(agent, "name", "agent"), agent_fingerprint(agent))
+    name = "_".join([benchmark] + [str(p).replace("/", "_") for p in parts if p not in (None, "")])
+    return str(Path(root or ".") / "evaluation_results" / "checkpoints" / f"{name}.jsonl")
@@ -9,6 +9,7 @@ from pathlib import Path
 import json
 from datetime import datetime
 from ..base import Tool, ToolParameter
+from .evaluation_runner import EvaluationRunner, default_checkpoint_path
 from hello_agents.evaluation.benchmarks.gaia.dataset import GAIADataset
 from hello_agents.evaluation.benchmarks.gaia.evaluator import GAIAEvaluator
 from hello_agents.evaluation.benchmarks.gaia.metrics import GAIAMetrics
@@ -24,11 +25,12 @@ class GAIAEvaluationTool(Tool):
     - Level 3: 困难任务（5+步推理）
     """
     
-    def __init__(self, local_data_path: Optional[str] = None):
+    def __init__(self, local_data_path: Optional[str] = None, project_root: Optional[str] = None):
         """初始化GAIA评估工具
         
         Args:
             local_data_path: 本地数据路径（可选）
+            project_root: 项目根目录，检查点写在其下的 evaluation_results/checkpoints（默认：当前目录）
         """
         super().__init__(
             name="gaia_evaluation",
@@ -38,6 +40,7 @@ class GAIAEvaluationTool(Tool):
             )
         )
         self.local_data_path = local_data_path
+        self.project_root = Path(project_root) if project_root else Path.cwd()
         self.dataset = None
         self.evaluator = None
         self.metrics_calculator = GAIAMetrics()
@@ -71,6 +74,27 @@ class GAIAEvaluationTool(Tool):
                 description="本地数据集目录路径",
                 required=False,
                 default=None
+            ),
+            ToolParameter(
+                name="max_workers",
+                type="integer",
+                description="并发评估的样本数（默认：EVAL_MAX_WORKERS 或 4）",
+                required=False,
+                default=None
+            ),
+            ToolParameter(
+                name="sample_timeout",
+                type="number",
+                description="单样本超时秒数（默认：EVAL_SAMPLE_TIMEOUT 或 300，0表示不限）",
+                required=False,
+                default=None
+            ),
+            ToolParameter(
+                name="resume",
+                type="boolean",
+                description="是否从检查点续跑中断的评估（同一智能体配置）",
+                required=False,
+                default=False
             )
         ]
     
@@ -81,7 +105,10 @@ class GAIAEvaluationTool(Tool):
         max_samples: Optional[int] = None,
         local_data_dir: Optional[str] = None,
         export_results: bool = True,
-        generate_report: bool = True
+        generate_report: bool = True,
+        max_workers: Optional[int] = None,
+        sample_timeout: Optional[float] = None,
+        resume: bool = False
     ) -> Dict[str, Any]:
         """执行GAIA一键评估
 
@@ -92,6 +119,9 @@ class GAIAEvaluationTool(Tool):
             local_data_dir: 本地数据目录路径
             export_results: 是否导出GAIA格式结果
             generate_report: 是否生成评估报告
+            max_workers: 并发评估的样本数（默认：EVAL_MAX_WORKERS 或 4）
+            sample_timeout: 单样本超时秒数（默认：EVAL_SAMPLE_TIMEOUT 或 300）
+            resume: 是否从 evaluation_results/checkpoints 下的检查点续跑（默认：False）
 
         Returns:
             评估结果字典
@@ -112,7 +142,10 @@ class GAIAEvaluationTool(Tool):
             print("步骤1: 运行HelloAgents评估")
             print("=" * 60)
 
-            results = self._run_evaluation(agent, level, max_samples, local_data_dir)
+            results = self._run_evaluation(
+                agent, level, max_samples, local_data_dir,
+                max_workers=max_workers, sample_timeout=sample_timeout, resume=resume
+            )
 
             # 步骤2: 导出GAIA格式结果
             if export_results:
@@ -155,9 +188,12 @@ class GAIAEvaluationTool(Tool):
         agent: Any,
         level: Optional[int],
         max_samples: Optional[int],
-        local_data_dir: Optional[str]
+        local_data_dir: Optional[str],
+        max_workers: Optional[int] = None,
+        sample_timeout: Optional[float] = None,
+        resume: bool = False
     ) -> Dict[str, Any]:
-        """运行评估"""
+        """运行评估（样本由 EvaluationRunner 并发评估，支持检查点续跑）"""
         # 加载数据集
         self.dataset = GAIADataset(
             level=level,
@@ -176,7 +212,17 @@ class GAIAEvaluationTool(Tool):
         )
 
         # 运行评估
-        results = self.evaluator.evaluate(agent, max_samples)
+        runner = EvaluationRunner(
+            max_workers=max_workers,
+            sample_timeout=sample_timeout,
+            checkpoint_path=default_checkpoint_path(
+                "gaia", agent, f"level{level}" if level else "all", root=self.project_root),
+            resume=resume
+        )
+        results = runner.evaluate(self.evaluator, agent, dataset_items, max_samples=max_samples)
+        if runner.last_stats:
+            print(f"   吞吐量: {runner.last_stats['samples_per_minute']} 样本/分钟 "
+                  f"(并发 {runner.last_stats['max_workers']}, 耗时 {runner.last_stats['elapsed_seconds']}s)")
 
         return results
 
@@ -0,0 +1,323 @@
+"""并发评委运行器
+
+LLMJudgeEvaluator.evaluate_batch 与 WinRateEvaluator.evaluate_win_rate 逐个调用评委
+（evaluate_single / compare_pair），每次一个 LLM 请求。JudgeRunner 在不改动评估器聚合逻辑的前提下
+把评委调用并发化：
+
+1. 规划：以静默方式运行一次评估器的批量方法，单项评委方法被替换为只记录参数、返回占位结果，
+   得到完整的调用计划（运行前保存 random 状态，之后恢复，保证随机抽样的配对与正式运行一致）
+2. 去重：同一题目（或同一对题目且 A/B 位置相同）只评一次；位置互换的对比仍分别评判，
+   保留评估器随机交换位置以抵消位置偏差的设计
+3. 执行：命中持久化评判缓存的直接复用，其余在线程池中并发执行，并经过每分钟请求数限流
+4. 回放：再次运行批量方法，单项方法直接返回预先算好的结果，指标与导出格式保持不变；
+   失败的调用在回放时重新抛出原始异常，交给评估器原有的错误处理
+
+规划阶段失败时退化为串行执行（仍然使用缓存）。
+
+缓存键为 (评委模型, 评分标准, 题目内容哈希)，评分标准默认取评估器类源码的哈希，
+修改评委提示词后旧缓存自动失效。
+
+环境变量：
+- JUDGE_MAX_WORKERS: 并发评委调用数（默认 8）
+- JUDGE_RPM: 每分钟最多评委请求数（0 表示不限流，默认 60）
+- JUDGE_CACHE_PATH: 评判缓存路径（默认 ./evaluation_results/judge_cache.db）
+"""
+
+from typing import Any, Callable, Dict, List, Optional
+from concurrent.futures import ThreadPoolExecutor
+import contextlib
+import hashlib
+import inspect
+import io
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+
+
+def _canonical(obj: Any) -> str:
+    return json.dumps(obj, ensure_ascii=False, sort_keys=True, default=str)
+
+
+def content_hash(obj: Any) -> str:
+    return hashlib.sha256(_canonical(obj).encode("utf-8")).hexdigest()
+
+
+def rubric_fingerprint(evaluator: Any) -> str:
+    """评分标准指纹：评估器类源码哈希（取不到源码时退化为类名）"""
+    cls = type(evaluator)
+    try:
+        source = inspect.getsource(cls)
+    except (OSError, TypeError):
+        source = f"{cls.__module__}.{cls.__qualname__}"
+    return f"{cls.__qualname__}:{hashlib.sha256(source.encode('utf-8')).hexdigest()[:16]}"
+
+
+class RateLimiter:
+    """线程安全的请求间隔限流（每分钟最多 rpm 次）"""
+
+    def __init__(self, requests_per_minute: float = 0):
+        self.interval = 60.0 / requests_per_minute if requests_per_minute and requests_per_minute > 0 else 0.0
+        self._next_slot = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class JudgmentCache:
+    """SQLite 持久化的评判结果缓存"""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS judgments (
+                key TEXT PRIMARY KEY,
+                judge_model TEXT NOT NULL,
+                rubric TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                result TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute("SELECT result FROM judgments WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, key: str, judge_model: str, rubric: str, kind: str, result: Dict[str, Any]) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO judgments (key, judge_model, rubric, kind, result, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, judge_model, rubric, kind, _canonical(result), time.time())
+            )
+            self._conn.commit()
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM judgments").fetchone()[0]
+
+
+_cache_lock = threading.Lock()
+_caches: Dict[str, JudgmentCache] = {}
+
+
+def get_judgment_cache(db_path: Optional[str] = None) -> JudgmentCache:
+    """按路径共享的评判缓存实例"""
+    path = os.path.abspath(db_path or os.getenv("JUDGE_CACHE_PATH", os.path.join("evaluation_results", "judge_cache.db")))
+    with _cache_lock:
+        if path not in _caches:
+            _caches[path] = JudgmentCache(path)
+        return _caches[path]
+
+
+class _Call:
+    """计划中的一次评委调用"""
+
+    def __init__(self, args: tuple, kwargs: dict, key: str):
+        self.args = args
+        self.kwargs = kwargs
+        self.key = key
+
+
+class JudgeRunner:
+    """评委调用的规划、去重、缓存、并发执行与回放"""
+
+    def __init__(
+        self,
+        judge_model: str,
+        max_workers: Optional[int] = None,
+        requests_per_minute: Optional[float] = None,
+        cache: Optional[JudgmentCache] = None,
+        rubric: Optional[str] = None
+    ):
+        self.judge_model = judge_model
+        self.max_workers = max(1, int(max_workers or os.getenv("JUDGE_MAX_WORKERS", "8")))
+        rpm = requests_per_minute if requests_per_minute is not None else float(os.getenv("JUDGE_RPM", "60"))
+        self.limiter = RateLimiter(rpm)
+        self.cache = cache
+        self.rubric = rubric
+        self.stats = {"planned": 0, "unique": 0, "completed": 0, "failed": 0, "cached": 0}
+
+    # ---- keys ----
+
+    def single_key(self, rubric: str, args: tuple, kwargs: dict) -> str:
+        """单题评分：题目与参考题共同决定结果"""
+        items = list(args) + [kwargs[k] for k in sorted(kwargs)]
+        return content_hash({"model": self.judge_model, "rubric": rubric, "kind": "single",
+                             "items": [content_hash(x) for x in items]})
+
+    def pair_key(self, rubric: str, args: tuple, kwargs: dict) -> str:
+        """
+        成对对比：按 A/B 顺序区分
+
+        结果中的 winner 是位置相关的（"Problem A"/"Problem B"），评委本身也可能有位置偏差，
+        因此 (A, B) 与 (B, A) 是两次不同的评判，不能互相复用。
+        """
+        items = list(args) + [kwargs[k] for k in sorted(kwargs)]
+        return content_hash({"model": self.judge_model, "rubric": rubric, "kind": "pair",
+                             "items": [content_hash(x) for x in items]})
+
+    # ---- main entry ----
+
+    def run(
+        self,
+        evaluator: Any,
+        method_name: str,
+        batch_fn: Callable[[], Dict[str, Any]],
+        placeholder_fn: Callable[[tuple, dict], Dict[str, Any]],
+        pairwise: bool = False
+    ) -> Dict[str, Any]:
+        """
+        Args:
+            evaluator: 评估器实例
+            method_name: 单项评委方法名（evaluate_single / compare_pair）
+            batch_fn: 运行评估器批量方法的无参函数
+            placeholder_fn: 规划阶段的占位结果 placeholder_fn(args, kwargs)
+            pairwise: 是否为成对对比（决定去重键）
+        """
+        original = getattr(evaluator, method_name)
+        rubric = self.rubric or rubric_fingerprint(evaluator)
+        key_fn = self.pair_key if pairwise else self.single_key
+        kind = "pair" if pairwise else "single"
+        patched_instance = method_name in vars(evaluator)
+
+        def restore():
+            if patched_instance:
+                setattr(evaluator, method_name, original)
+            else:
+                delattr(evaluator, method_name)
+
+        # 1. 规划
+        plan: List[_Call] = []
+
+        def record(*args, **kwargs):
+            plan.append(_Call(args, kwargs, key_fn(rubric, args, kwargs)))
+            return placeholder_fn(args, kwargs)
+
+        state = random.getstate()
+        setattr(evaluator, method_name, record)
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                batch_fn()
+            planned = True
+        except Exception:
+            planned = False
+        finally:
+            restore()
+            random.setstate(state)
+
+        if not planned:
+            print("   ⚠️  无法预先规划评委调用，改为串行执行（仍使用缓存）")
+            return self._run_serial(evaluator, method_name, original, batch_fn, key_fn, rubric, kind, restore)
+
+        # 2. 去重 + 缓存
+        unique: Dict[str, _Call] = {}
+        for call in plan:
+            unique.setdefault(call.key, call)
+        self.stats["planned"] += len(plan)
+        self.stats["unique"] += len(unique)
+        outcomes: Dict[str, Any] = {}
+        todo = []
+        for key, call in unique.items():
+            cached = self.cache.get(key) if self.cache else None
+            if cached is not None:
+                outcomes[key] = cached
+                self.stats["cached"] += 1
+            else:
+                todo.append(call)
+        print(f"   📋 评委调用 {len(plan)} 次，去重后 {len(unique)} 次，缓存命中 {self.stats['cached']} 次，"
+              f"待执行 {len(todo)} 次（并发 {self.max_workers}）")
+
+        # 3. 并发执行
+        def judge(call: _Call):
+            self.limiter.acquire()
+            result = original(*call.args, **call.kwargs)
+            if self.cache is not None and isinstance(result, dict):
+                self.cache.put(call.key, self.judge_model, rubric, kind, result)
+            return result
+
+        started = time.time()
+        if todo:
+            with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="judge") as executor:
+                futures = [(call, executor.submit(judge, call)) for call in todo]
+                for i, (call, future) in enumerate(futures, 1):
+                    try:
+                        outcomes[call.key] = future.result()
+                        self.stats["completed"] += 1
+                    except Exception as e:
+                        outcomes[call.key] = e
+                        self.stats["failed"] += 1
+                    if i % 10 == 0 or i == len(futures):
+                        elapsed = time.time() - started
+                        print(f"   ⏱️  评委进度 {i}/{len(futures)} | {i / elapsed * 60 if elapsed else 0:.1f} 次/分钟")
+
+        # 4. 回放
+        def replay(*args, **kwargs):
+            key = key_fn(rubric, args, kwargs)
+            if key not in outcomes:
+                return original(*args, **kwargs)
+            outcome = outcomes[key]
+            if isinstance(outcome, BaseException):
+                raise outcome
+            return dict(outcome) if isinstance(outcome, dict) else outcome
+
+        setattr(evaluator, method_name, replay)
+        # 并发阶段可能消耗了全局 random（如客户端重试抖动），回放前恢复到规划时的状态，保证抽样一致
+        random.setstate(state)
+        try:
+            results = batch_fn()
+        finally:
+            restore()
+        if isinstance(results, dict):
+            results["judge_stats"] = dict(self.stats)
+        return results
+
+    def _run_serial(self, evaluator, method_name, original, batch_fn, key_fn, rubric, kind, restore):
+        def cached_call(*args, **kwargs):
+            key = key_fn(rubric, args, kwargs)
+            self.stats["planned"] += 1
+            cached = self.cache.get(key) if self.cache else None
+            if cached is not None:
+                self.stats["cached"] += 1
+                return cached
+            self.limiter.acquire()
+            try:
+                result = original(*args, **kwargs)
+            except Exception:
+                self.stats["failed"] += 1
+                raise
+            self.stats["completed"] += 1
+            if self.cache is not None and isinstance(result, dict):
+                self.cache.put(key, self.judge_model, rubric, kind, result)
+            return result
+
+        setattr(evaluator, method_name, cached_call)
+        try:
+            results = batch_fn()
+        finally:
+            restore()
+        if isinstance(results, dict):
+            results["judge_stats"] = dict(self.stats)
+        return results
@@ -13,6 +13,7 @@ from hello_agents.tools.base import Tool
 from hello_agents.evaluation.benchmarks.data_generation.dataset import AIDataset
 from hello_agents.evaluation.benchmarks.data_generation.llm_judge import LLMJudgeEvaluator
 from hello_agents.core.llm import HelloAgentsLLM
+from .judge_runner import JudgeRunner, get_judgment_cache
 
 
 class LLMJudgeTool(Tool):
@@ -59,6 +60,22 @@ class LLMJudgeTool(Tool):
                 "judge_model": {
                     "type": "string",
                     "description": "评委模型名称（可选，默认为gpt-4o）"
+                },
+                "max_workers": {
+                    "type": "integer",
+                    "description": "并发评委调用数（可选，默认为JUDGE_MAX_WORKERS或8）"
+                },
+                "requests_per_minute": {
+                    "type": "number",
+                    "description": "每分钟最多评委请求数（可选，默认为JUDGE_RPM或60，0表示不限流）"
+                },
+                "use_cache": {
+                    "type": "boolean",
+                    "description": "是否复用持久化评判缓存（可选，默认为true）"
+                },
+                "rubric": {
+                    "type": "string",
+                    "description": "评分标准标识（可选，默认取评估器源码哈希，变更后缓存失效）"
                 }
             },
             "required": ["generated_data_path"]
@@ -115,9 +132,32 @@ class LLMJudgeTool(Tool):
         print(f"\n🔧 步骤3: 创建LLM Judge评估器")
         evaluator = LLMJudgeEvaluator(llm=self.llm, judge_model=judge_model)
         
-        # 4. 运行评估
+        # 4. 运行评估（评委调用并发执行、去重并复用缓存）
         print(f"\n🚀 步骤4: 开始评估")
-        results = evaluator.evaluate_batch(gen_problems, ref_problems)
+        runner = JudgeRunner(
+            judge_model=judge_model,
+            max_workers=params.get("max_workers"),
+            requests_per_minute=params.get("requests_per_minute"),
+            cache=get_judgment_cache() if params.get("use_cache", True) else None,
+            rubric=params.get("rubric")
+        )
+        dimensions = getattr(evaluator, "EVALUATION_DIMENSIONS",
+                             ["correctness", "clarity", "difficulty_match", "completeness"])
+        results = runner.run(
+            evaluator,
+            "evaluate_single",
+            lambda: evaluator.evaluate_batch(gen_problems, ref_problems),
+            lambda args, kwargs: {
+                "problem_id": args[0].get("problem_id", "unknown") if args and isinstance(args[0], dict) else "unknown",
+                "scores": {dim: 0.0 for dim in dimensions},
+                "total_score": 0.0,
+                "evaluation_text": "",
+                "execution_time": 0.0
+            }
+        )
+        stats = results.get("judge_stats", {})
+        print(f"   评委调用: 完成 {stats.get('completed', 0)} / 失败 {stats.get('failed', 0)} / "
+              f"缓存 {stats.get('cached', 0)}（计划 {stats.get('planned', 0)}，去重后 {stats.get('unique', 0)}）")
         
         # 5. 保存结果
         print(f"\n💾 步骤5: 保存评估结果")
@@ -142,6 +182,7 @@ class LLMJudgeTool(Tool):
             "status": "success",
             "metrics": results["metrics"],
             "num_problems": results["num_problems"],
+            "judge_stats": results.get("judge_stats", {}),
             "result_file": result_file,
             "report_file": report_file
         }, ensure_ascii=False, indent=2)
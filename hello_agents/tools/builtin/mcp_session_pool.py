@@ -0,0 +1,290 @@
+"""MCP 会话池
+
+MCPTool 过去每次调用都新建一个 MCPClient 上下文：外部服务器命令意味着每次都要拉起子进程并完成
+initialize 握手；已有事件循环时还要临时创建线程和事件循环。本模块提供进程级的长连接会话池：
+
+- 所有会话由同一个后台事件循环（守护线程）驱动，同步代码通过 run_coroutine_threadsafe 提交
+- 按 (服务器命令, 参数, 环境变量) 复用会话；内存中的 FastMCP 服务器按实例复用
+- 每个会话由一个常驻任务持有 MCPClient 上下文（anyio 要求上下文在同一任务中进入与退出），
+  其他请求并发复用该客户端
+- 空闲超过 MCP_HEALTH_CHECK_INTERVAL 秒后先做健康检查（ping，无 ping 时用 list_tools）；
+  连接断开时自动重连，幂等操作（list_*/read_resource/get_prompt）失败后重连并重试一次
+- 工具列表按 MCP_TOOLS_CACHE_TTL 缓存，重连或显式 refresh 时失效
+
+环境变量：
+- MCP_CALL_TIMEOUT: 单次操作超时（秒，默认 60）
+- MCP_CONNECT_TIMEOUT: 建立会话超时（秒，默认 30）
+- MCP_HEALTH_CHECK_INTERVAL: 空闲多久后在下次使用前做健康检查（秒，默认 30）
+- MCP_TOOLS_CACHE_TTL: 工具列表缓存时间（秒，0 表示只在重连/refresh 时失效，默认 300）
+"""
+
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+import asyncio
+import atexit
+import concurrent.futures
+import os
+import threading
+import time
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+
+class MCPSession:
+    """一个长连接的 MCP 会话（只在后台事件循环中使用）"""
+
+    def __init__(self, source: Any, args: List[str], env: Dict[str, str]):
+        self.source = source
+        self.args = list(args)
+        self.env = dict(env)
+        self.client = None
+        self.connects = 0
+        self.reconnects = 0
+        self.last_used = 0.0
+        self._owner: Optional[asyncio.Task] = None
+        self._closing: Optional[asyncio.Event] = None
+        self._lock: Optional[asyncio.Lock] = None
+        self._tools: Optional[List[Dict[str, Any]]] = None
+        self._tools_at = 0.0
+
+    # ---- connection lifecycle ----
+
+    async def _hold(self, ready: asyncio.Future) -> None:
+        """常驻任务：在同一个任务中进入并退出 MCPClient 上下文"""
+        from hello_agents.protocols.mcp.client import MCPClient
+
+        try:
+            async with MCPClient(self.source, self.args, env=self.env) as client:
+                self.client = client
+                ready.set_result(client)
+                await self._closing.wait()
+        except Exception as e:
+            if not ready.done():
+                ready.set_exception(e)
+        finally:
+            self.client = None
+            if not ready.done():
+                ready.cancel()
+
+    async def _open(self, timeout: float) -> None:
+        self._closing = asyncio.Event()
+        ready = asyncio.get_running_loop().create_future()
+        self._owner = asyncio.create_task(self._hold(ready))
+        try:
+            await asyncio.wait_for(asyncio.shield(ready), timeout)
+        except BaseException:
+            await self.close()
+            raise
+        if self.connects:
+            self.reconnects += 1
+        self.connects += 1
+        self._tools = None
+        self.last_used = time.time()
+
+    async def close(self) -> None:
+        owner, self._owner = self._owner, None
+        self._tools = None
+        if owner is None:
+            return
+        self._closing.set()
+        done, _ = await asyncio.wait([owner], timeout=5.0)
+        if not done:
+            owner.cancel()
+            await asyncio.gather(owner, return_exceptions=True)
+        self.client = None
+
+    def _alive(self) -> bool:
+        return self.client is not None and self._owner is not None and not self._owner.done()
+
+    async def _probe(self, timeout: float) -> bool:
+        """健康检查：优先 ping；客户端不支持时用 list_tools 并顺带刷新工具缓存"""
+        if not self._alive():
+            return False
+        try:
+            if hasattr(self.client, "ping"):
+                await asyncio.wait_for(self.client.ping(), timeout)
+            else:
+                tools = await asyncio.wait_for(self.client.list_tools(), timeout)
+                self._tools, self._tools_at = tools, time.time()
+            return True
+        except Exception:
+            return False
+
+    async def ensure(self, connect_timeout: float, health_interval: float) -> Any:
+        """返回可用的客户端；断开或健康检查失败时重连"""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            healthy = self._alive()
+            if healthy and health_interval >= 0 and time.time() - self.last_used > health_interval:
+                healthy = await self._probe(connect_timeout)
+            if not healthy:
+                await self.close()
+                await self._open(connect_timeout)
+            self.last_used = time.time()
+            return self.client
+
+    # ---- operations ----
+
+    async def execute(self, op: Callable[[Any], Awaitable[Any]], idempotent: bool,
+                      connect_timeout: float, health_interval: float) -> Any:
+        client = await self.ensure(connect_timeout, health_interval)
+        try:
+            result = await op(client)
+        except Exception:
+            # 区分业务错误与连接错误：连接仍健康时原样抛出，不重连
+            if await self._probe(connect_timeout):
+                raise
+            async with self._lock:
+                if self.client is client:
+                    await self.close()
+            if not idempotent:
+                raise
+            client = await self.ensure(connect_timeout, health_interval)
+            result = await op(client)
+        self.last_used = time.time()
+        return result
+
+    async def list_tools(self, refresh: bool, ttl: float,
+                         connect_timeout: float, health_interval: float) -> List[Dict[str, Any]]:
+        await self.ensure(connect_timeout, health_interval)
+        fresh = self._tools is not None and (ttl <= 0 or time.time() - self._tools_at < ttl)
+        if refresh or not fresh:
+            tools = await self.execute(lambda c: c.list_tools(), True, connect_timeout, health_interval)
+            self._tools, self._tools_at = tools, time.time()
+        return list(self._tools)
+
+    def invalidate_tools(self) -> None:
+        self._tools = None
+
+
+class MCPSessionPool:
+    """进程级 MCP 会话池，由单个后台事件循环驱动"""
+
+    def __init__(self):
+        self.call_timeout = _env_float("MCP_CALL_TIMEOUT", 60.0)
+        self.connect_timeout = _env_float("MCP_CONNECT_TIMEOUT", 30.0)
+        self.health_interval = _env_float("MCP_HEALTH_CHECK_INTERVAL", 30.0)
+        self.tools_ttl = _env_float("MCP_TOOLS_CACHE_TTL", 300.0)
+        self._sessions: Dict[Tuple, MCPSession] = {}
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+
+    # ---- background loop ----
+
+    def _get_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None or self._loop.is_closed():
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(target=loop.run_forever, name="mcp-session-loop", daemon=True)
+                thread.start()
+                self._loop, self._thread = loop, thread
+            return self._loop
+
+    def _submit(self, coro: Awaitable[Any], timeout: Optional[float]) -> Any:
+        loop = self._get_loop()
+        if threading.current_thread() is self._thread:
+            coro.close()
+            raise RuntimeError("不能在 MCP 会话循环内部同步调用会话池")
+        future = asyncio.run_coroutine_threadsafe(coro, loop)
+        try:
+            return future.result(timeout)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            raise TimeoutError(f"MCP 操作超时（{timeout}秒）")
+
+    # ---- sessions ----
+
+    @staticmethod
+    def session_key(source: Any, args: Optional[List[str]], env: Optional[Dict[str, str]]) -> Tuple:
+        if isinstance(source, (list, tuple)):
+            source_key = ("command", tuple(source))
+        elif isinstance(source, str):
+            source_key = ("command", (source,))
+        else:
+            # 内存服务器按实例复用（会话持有其引用，id 不会被复用）
+            source_key = ("instance", id(source))
+        return source_key, tuple(args or ()), tuple(sorted((env or {}).items()))
+
+    def get_session(self, source: Any, args: Optional[List[str]] = None,
+                    env: Optional[Dict[str, str]] = None) -> MCPSession:
+        key = self.session_key(source, args, env)
+        with self._lock:
+            session = self._sessions.get(key)
+            if session is None:
+                session = MCPSession(source, args or [], env or {})
+                self._sessions[key] = session
+            return session
+
+    def call(self, session: MCPSession, op: Callable[[Any], Awaitable[Any]],
+             idempotent: bool = False, timeout: Optional[float] = None) -> Any:
+        """在会话上执行 op(client)；op 为接收客户端并返回协程的函数"""
+        return self._submit(
+            session.execute(op, idempotent, self.connect_timeout, self.health_interval),
+            timeout or self.call_timeout
+        )
+
+    def list_tools(self, session: MCPSession, refresh: bool = False) -> List[Dict[str, Any]]:
+        return self._submit(
+            session.list_tools(refresh, self.tools_ttl, self.connect_timeout, self.health_interval),
+            self.call_timeout
+        )
+
+    def close_session(self, source: Any, args: Optional[List[str]] = None,
+                      env: Optional[Dict[str, str]] = None) -> None:
+        with self._lock:
+            session = self._sessions.pop(self.session_key(source, args, env), None)
+        if session is not None and self._loop is not None:
+            self._submit(session.close(), self.connect_timeout)
+
+    def close_all(self) -> None:
+        with self._lock:
+            sessions = list(self._sessions.values())
+            self._sessions.clear()
+            loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+
+        async def shutdown():
+            await asyncio.gather(*(s.close() for s in sessions), return_exceptions=True)
+
+        try:
+            self._submit(shutdown(), 10.0)
+        except Exception:
+            pass
+        loop.call_soon_threadsafe(loop.stop)
+
+    def stats(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            sessions = list(self._sessions.values())
+        return [
+            {
+                "source": s.source if isinstance(s.source, (str, list, tuple)) else type(s.source).__name__,
+                "args": s.args,
+                "connected": s._alive(),
+                "connects": s.connects,
+                "reconnects": s.reconnects,
+                "tools_cached": s._tools is not None,
+                "idle_seconds": round(time.time() - s.last_used, 1) if s.last_used else None,
+            }
+            for s in sessions
+        ]
+
+
+_pool: Optional[MCPSessionPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_mcp_session_pool() -> MCPSessionPool:
+    """获取进程级 MCP 会话池（首次调用时创建，退出时关闭所有会话）"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = MCPSessionPool()
+            atexit.register(_pool.close_all)
+        return _pool
@@ -6,9 +6,19 @@
 
 from typing import Dict, Any, List, Optional
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, wait
+import contextvars
+import logging
+import os
 
 from ..base import Tool, ToolParameter, tool_action
-from ...memory import MemoryManager, MemoryConfig
+from ...memory import MemoryManager, MemoryConfig, MemoryItem
+from ...memory.embedding import embed_query_memoized, query_embedding_scope
+
+logger = logging.getLogger(__name__)
+
+# 使用向量检索的记忆类型（共享同一个查询向量）
+_VECTOR_MEMORY_TYPES = ("episodic", "semantic", "perceptual")
 
 class MemoryTool(Tool):
     """记忆工具
@@ -46,6 +56,9 @@ class MemoryTool(Tool):
             enable_perceptual="perceptual" in self.memory_types
         )
 
+        # 并行检索：各记忆类型同时查询，单个后端超过截止时间则只返回已完成的部分结果
+        self.search_timeout = float(os.getenv("MEMORY_SEARCH_TIMEOUT", "5.0"))
+
         # 会话状态
         self.current_session_id = None
         self.conversation_count = 0
@@ -225,12 +238,13 @@ class MemoryTool(Tool):
             # 处理memory_type参数
             memory_types = [memory_type] if memory_type else None
 
-            results = self.memory_manager.retrieve_memories(
-                query=query,
-                limit=limit,
-                memory_types=memory_types,
-                min_importance=min_importance
-            )
+            with query_embedding_scope():
+                results = self._retrieve_parallel(
+                    query=query,
+                    limit=limit,
+                    memory_types=memory_types,
+                    min_importance=min_importance
+                )
 
             if not results:
                 return f"🔍 未找到与 '{query}' 相关的记忆"
@@ -506,11 +520,12 @@ class MemoryTool(Tool):
 
         这个方法可以被Agent调用来获取相关的记忆上下文
         """
-        results = self.memory_manager.retrieve_memories(
-            query=query,
-            limit=limit,
-            min_importance=0.3
-        )
+        with query_embedding_scope():
+            results = self._retrieve_parallel(
+                query=query,
+                limit=limit,
+                min_importance=0.3
+            )
 
         if not results:
             return ""
@@ -521,6 +536,104 @@ class MemoryTool(Tool):
 
         return "\n".join(context_parts)
 
+    def _retrieve_parallel(
+        self,
+        query: str,
+        limit: int = 5,
+        memory_types: Optional[List[str]] = None,
+        min_importance: float = 0.0
+    ) -> List[MemoryItem]:
+        """并行检索多种记忆类型并按归一化分数合并
+
+        - 查询向量只计算一次，通过 query_vector 传给各向量型记忆
+        - 每次检索使用独立的线程池，每个记忆类型一个线程，总等待时间受 search_timeout 限制，
+          超时的后端被跳过（结果为已完成后端的部分结果）；运行中的检索无法取消，
+          线程池不等待它结束，卡住的后端不会占用后续检索的线程
+        - 各类型的分数尺度不同，类型内至少两个命中时做 min-max 归一化，否则保留 [0, 1] 内的原始分数
+        """
+        stores = getattr(self.memory_manager, "memory_types", None)
+        if not isinstance(stores, dict):
+            return self.memory_manager.retrieve_memories(
+                query=query, limit=limit, memory_types=memory_types, min_importance=min_importance
+            )
+
+        names = [name for name in (memory_types or list(stores.keys())) if name in stores]
+        if not names:
+            return []
+
+        query_vector = None
+        if query and any(name in _VECTOR_MEMORY_TYPES for name in names):
+            try:
+                query_vector = embed_query_memoized(query).tolist()
+            except Exception as e:
+                logger.warning(f"查询向量计算失败，各记忆类型将自行编码: {e}")
+
+        user_id = getattr(self.memory_manager, "user_id", None)
+        futures = {}
+        executor = ThreadPoolExecutor(max_workers=len(names), thread_name_prefix="memory-search")
+        try:
+            for name in names:
+                kwargs = {"user_id": user_id}
+                if query_vector is not None and name in _VECTOR_MEMORY_TYPES:
+                    kwargs["query_vector"] = query_vector
+                # 每个任务各自复制当前上下文，使后台线程继承请求级查询向量备忘录
+                ctx = contextvars.copy_context()
+                futures[executor.submit(ctx.run, stores[name].retrieve, query, limit, **kwargs)] = name
+
+            done, pending = wait(futures, timeout=self.search_timeout)
+        finally:
+            executor.shutdown(wait=False)
+        for future in pending:
+            logger.warning(f"{futures[future]} 记忆检索超过 {self.search_timeout}s，已跳过")
+
+        ranked = []
+        for future, name in futures.items():
+            if future not in done:
+                continue
+            try:
+                items = [m for m in (future.result() or []) if m.importance >= min_importance]
+            except Exception as e:
+                logger.warning(f"{name} 记忆检索失败: {e}")
+                continue
+            for item, score in zip(items, self._normalized_scores(items)):
+                ranked.append((score, item.importance, item))
+
+        ranked.sort(key=lambda x: (x[0], x[1]), reverse=True)
+        results, seen = [], set()
+        for _, _, item in ranked:
+            if item.id in seen:
+                continue
+            seen.add(item.id)
+            results.append(item)
+            if len(results) >= limit:
+                break
+        return results
+
+    @staticmethod
+    def _normalized_scores(items: List[MemoryItem]) -> List[float]:
+        """
+        把单个记忆类型的结果分数映射到 [0, 1]
+
+        至少两个不同分数时在类型内做 min-max 归一化；只有一个命中（或分数全部相同）时保留
+        截断到 [0, 1] 的原始分数，避免单个弱命中被放大为 1.0。没有分数的类型按名次计分，
+        名次分数落在 (0, 1) 内，单个命中为 0.5。
+        """
+        raw = []
+        for item in items:
+            meta = item.metadata or {}
+            score = meta.get("relevance_score", meta.get("combined_score"))
+            if score is None:
+                break
+            raw.append(min(1.0, max(0.0, float(score))))
+        else:
+            if len(raw) >= 2:
+                lo, hi = min(raw), max(raw)
+                if hi > lo:
+                    return [(s - lo) / (hi - lo) for s in raw]
+            return raw
+        n = len(items)
+        return [(n - i) / (n + 1) for i in range(n)]
+
     def clear_session(self):
         """清除当前会话"""
         self.current_session_id = None
@@ -0,0 +1,233 @@
+"""NoteTool 全文索引
+
+SQLite（WAL 日志，写入为追加式，提交原子）存储笔记元数据与正文，替代每次整体重写的 notes_index.json：
+- notes: 笔记元数据与正文（seq 为自增主键，保持创建顺序，同时作为全文索引的 rowid）
+- note_tags: 标签倒排表，用于标签过滤
+- notes_fts: FTS5 全文索引（trigram 分词，支持中文子串匹配），按 BM25 排序（标题 > 标签 > 正文）
+
+增删改只更新对应笔记的行。trigram 只能匹配长度 >= 3 的词，更短的词
+（如两个汉字）退化为在 notes 表上做 LIKE 过滤；SQLite 不支持 FTS5/trigram 时全部走 LIKE。
+"""
+
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import json
+import os
+import sqlite3
+import threading
+
+
+# bm25 列权重：title, content, tags
+_BM25_WEIGHTS = (10.0, 1.0, 5.0)
+_COLUMNS = "n.id, n.title, n.type, n.tags, n.content, n.created_at, n.updated_at"
+
+
+def _like_pattern(term: str) -> str:
+    escaped = term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+class NoteIndex:
+    """笔记的增量全文索引"""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS notes (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                id TEXT NOT NULL UNIQUE,
+                title TEXT NOT NULL,
+                type TEXT NOT NULL,
+                tags TEXT NOT NULL,
+                content TEXT NOT NULL,
+                created_at TEXT NOT NULL,
+                updated_at TEXT NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_notes_type ON notes(type)")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS note_tags (
+                note_id TEXT NOT NULL,
+                tag TEXT NOT NULL,
+                PRIMARY KEY (tag, note_id)
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_note_tags_note ON note_tags(note_id)")
+        try:
+            self._conn.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS notes_fts USING fts5(title, content, tags, tokenize='trigram')"
+            )
+            self.fts_enabled = True
+        except sqlite3.OperationalError:
+            # 编译时未启用 FTS5 或版本过旧（trigram 需要 SQLite >= 3.34）
+            self.fts_enabled = False
+        self._conn.commit()
+
+    # ---- writes ----
+
+    def _upsert_locked(self, note: Dict[str, Any]) -> None:
+        tags = [str(t) for t in (note.get("tags") or [])]
+        tags_json = json.dumps(tags, ensure_ascii=False)
+        row = self._conn.execute("SELECT seq FROM notes WHERE id = ?", (note["id"],)).fetchone()
+        values = (note["title"], note["type"], tags_json, note["content"], note["created_at"], note["updated_at"])
+        if row:
+            seq = row[0]
+            self._conn.execute(
+                "UPDATE notes SET title=?, type=?, tags=?, content=?, created_at=?, updated_at=? WHERE seq=?",
+                values + (seq,)
+            )
+        else:
+            seq = self._conn.execute(
+                "INSERT INTO notes (id, title, type, tags, content, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (note["id"],) + values
+            ).lastrowid
+        self._conn.execute("DELETE FROM note_tags WHERE note_id = ?", (note["id"],))
+        self._conn.executemany(
+            "INSERT OR IGNORE INTO note_tags (note_id, tag) VALUES (?, ?)",
+            [(note["id"], tag) for tag in tags]
+        )
+        if self.fts_enabled:
+            self._conn.execute("DELETE FROM notes_fts WHERE rowid = ?", (seq,))
+            self._conn.execute(
+                "INSERT INTO notes_fts (rowid, title, content, tags) VALUES (?, ?, ?, ?)",
+                (seq, note["title"], note["content"], " ".join(tags))
+            )
+
+    def upsert(self, note: Dict[str, Any]) -> None:
+        """新增或更新一条笔记（只改动该笔记对应的行）"""
+        with self._lock:
+            self._upsert_locked(note)
+            self._conn.commit()
+
+    def delete(self, note_id: str) -> None:
+        with self._lock:
+            row = self._conn.execute("SELECT seq FROM notes WHERE id = ?", (note_id,)).fetchone()
+            if row is None:
+                return
+            self._conn.execute("DELETE FROM notes WHERE seq = ?", (row[0],))
+            self._conn.execute("DELETE FROM note_tags WHERE note_id = ?", (note_id,))
+            if self.fts_enabled:
+                self._conn.execute("DELETE FROM notes_fts WHERE rowid = ?", (row[0],))
+            self._conn.commit()
+
+    def rebuild(self, notes: Iterable[Dict[str, Any]]) -> int:
+        """清空并按给定顺序重建索引（用于迁移旧工作区或修复）"""
+        count = 0
+        with self._lock:
+            self._conn.execute("DELETE FROM notes")
+            self._conn.execute("DELETE FROM note_tags")
+            if self.fts_enabled:
+                self._conn.execute("DELETE FROM notes_fts")
+            for note in notes:
+                self._upsert_locked(note)
+                count += 1
+            self._conn.commit()
+        return count
+
+    # ---- reads ----
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM notes").fetchone()[0]
+
+    def exists(self, note_id: str) -> bool:
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM notes WHERE id = ?", (note_id,)).fetchone() is not None
+
+    def type_counts(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._conn.execute("SELECT type, COUNT(*) FROM notes GROUP BY type").fetchall()
+        return {t: c for t, c in rows}
+
+    @staticmethod
+    def _filters(note_type: Optional[str], tags: Optional[List[str]]) -> Tuple[List[str], List[Any]]:
+        clauses, args = [], []
+        if note_type:
+            clauses.append("n.type = ?")
+            args.append(note_type)
+        if tags:
+            unique = sorted(set(str(t) for t in tags))
+            clauses.append(
+                f"n.id IN (SELECT note_id FROM note_tags WHERE tag IN ({', '.join('?' * len(unique))}) "
+                "GROUP BY note_id HAVING COUNT(*) = ?)"
+            )
+            args.extend(unique)
+            args.append(len(unique))
+        return clauses, args
+
+    @staticmethod
+    def _row_to_note(row: Tuple) -> Dict[str, Any]:
+        note_id, title, note_type, tags, content, created_at, updated_at = row[:7]
+        note = {
+            "id": note_id,
+            "title": title,
+            "type": note_type,
+            "tags": json.loads(tags),
+            "content": content,
+            "created_at": created_at,
+            "updated_at": updated_at,
+            "metadata": {"word_count": len(content), "status": "active"},
+        }
+        if len(row) > 7:
+            note["score"] = -float(row[7])
+        return note
+
+    def list(self, note_type: Optional[str] = None, tags: Optional[List[str]] = None,
+             limit: int = 10) -> List[Dict[str, Any]]:
+        """按创建顺序列出笔记（支持类型/标签过滤）"""
+        clauses, args = self._filters(note_type, tags)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {_COLUMNS} FROM notes n {where} ORDER BY n.seq LIMIT ?", args + [int(limit)]
+            ).fetchall()
+        return [self._row_to_note(r) for r in rows]
+
+    def search(self, query: str, limit: int = 10, note_type: Optional[str] = None,
+               tags: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """
+        全文搜索：所有词都必须出现在标题、正文或标签中，按 BM25 排序
+
+        长度 >= 3 的词走 FTS5 索引，更短的词用 LIKE 过滤；没有可索引的词时按更新时间倒序返回。
+        """
+        terms = [t for t in query.split() if t]
+        indexed = [t for t in terms if len(t) >= 3] if self.fts_enabled else []
+        scanned = [t for t in terms if t not in indexed]
+
+        clauses, args = self._filters(note_type, tags)
+        for term in scanned:
+            pattern = _like_pattern(term)
+            clauses.append("(n.title LIKE ? ESCAPE '\\' OR n.content LIKE ? ESCAPE '\\' OR n.tags LIKE ? ESCAPE '\\')")
+            args.extend([pattern, pattern, pattern])
+
+        if indexed:
+            match = " AND ".join('"' + t.replace('"', '""') + '"' for t in indexed)
+            where = " AND ".join(["notes_fts MATCH ?"] + clauses)
+            sql = (
+                f"SELECT {_COLUMNS}, bm25(notes_fts, {', '.join(str(w) for w in _BM25_WEIGHTS)}) AS rank "
+                f"FROM notes_fts JOIN notes n ON n.seq = notes_fts.rowid "
+                f"WHERE {where} ORDER BY rank LIMIT ?"
+            )
+            params = [match] + args + [int(limit)]
+        else:
+            where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+            sql = f"SELECT {_COLUMNS} FROM notes n {where} ORDER BY n.updated_at DESC LIMIT ?"
+            params = args + [int(limit)]
+
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [self._row_to_note(r) for r in rows]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -4,7 +4,7 @@
 - 创建/读取/更新/删除笔记
 - 按类型组织（任务状态、结论、阻塞项、行动计划等）
 - 持久化存储（Markdown格式，带YAML前置元数据）
-- 搜索与过滤
+- 全文检索（SQLite FTS5 增量索引，BM25 排序，支持类型/标签过滤）
 - 与MemoryTool集成（可选）
 
 使用场景：
@@ -38,9 +38,11 @@ from typing import Dict, Any, List
 from datetime import datetime
 from pathlib import Path
 import json
+import os
 import re
 
 from ..base import Tool, ToolParameter, tool_action
+from .note_index import NoteIndex
 
 
 class NoteTool(Tool):
@@ -92,40 +94,64 @@ class NoteTool(Tool):
         # 确保工作目录存在
         self.workspace.mkdir(parents=True, exist_ok=True)
         
-        # 笔记索引文件
-        self.index_file = self.workspace / "notes_index.json"
-        self._load_index()
+        # 笔记全文索引（SQLite，增删改时增量更新；Markdown文件仍是笔记的权威存储）
+        self.index_file = self.workspace / "notes_index.db"
+        self.index = NoteIndex(str(self.index_file))
+        if self.index.count() == 0:
+            self._migrate_legacy_notes()
     
-    def _load_index(self):
-        """加载笔记索引"""
-        if self.index_file.exists():
-            with open(self.index_file, 'r', encoding='utf-8') as f:
-                self.notes_index = json.load(f)
-        else:
-            self.notes_index = {
-                "notes": [],
-                "metadata": {
-                    "created_at": datetime.now().isoformat(),
-                    "total_notes": 0
-                }
-            }
-            self._save_index()
+    def _migrate_legacy_notes(self):
+        """旧工作区（notes_index.json）首次打开时从Markdown文件重建索引"""
+        notes = []
+        for note_path in self.workspace.glob("note_*.md"):
+            try:
+                with open(note_path, 'r', encoding='utf-8') as f:
+                    note = self._markdown_to_note(f.read())
+            except Exception as e:
+                print(f"⚠️ 解析笔记失败 {note_path.name}: {e}")
+                continue
+            note.setdefault("id", note_path.stem)
+            note.setdefault("title", note_path.stem)
+            note.setdefault("type", "general")
+            note.setdefault("created_at", "")
+            note.setdefault("updated_at", note["created_at"])
+            notes.append(note)
+        if notes:
+            notes.sort(key=lambda n: (n["created_at"], n["id"]))
+            self.index.rebuild(notes)
+            print(f"✅ 已为 {len(notes)} 条笔记建立全文索引")
     
-    def _save_index(self):
-        """保存笔记索引"""
-        with open(self.index_file, 'w', encoding='utf-8') as f:
-            json.dump(self.notes_index, f, ensure_ascii=False, indent=2)
+    def rebuild_index(self) -> int:
+        """从Markdown文件完整重建索引（笔记文件被外部修改后使用）"""
+        self.index.rebuild([])
+        self._migrate_legacy_notes()
+        return self.index.count()
     
     def _generate_note_id(self) -> str:
         """生成笔记ID"""
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        count = len(self.notes_index["notes"])
-        return f"note_{timestamp}_{count}"
+        count = self.index.count()
+        note_id = f"note_{timestamp}_{count}"
+        # 删除笔记后计数会回退，同一秒内可能重复
+        while self.index.exists(note_id) or self._get_note_path(note_id).exists():
+            count += 1
+            note_id = f"note_{timestamp}_{count}"
+        return note_id
     
     def _get_note_path(self, note_id: str) -> Path:
         """获取笔记文件路径"""
         return self.workspace / f"{note_id}.md"
     
+    def _write_note_file(self, note: Dict[str, Any]):
+        """写入笔记文件（先写临时文件再原子替换，中断时不会留下半个文件）"""
+        note_path = self._get_note_path(note["id"])
+        tmp_path = note_path.with_suffix(".md.tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(self._note_to_markdown(note))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, note_path)
+    
     def _note_to_markdown(self, note: Dict[str, Any]) -> str:
         """将笔记对象转换为Markdown格式"""
         # YAML前置元数据
@@ -221,12 +247,15 @@ class NoteTool(Tool):
         elif action == "list":
             return self._list_notes(
                 note_type=parameters.get("note_type"),
-                limit=parameters.get("limit", 10)
+                limit=parameters.get("limit", 10),
+                tags=parameters.get("tags")
             )
         elif action == "search":
             return self._search_notes(
                 query=parameters.get("query"),
-                limit=parameters.get("limit", 10)
+                limit=parameters.get("limit", 10),
+                note_type=parameters.get("note_type"),
+                tags=parameters.get("tags")
             )
         elif action == "summary":
             return self._get_summary()
@@ -270,7 +299,7 @@ class NoteTool(Tool):
             ToolParameter(
                 name="tags",
                 type="array",
-                description="标签列表（可选）",
+                description="标签列表（create/update时设置标签；list/search时按标签过滤，需包含全部标签）",
                 required=False
             ),
             ToolParameter(
@@ -282,7 +311,7 @@ class NoteTool(Tool):
             ToolParameter(
                 name="query",
                 type="string",
-                description="搜索关键词（search时必需）",
+                description="搜索关键词（search时必需，多个词以空格分隔，需全部匹配，按相关度排序）",
                 required=False
             ),
             ToolParameter(
@@ -311,7 +340,7 @@ class NoteTool(Tool):
             return "❌ 创建笔记需要提供 title 和 content"
         
         # 检查笔记数量限制
-        if len(self.notes_index["notes"]) >= self.max_notes:
+        if self.index.count() >= self.max_notes:
             return f"❌ 笔记数量已达上限 ({self.max_notes})"
         
         # 生成笔记ID
@@ -333,21 +362,10 @@ class NoteTool(Tool):
         }
         
         # 保存笔记文件（Markdown格式）
-        note_path = self._get_note_path(note_id)
-        markdown_content = self._note_to_markdown(note)
-        with open(note_path, 'w', encoding='utf-8') as f:
-            f.write(markdown_content)
+        self._write_note_file(note)
         
         # 更新索引
-        self.notes_index["notes"].append({
-            "id": note_id,
-            "title": title,
-            "type": note_type,
-            "tags": tags if isinstance(tags, list) else [],
-            "created_at": note["created_at"]
-        })
-        self.notes_index["metadata"]["total_notes"] = len(self.notes_index["notes"])
-        self._save_index()
+        self.index.upsert(note)
         
         return f"✅ 笔记创建成功\nID: {note_id}\n标题: {title}\n类型: {note_type}"
     
@@ -415,18 +433,11 @@ class NoteTool(Tool):
         note["updated_at"] = datetime.now().isoformat()
         
         # 保存更新（Markdown格式）
-        markdown_content = self._note_to_markdown(note)
-        with open(note_path, 'w', encoding='utf-8') as f:
-            f.write(markdown_content)
+        note.setdefault("id", note_id)
+        self._write_note_file(note)
         
         # 更新索引
-        for idx_note in self.notes_index["notes"]:
-            if idx_note["id"] == note_id:
-                idx_note["title"] = note["title"]
-                idx_note["type"] = note["type"]
-                idx_note["tags"] = note["tags"]
-                break
-        self._save_index()
+        self.index.upsert(note)
         
         return f"✅ 笔记更新成功: {note_id}"
     
@@ -451,32 +462,24 @@ class NoteTool(Tool):
         note_path.unlink()
         
         # 更新索引
-        self.notes_index["notes"] = [
-            n for n in self.notes_index["notes"] if n["id"] != note_id
-        ]
-        self.notes_index["metadata"]["total_notes"] = len(self.notes_index["notes"])
-        self._save_index()
+        self.index.delete(note_id)
         
         return f"✅ 笔记已删除: {note_id}"
     
     @tool_action("note_list", "列出所有笔记或指定类型的笔记")
-    def _list_notes(self, note_type: str = None, limit: int = 10) -> str:
+    def _list_notes(self, note_type: str = None, limit: int = 10, tags: List[str] = None) -> str:
         """列出笔记
 
         Args:
             note_type: 笔记类型过滤（可选）
             limit: 返回结果数量限制
+            tags: 标签过滤（可选，需包含全部标签）
 
         Returns:
             笔记列表
         """
-        # 过滤笔记
-        filtered_notes = self.notes_index["notes"]
-        if note_type:
-            filtered_notes = [n for n in filtered_notes if n["type"] == note_type]
-        
-        # 限制数量
-        filtered_notes = filtered_notes[:limit]
+        # 过滤笔记（在索引中完成，不读取笔记文件）
+        filtered_notes = self.index.list(note_type=note_type, tags=tags, limit=limit)
         
         if not filtered_notes:
             return "📝 暂无笔记"
@@ -492,43 +495,23 @@ class NoteTool(Tool):
         return result
     
     @tool_action("note_search", "搜索包含关键词的笔记")
-    def _search_notes(self, query: str, limit: int = 10) -> str:
+    def _search_notes(self, query: str, limit: int = 10, note_type: str = None, tags: List[str] = None) -> str:
         """搜索笔记
 
         Args:
-            query: 搜索关键词
+            query: 搜索关键词（多个词以空格分隔，需全部出现在标题、内容或标签中）
             limit: 返回结果数量限制
+            note_type: 笔记类型过滤（可选）
+            tags: 标签过滤（可选，需包含全部标签）
 
         Returns:
-            搜索结果
+            搜索结果（按BM25相关度排序）
         """
         if not query:
             return "❌ 搜索需要提供 query"
 
-        query_lower = query.lower()
-        
-        # 搜索匹配的笔记
-        matched_notes = []
-        for idx_note in self.notes_index["notes"]:
-            note_path = self._get_note_path(idx_note["id"])
-            if note_path.exists():
-                with open(note_path, 'r', encoding='utf-8') as f:
-                    markdown_text = f.read()
-                
-                try:
-                    note = self._markdown_to_note(markdown_text)
-                except Exception as e:
-                    print(f"⚠️ 解析笔记失败 {idx_note['id']}: {e}")
-                    continue
-                
-                # 检查标题、内容、标签是否匹配
-                if (query_lower in note["title"].lower() or
-                    query_lower in note["content"].lower() or
-                    any(query_lower in tag.lower() for tag in note.get("tags", []))):
-                    matched_notes.append(note)
-        
-        # 限制数量
-        matched_notes = matched_notes[:limit]
+        # 全文索引检索，不再逐个读取和解析笔记文件
+        matched_notes = self.index.search(query, limit=limit, note_type=note_type, tags=tags)
         
         if not matched_notes:
             return f"📝 未找到匹配 '{query}' 的笔记"
@@ -546,13 +529,9 @@ class NoteTool(Tool):
         Returns:
             摘要信息
         """
-        total = len(self.notes_index["notes"])
-        
         # 按类型统计
-        type_counts = {}
-        for note in self.notes_index["notes"]:
-            note_type = note["type"]
-            type_counts[note_type] = type_counts.get(note_type, 0) + 1
+        type_counts = self.index.type_counts()
+        total = sum(type_counts.values())
         
         result = f"📊 笔记摘要\n\n"
         result += f"总笔记数: {total}\n\n"
@@ -241,42 +241,35 @@ class MCPTool(Tool):
                 "创建内置 MCP 服务器需要 fastmcp 库。请安装: pip install fastmcp"
             )
 
-    def _discover_tools(self):
-        """发现MCP服务器提供的所有工具"""
+    @property
+    def _client_source(self):
+        """内置/自定义服务器走内存传输，否则使用外部服务器命令"""
+        return self.server if self.server else self.server_command
+
+    def _session(self):
+        from .mcp_session_pool import get_mcp_session_pool
+        pool = get_mcp_session_pool()
+        return pool, pool.get_session(self._client_source, self.server_args, self.env)
+
+    def _discover_tools(self, refresh: bool = False):
+        """发现MCP服务器提供的所有工具（复用会话池中的长连接与工具列表缓存）"""
         try:
-            from hello_agents.protocols.mcp.client import MCPClient
-            import asyncio
-
-            async def discover():
-                client_source = self.server if self.server else self.server_command
-                async with MCPClient(client_source, self.server_args, env=self.env) as client:
-                    tools = await client.list_tools()
-                    return tools
-
-            # 运行异步发现
-            try:
-                loop = asyncio.get_running_loop()
-                # 如果已有循环，在新线程中运行
-                import concurrent.futures
-                def run_in_thread():
-                    new_loop = asyncio.new_event_loop()
-                    asyncio.set_event_loop(new_loop)
-                    try:
-                        return new_loop.run_until_complete(discover())
-                    finally:
-                        new_loop.close()
-
-                with concurrent.futures.ThreadPoolExecutor() as executor:
-                    future = executor.submit(run_in_thread)
-                    self._available_tools = future.result()
-            except RuntimeError:
-                # 没有运行中的循环
-                self._available_tools = asyncio.run(discover())
-
+            pool, session = self._session()
+            self._available_tools = pool.list_tools(session, refresh=refresh)
         except Exception as e:
             # 工具发现失败不影响初始化
             self._available_tools = []
 
+    def refresh_tools(self) -> List[Dict[str, Any]]:
+        """使工具列表缓存失效并重新获取（服务器工具发生变化时调用）"""
+        self._discover_tools(refresh=True)
+        return self._available_tools
+
+    def close(self):
+        """关闭该服务器的池化会话（下次调用时会重新连接）"""
+        from .mcp_session_pool import get_mcp_session_pool
+        get_mcp_session_pool().close_session(self._client_source, self.server_args, self.env)
+
     def _generate_description(self) -> str:
         """生成增强的工具描述"""
         if not self._available_tools:
@@ -349,12 +342,11 @@ class MCPTool(Tool):
                 - uri: 资源 URI（read_resource 需要）
                 - prompt_name: 提示词名称（get_prompt 需要）
                 - prompt_arguments: 提示词参数（get_prompt 可选）
+                - refresh: 为 True 时跳过工具列表缓存（list_tools 可选）
 
         Returns:
             操作结果
         """
-        from hello_agents.protocols.mcp.client import MCPClient
-
         # 智能推断action：如果没有action但有tool_name，自动设置为call_tool
         action = parameters.get("action", "").lower()
         if not action and "tool_name" in parameters:
@@ -363,108 +355,73 @@ class MCPTool(Tool):
 
         if not action:
             return "错误：必须指定 action 参数或 tool_name 参数"
-        
+
         try:
-            # 使用增强的异步客户端
-            import asyncio
-            from hello_agents.protocols.mcp.client import MCPClient
-
-            async def run_mcp_operation():
-                # 根据配置选择客户端创建方式
-                if self.server:
-                    # 使用内置服务器（内存传输）
-                    client_source = self.server
-                else:
-                    # 使用外部服务器命令
-                    client_source = self.server_command
-
-                async with MCPClient(client_source, self.server_args, env=self.env) as client:
-                    if action == "list_tools":
-                        tools = await client.list_tools()
-                        if not tools:
-                            return "没有找到可用的工具"
-                        result = f"找到 {len(tools)} 个工具:\n"
-                        for tool in tools:
-                            result += f"- {tool['name']}: {tool['description']}\n"
-                        return result
-
-                    elif action == "call_tool":
-                        tool_name = parameters.get("tool_name")
-                        arguments = parameters.get("arguments", {})
-                        if not tool_name:
-                            return "错误：必须指定 tool_name 参数"
-                        result = await client.call_tool(tool_name, arguments)
-                        return f"工具 '{tool_name}' 执行结果:\n{result}"
-
-                    elif action == "list_resources":
-                        resources = await client.list_resources()
-                        if not resources:
-                            return "没有找到可用的资源"
-                        result = f"找到 {len(resources)} 个资源:\n"
-                        for resource in resources:
-                            result += f"- {resource['uri']}: {resource['name']}\n"
-                        return result
-
-                    elif action == "read_resource":
-                        uri = parameters.get("uri")
-                        if not uri:
-                            return "错误：必须指定 uri 参数"
-                        content = await client.read_resource(uri)
-                        return f"资源 '{uri}' 内容:\n{content}"
-
-                    elif action == "list_prompts":
-                        prompts = await client.list_prompts()
-                        if not prompts:
-                            return "没有找到可用的提示词"
-                        result = f"找到 {len(prompts)} 个提示词:\n"
-                        for prompt in prompts:
-                            result += f"- {prompt['name']}: {prompt['description']}\n"
-                        return result
-
-                    elif action == "get_prompt":
-                        prompt_name = parameters.get("prompt_name")
-                        prompt_arguments = parameters.get("prompt_arguments", {})
-                        if not prompt_name:
-                            return "错误：必须指定 prompt_name 参数"
-                        messages = await client.get_prompt(prompt_name, prompt_arguments)
-                        result = f"提示词 '{prompt_name}':\n"
-                        for msg in messages:
-                            result += f"[{msg['role']}] {msg['content']}\n"
-                        return result
-
-                    else:
-                        return f"错误：不支持的操作 '{action}'"
-
-            # 运行异步操作
-            try:
-                # 检查是否已有运行中的事件循环
-                try:
-                    loop = asyncio.get_running_loop()
-                    # 如果有运行中的循环，在新线程中运行新的事件循环
-                    import concurrent.futures
-                    import threading
-
-                    def run_in_thread():
-                        # 在新线程中创建新的事件循环
-                        new_loop = asyncio.new_event_loop()
-                        asyncio.set_event_loop(new_loop)
-                        try:
-                            return new_loop.run_until_complete(run_mcp_operation())
-                        finally:
-                            new_loop.close()
-
-                    with concurrent.futures.ThreadPoolExecutor() as executor:
-                        future = executor.submit(run_in_thread)
-                        return future.result()
-                except RuntimeError:
-                    # 没有运行中的循环，直接运行
-                    return asyncio.run(run_mcp_operation())
-            except Exception as e:
-                return f"异步操作失败: {str(e)}"
-                    
+            pool, session = self._session()
+
+            if action == "list_tools":
+                tools = pool.list_tools(session, refresh=bool(parameters.get("refresh")))
+                self._available_tools = tools
+                if not tools:
+                    return "没有找到可用的工具"
+                result = f"找到 {len(tools)} 个工具:\n"
+                for tool in tools:
+                    result += f"- {tool['name']}: {tool['description']}\n"
+                return result
+
+            elif action == "call_tool":
+                tool_name = parameters.get("tool_name")
+                arguments = parameters.get("arguments", {})
+                if not tool_name:
+                    return "错误：必须指定 tool_name 参数"
+                # 工具调用可能有副作用，连接中断时不自动重试
+                result = pool.call(session, lambda client: client.call_tool(tool_name, arguments))
+                return f"工具 '{tool_name}' 执行结果:\n{result}"
+
+            elif action == "list_resources":
+                resources = pool.call(session, lambda client: client.list_resources(), idempotent=True)
+                if not resources:
+                    return "没有找到可用的资源"
+                result = f"找到 {len(resources)} 个资源:\n"
+                for resource in resources:
+                    result += f"- {resource['uri']}: {resource['name']}\n"
+                return result
+
+            elif action == "read_resource":
+                uri = parameters.get("uri")
+                if not uri:
+                    return "错误：必须指定 uri 参数"
+                content = pool.call(session, lambda client: client.read_resource(uri), idempotent=True)
+                return f"资源 '{uri}' 内容:\n{content}"
+
+            elif action == "list_prompts":
+                prompts = pool.call(session, lambda client: client.list_prompts(), idempotent=True)
+                if not prompts:
+                    return "没有找到可用的提示词"
+                result = f"找到 {len(prompts)} 个提示词:\n"
+                for prompt in prompts:
+                    result += f"- {prompt['name']}: {prompt['description']}\n"
+                return result
+
+            elif action == "get_prompt":
+                prompt_name = parameters.get("prompt_name")
+                prompt_arguments = parameters.get("prompt_arguments", {})
+                if not prompt_name:
+                    return "错误：必须指定 prompt_name 参数"
+                messages = pool.call(
+                    session, lambda client: client.get_prompt(prompt_name, prompt_arguments), idempotent=True
+                )
+                result = f"提示词 '{prompt_name}':\n"
+                for msg in messages:
+                    result += f"[{msg['role']}] {msg['content']}\n"
+                return result
+
+            else:
+                return f"错误：不支持的操作 '{action}'"
+
         except Exception as e:
             return f"MCP 操作失败: {str(e)}"
-    
+
     def get_parameters(self) -> List[ToolParameter]:
         """获取工具参数定义"""
         return [
@@ -11,8 +11,9 @@
 # 1. 初始化RAG工具
 rag = RAGTool()
 
-# 2. 添加文档
+# 2. 添加文档（大目录使用流式入库，内存占用有上限）
 rag.run({"action": "add_document", "file_path": "document.pdf"})
+rag.run({"action": "add_directory", "directory": "./docs"})
 
 # 3. 智能问答
 answer = rag.run({"action": "ask", "question": "什么是机器学习？"})
@@ -130,6 +131,14 @@ class RAGTool(Tool):
                     chunk_size=parameters.get("chunk_size", 800),
                     chunk_overlap=parameters.get("chunk_overlap", 100)
                 )
+            elif action == "add_directory":
+                return self._add_directory(
+                    directory=parameters.get("directory") or parameters.get("file_path"),
+                    namespace=parameters.get("namespace", "default"),
+                    chunk_size=parameters.get("chunk_size", 800),
+                    chunk_overlap=parameters.get("chunk_overlap", 100),
+                    upsert_batch_size=parameters.get("upsert_batch_size", 256)
+                )
             elif action == "add_text":
                 return self._add_text(
                     text=parameters.get("text"),
@@ -177,7 +186,7 @@ class RAGTool(Tool):
             ToolParameter(
                 name="action",
                 type="string",
-                description="操作类型：add_document(添加文档), add_text(添加文本), ask(智能问答), search(搜索), stats(统计), clear(清空)",
+                description="操作类型：add_document(添加文档), add_directory(流式添加目录), add_text(添加文本), ask(智能问答), search(搜索), stats(统计), clear(清空)",
                 required=True
             ),
             
@@ -188,6 +197,12 @@ class RAGTool(Tool):
                 description="文档文件路径（支持PDF、Word、Excel、PPT、图片、音频等多种格式）",
                 required=False
             ),
+            ToolParameter(
+                name="directory",
+                type="string",
+                description="文档目录路径（用于 add_directory，递归流式入库）",
+                required=False
+            ),
             ToolParameter(
                 name="text",
                 type="string",
@@ -259,16 +274,19 @@ class RAGTool(Tool):
             pipeline = self._get_pipeline(namespace)
             t0 = time.time()
 
-            chunks_added = pipeline["add_documents"](
+            stats = pipeline["add_documents_stream"](
                 file_paths=[file_path],
                 chunk_size=chunk_size,
                 chunk_overlap=chunk_overlap
             )
+            chunks_added = stats["chunks_indexed"]
             
             t1 = time.time()
             process_ms = int((t1 - t0) * 1000)
             
-            if chunks_added == 0:
+            if stats["files_unchanged"]:
+                return f"✅ 文档未变化，已跳过重新索引: {os.path.basename(file_path)}"
+            if chunks_added == 0 and stats["chunks_unchanged"] == 0:
                 return f"⚠️ 未能从文件解析内容: {os.path.basename(file_path)}"
             
             return (
@@ -281,6 +299,54 @@ class RAGTool(Tool):
         except Exception as e:
             return f"❌ 添加文档失败: {str(e)}"
     
+    @tool_action("rag_add_directory", "流式添加整个目录的文档到知识库（内存占用有上限，适合大规模语料）")
+    def _add_directory(
+        self,
+        directory: str,
+        namespace: str = "default",
+        chunk_size: int = 800,
+        chunk_overlap: int = 100,
+        upsert_batch_size: int = 256
+    ) -> str:
+        """流式添加目录下的所有文档
+
+        Args:
+            directory: 文档目录路径（递归遍历支持的格式）
+            namespace: 知识库命名空间
+            chunk_size: 分块大小
+            chunk_overlap: 分块重叠大小
+            upsert_batch_size: 每次写入向量库的分块数
+
+        Returns:
+            执行结果
+        """
+        try:
+            if not directory or not os.path.isdir(directory):
+                return f"❌ 目录不存在: {directory}"
+
+            pipeline = self._get_pipeline(namespace)
+            stats = pipeline["add_documents_stream"](
+                file_paths=[directory],
+                chunk_size=chunk_size,
+                chunk_overlap=chunk_overlap,
+                upsert_batch_size=upsert_batch_size
+            )
+
+            if stats["chunks_indexed"] == 0 and stats["files_unchanged"] == 0 and stats["chunks_unchanged"] == 0:
+                return f"⚠️ 未能从目录解析内容: {directory}"
+
+            return (
+                f"✅ 目录已添加到知识库: {directory}\n"
+                f"📄 文件: {stats['files_done']}/{stats['files_total']} (跳过 {stats['files_skipped']}, 未变化 {stats['files_unchanged']})\n"
+                f"📊 分块数量: {stats['chunks_indexed']} (未变化 {stats['chunks_unchanged']}, 删除 {stats['chunks_deleted']})\n"
+                f"⏱️ 处理时间: {int(stats['elapsed_sec'] * 1000)}ms\n"
+                f"🚀 吞吐: {stats['chunks_per_sec']} 块/秒, {stats['mb_per_sec']} MB/秒\n"
+                f"📝 命名空间: {pipeline.get('namespace', self.rag_namespace)}"
+            )
+
+        except Exception as e:
+            return f"❌ 添加目录失败: {str(e)}"
+
     @tool_action("rag_add_text", "添加文本到知识库")
     def _add_text(
         self,
@@ -318,10 +384,12 @@ class RAGTool(Tool):
                 pipeline = self._get_pipeline(namespace)
                 t0 = time.time()
 
+                # 临时文件随后即被删除，不记录到增量清单
                 chunks_added = pipeline["add_documents"](
                     file_paths=[tmp_path],
                     chunk_size=chunk_size,
-                    chunk_overlap=chunk_overlap
+                    chunk_overlap=chunk_overlap,
+                    incremental=False
                 )
                 
                 t1 = time.time()
@@ -644,6 +712,10 @@ class RAGTool(Tool):
             success = store.clear_collection() if store else False
             
             if success:
+                # 集合已删除，清单中该集合的所有记录随之失效
+                manifest = pipeline.get("manifest")
+                if manifest:
+                    manifest.clear(all_namespaces=True)
                 # 重新初始化该命名空间
                 self._pipelines[namespace_id] = create_rag_pipeline(
                     qdrant_url=self.qdrant_url,
@@ -782,7 +854,8 @@ class RAGTool(Tool):
                     chunks_added = pipeline["add_documents"](
                         file_paths=[tmp_path],
                         chunk_size=chunk_size,
-                        chunk_overlap=chunk_overlap
+                        chunk_overlap=chunk_overlap,
+                        incremental=False
                     )
                     
                     total_chunks += chunks_added
@@ -816,6 +889,9 @@ class RAGTool(Tool):
                 store = pipeline.get("store")
                 if store:
                     store.clear_collection()
+                manifest = pipeline.get("manifest")
+                if manifest:
+                    manifest.clear(all_namespaces=True)
             self._pipelines.clear()
             # 重新初始化默认命名空间
             self._init_components()
@@ -835,6 +911,14 @@ class RAGTool(Tool):
             "namespace": namespace
         })
     
+    def add_directory(self, directory: str, namespace: str = "default") -> str:
+        """便捷方法：流式添加整个目录"""
+        return self.run({
+            "action": "add_directory",
+            "directory": directory,
+            "namespace": namespace
+        })
+    
     def add_text(self, text: str, namespace: str = "default", document_id: str = None) -> str:
         """便捷方法：添加文本内容"""
         return self.run({
@@ -318,6 +318,9 @@ class RLTrainingTool(Tool):
 
             model_path = parameters.get("model_path")
             max_samples = parameters.get("max_samples", 100)
+            eval_batch_size = parameters.get("eval_batch_size", 16)
+            max_new_tokens = parameters.get("max_new_tokens", 128)
+            results_file = parameters.get("results_file")
 
             if not model_path:
                 return json.dumps({
@@ -343,51 +346,45 @@ class RLTrainingTool(Tool):
                     "message": f"模型加载失败: {str(e)}"
                 }, ensure_ascii=False, indent=2)
 
-            # 生成预测
-            print("🔮 生成预测...")
-            completions = []
-            ground_truths = []
+            # 生成预测（长度分桶 + 左填充批量生成，逐样本流式写盘）
+            print(f"🔮 批量生成预测 (batch_size={eval_batch_size}, max_new_tokens={max_new_tokens})...")
+            from .batched_generation import BatchedGenerator
+            from datetime import datetime
 
-            # 导入tqdm用于进度条
-            try:
-                from tqdm import tqdm
-                use_tqdm = True
-            except ImportError:
-                use_tqdm = False
-                print("  提示: 安装tqdm可显示进度条 (pip install tqdm)")
-
-            # 创建迭代器
-            iterator = range(min(max_samples, len(dataset)))
-            if use_tqdm:
-                iterator = tqdm(iterator, desc="  评估进度", unit="样本")
-
-            for i in iterator:
-                prompt = dataset[i]["prompt"]
-                ground_truth = dataset[i]["ground_truth"]
-
-                # 生成回答
-                inputs = tokenizer(prompt, return_tensors="pt").to(device)
-                with torch.no_grad():
-                    outputs = model.generate(
-                        **inputs,
-                        max_new_tokens=128,  # 减少生成长度加快速度
-                        temperature=0.7,
-                        do_sample=False,  # 使用贪婪解码加快速度
-                        pad_token_id=tokenizer.pad_token_id
-                    )
-                # 只取生成的部分,不包括输入
-                completion = tokenizer.decode(outputs[0][inputs['input_ids'].shape[1]:], skip_special_tokens=True)
-
-                completions.append(completion)
-                ground_truths.append(ground_truth)
-
-                # 如果没有tqdm,每10个样本打印一次进度
-                if not use_tqdm and (i + 1) % 10 == 0:
-                    print(f"  进度: {i+1}/{max_samples}")
+            num_samples = min(max_samples, len(dataset))
+            prompts = [dataset[i]["prompt"] for i in range(num_samples)]
+            ground_truths = [dataset[i]["ground_truth"] for i in range(num_samples)]
+            reward_fn = create_accuracy_reward()
+
+            if not results_file:
+                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+                results_file = str(Path("./output/eval") / f"eval_results_{timestamp}.jsonl")
+            Path(results_file).parent.mkdir(parents=True, exist_ok=True)
+
+            generator = BatchedGenerator(
+                model,
+                tokenizer,
+                device=device,
+                batch_size=eval_batch_size,
+                max_new_tokens=max_new_tokens
+            )
+            with open(results_file, "w", encoding="utf-8") as f:
+                def write_result(index: int, completion: str, num_tokens: int) -> None:
+                    reward = reward_fn([completion], ground_truth=[ground_truths[index]])[0]
+                    f.write(json.dumps({
+                        "index": index,
+                        "prompt": prompts[index],
+                        "completion": completion,
+                        "ground_truth": ground_truths[index],
+                        "reward": reward,
+                        "generated_tokens": num_tokens
+                    }, ensure_ascii=False, default=str) + "\n")
+                    f.flush()
+
+                completions = generator.generate(prompts, on_result=write_result)
 
             # 计算奖励
             print("📊 计算评估指标...")
-            reward_fn = create_accuracy_reward()
             rewards = reward_fn(completions, ground_truth=ground_truths)
 
             # 计算统计信息
@@ -400,12 +397,19 @@ class RLTrainingTool(Tool):
                 "num_samples": len(completions),
                 "accuracy": f"{accuracy:.2%}",
                 "average_reward": f"{avg_reward:.4f}",
-                "device": device
+                "device": device,
+                "batch_size": generator.batch_size,
+                "generated_tokens": generator.stats["generated_tokens"],
+                "tokens_per_second": generator.stats["tokens_per_second"],
+                "elapsed_seconds": generator.stats["elapsed_seconds"],
+                "results_file": results_file
             }
 
             print(f"\n✅ 评估完成!")
             print(f"  准确率: {accuracy:.2%}")
             print(f"  平均奖励: {avg_reward:.4f}")
+            print(f"  吞吐量: {generator.stats['tokens_per_second']} tokens/s")
+            print(f"  逐样本结果: {results_file}")
 
             return json.dumps(result, ensure_ascii=False, indent=2)
 
@@ -657,6 +661,27 @@ class RLTrainingTool(Tool):
                 required=False,
                 default=4
             ),
+            ToolParameter(
+                name="eval_batch_size",
+                type="integer",
+                description="批量生成的批次大小 (仅evaluate)",
+                required=False,
+                default=16
+            ),
+            ToolParameter(
+                name="max_new_tokens",
+                type="integer",
+                description="每个样本最多生成的token数 (仅evaluate)",
+                required=False,
+                default=128
+            ),
+            ToolParameter(
+                name="results_file",
+                type="string",
+                description="逐样本结果JSONL路径 (仅evaluate)，默认 ./output/eval/eval_results_{时间戳}.jsonl",
+                required=False,
+                default=None
+            ),
         ]
 
 
@@ -13,6 +13,7 @@ from hello_agents.tools.base import Tool
 from hello_agents.evaluation.benchmarks.data_generation.dataset import AIDataset
 from hello_agents.evaluation.benchmarks.data_generation.win_rate import WinRateEvaluator
 from hello_agents.core.llm import HelloAgentsLLM
+from .judge_runner import JudgeRunner, get_judgment_cache
 
 
 class WinRateTool(Tool):
@@ -59,6 +60,22 @@ class WinRateTool(Tool):
                 "judge_model": {
                     "type": "string",
                     "description": "评委模型名称（可选，默认为gpt-4o）"
+                },
+                "max_workers": {
+                    "type": "integer",
+                    "description": "并发评委调用数（可选，默认为JUDGE_MAX_WORKERS或8）"
+                },
+                "requests_per_minute": {
+                    "type": "number",
+                    "description": "每分钟最多评委请求数（可选，默认为JUDGE_RPM或60，0表示不限流）"
+                },
+                "use_cache": {
+                    "type": "boolean",
+                    "description": "是否复用持久化评判缓存（可选，默认为true）"
+                },
+                "rubric": {
+                    "type": "string",
+                    "description": "评分标准标识（可选，默认取评估器源码哈希，变更后缓存失效）"
                 }
             },
             "required": ["generated_data_path"]
@@ -110,13 +127,42 @@ class WinRateTool(Tool):
         print(f"\n🔧 步骤3: 创建Win Rate评估器")
         evaluator = WinRateEvaluator(llm=self.llm, judge_model=judge_model)
         
-        # 4. 运行评估
+        # 4. 运行评估（成对对比并发执行，同一对题目同一 A/B 顺序只评一次）
         print(f"\n🚀 步骤4: 开始成对对比")
-        results = evaluator.evaluate_win_rate(
-            gen_problems,
-            ref_problems,
-            num_comparisons=num_comparisons
+        runner = JudgeRunner(
+            judge_model=judge_model,
+            max_workers=params.get("max_workers"),
+            requests_per_minute=params.get("requests_per_minute"),
+            cache=get_judgment_cache() if params.get("use_cache", True) else None,
+            rubric=params.get("rubric")
+        )
+
+        def placeholder(args, kwargs):
+            problems = [a for a in args if isinstance(a, dict)]
+            ids = [p.get("problem_id", "unknown") for p in problems] + ["unknown", "unknown"]
+            return {
+                "problem_a_id": ids[0],
+                "problem_b_id": ids[1],
+                "winner": "Tie",
+                "reason": "",
+                "comparison_text": "",
+                "execution_time": 0.0
+            }
+
+        results = runner.run(
+            evaluator,
+            "compare_pair",
+            lambda: evaluator.evaluate_win_rate(
+                gen_problems,
+                ref_problems,
+                num_comparisons=num_comparisons
+            ),
+            placeholder,
+            pairwise=True
         )
+        stats = results.get("judge_stats", {})
+        print(f"   评委调用: 完成 {stats.get('completed', 0)} / 失败 {stats.get('failed', 0)} / "
+              f"缓存 {stats.get('cached', 0)}（计划 {stats.get('planned', 0)}，去重后 {stats.get('unique', 0)}）")
         
         # 5. 保存结果
         print(f"\n💾 步骤5: 保存评估结果")
@@ -140,6 +186,7 @@ class WinRateTool(Tool):
         return json.dumps({
             "status": "success",
             "metrics": results["metrics"],
+            "judge_stats": results.get("judge_stats", {}),
             "result_file": result_file,
             "report_file": report_file
         }, ensure_ascii=False, indent=2)
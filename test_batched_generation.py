@@ -0,0 +1,66 @@
+import unittest
+
+try:
+    import torch
+    from transformers import GPT2Config, GPT2LMHeadModel
+    HAS_TORCH = True
+except ImportError:
+    HAS_TORCH = False
+
+from hello_agents.tools.builtin.batched_generation import BatchedGenerator
+
+PAD_ID = 0
+EOS_ID = 1
+VOCAB_SIZE = 64
+
+
+class CharTokenizer:
+    """按字符编码的最小 tokenizer（0 为填充，1 为 eos）"""
+
+    pad_token_id = PAD_ID
+    eos_token_id = EOS_ID
+
+    def __call__(self, texts):
+        return {"input_ids": [[ord(c) % (VOCAB_SIZE - 2) + 2 for c in text] for text in texts]}
+
+    def decode(self, tokens, skip_special_tokens=True):
+        return " ".join(str(t) for t in tokens if not (skip_special_tokens and t in (PAD_ID, EOS_ID)))
+
+
+@unittest.skipUnless(HAS_TORCH, "需要 torch 与 transformers")
+class TestBatchedGeneratorMatchesSequential(unittest.TestCase):
+    def setUp(self):
+        torch.manual_seed(0)
+        config = GPT2Config(vocab_size=VOCAB_SIZE, n_positions=128, n_embd=32, n_layer=2, n_head=2,
+                            bos_token_id=EOS_ID, eos_token_id=EOS_ID)
+        # 双精度：避免批内数值误差让贪婪解码在近似平局处分叉
+        self.model = GPT2LMHeadModel(config).double().eval()
+        self.tokenizer = CharTokenizer()
+        # 共享同一段前缀，后缀长度各不相同（批内需要填充）
+        self.prompts = [
+            "System: answer briefly.\nQuestion: " + q
+            for q in ["2+2?", "capital of France?", "why?", "name three primes", "hi", "sort 3 1 2"]
+        ]
+
+    def generate(self, **kwargs):
+        generator = BatchedGenerator(self.model, self.tokenizer, max_new_tokens=8, **kwargs)
+        return generator, generator.generate(self.prompts, progress=False)
+
+    def test_prefix_cache_batches_match_one_at_a_time(self):
+        _, expected = self.generate(batch_size=1, reuse_prefix_cache=False)
+        generator, completions = self.generate(batch_size=4, reuse_prefix_cache=True)
+
+        # 确认走的是共享前缀缓存路径，而不是退化后的普通批量生成
+        self.assertGreater(generator.stats["shared_prefix_tokens"], 0)
+        self.assertEqual(completions, expected)
+
+    def test_left_padded_batches_match_one_at_a_time(self):
+        _, expected = self.generate(batch_size=1, reuse_prefix_cache=False)
+        generator, completions = self.generate(batch_size=4, reuse_prefix_cache=False)
+
+        self.assertEqual(generator.stats["shared_prefix_tokens"], 0)
+        self.assertEqual(completions, expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
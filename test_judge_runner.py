@@ -0,0 +1,117 @@
+import os
+import random
+import tempfile
+import unittest
+
+from hello_agents.tools.builtin.judge_runner import JudgeRunner, JudgmentCache
+
+
+class FakeWinRateEvaluator:
+    """模拟 WinRateEvaluator：随机抽样配对，并随机交换 A/B 位置以抵消位置偏差"""
+
+    def __init__(self):
+        self.judge_calls = 0
+
+    def compare_pair(self, problem_a, problem_b, label_a="A", label_b="B"):
+        # 评委偏好难度更高的题目；难度相同时偏向 A 位置（位置偏差）
+        self.judge_calls += 1
+        if problem_a["difficulty"] >= problem_b["difficulty"]:
+            winner = "Problem A"
+        else:
+            winner = "Problem B"
+        return {
+            "problem_a_id": problem_a["problem_id"],
+            "problem_b_id": problem_b["problem_id"],
+            "winner": winner,
+        }
+
+    def evaluate_win_rate(self, generated, reference, num_comparisons):
+        wins = 0
+        comparisons = []
+        for _ in range(num_comparisons):
+            gen = random.choice(generated)
+            ref = random.choice(reference)
+            if random.random() < 0.5:
+                result = self.compare_pair(gen, ref, "Generated", "Reference")
+                gen_won = result["winner"] == "Problem A"
+            else:
+                result = self.compare_pair(ref, gen, "Reference", "Generated")
+                gen_won = result["winner"] == "Problem B"
+            wins += gen_won
+            comparisons.append(result)
+        return {"metrics": {"win_rate": wins / num_comparisons}, "comparisons": comparisons}
+
+
+class JitterWinRateEvaluator(FakeWinRateEvaluator):
+    """评委调用本身也消耗全局 random（模拟客户端重试抖动）"""
+
+    def compare_pair(self, problem_a, problem_b, label_a="A", label_b="B"):
+        random.random()
+        return super().compare_pair(problem_a, problem_b, label_a, label_b)
+
+
+def placeholder(args, kwargs):
+    return {"problem_a_id": args[0]["problem_id"], "problem_b_id": args[1]["problem_id"], "winner": "Tie"}
+
+
+class TestJudgeRunnerWinRate(unittest.TestCase):
+    def setUp(self):
+        # 题目少、对比多：同一对题目会以两种 A/B 顺序重复出现
+        self.generated = [{"problem_id": f"g{i}", "difficulty": d} for i, d in enumerate([3, 5])]
+        self.reference = [{"problem_id": f"r{i}", "difficulty": d} for i, d in enumerate([4, 5])]
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.cache = JudgmentCache(os.path.join(self.tmpdir.name, "judge_cache.db"))
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def run_serial(self, seed):
+        random.seed(seed)
+        return FakeWinRateEvaluator().evaluate_win_rate(self.generated, self.reference, 30)
+
+    def run_with_runner(self, seed, cache, evaluator_cls=FakeWinRateEvaluator):
+        evaluator = evaluator_cls()
+        runner = JudgeRunner(judge_model="fake", max_workers=4, requests_per_minute=0, cache=cache)
+        random.seed(seed)
+        results = runner.run(
+            evaluator,
+            "compare_pair",
+            lambda: evaluator.evaluate_win_rate(self.generated, self.reference, 30),
+            placeholder,
+            pairwise=True
+        )
+        return evaluator, results
+
+    def test_mirrored_pairs_keep_win_rate(self):
+        expected = self.run_serial(seed=7)
+        evaluator, results = self.run_with_runner(seed=7, cache=self.cache)
+
+        orders = {(c["problem_a_id"], c["problem_b_id"]) for c in expected["comparisons"]}
+        self.assertTrue(any((b, a) in orders for a, b in orders), "样本中应同时出现两种 A/B 顺序")
+        self.assertEqual(results["metrics"], expected["metrics"])
+        self.assertEqual(results["comparisons"], expected["comparisons"])
+        # 去重只合并同一顺序的对比
+        self.assertEqual(evaluator.judge_calls, len(orders))
+        self.assertEqual(results["judge_stats"]["unique"], len(orders))
+
+    def test_cached_replay_keeps_win_rate(self):
+        expected = self.run_serial(seed=11)
+        self.run_with_runner(seed=11, cache=self.cache)
+        evaluator, results = self.run_with_runner(seed=11, cache=self.cache)
+
+        self.assertEqual(evaluator.judge_calls, 0)
+        self.assertEqual(results["metrics"], expected["metrics"])
+        self.assertEqual(results["comparisons"], expected["comparisons"])
+
+    def test_judge_phase_random_use_does_not_shift_replay(self):
+        expected = self.run_serial(seed=5)
+        evaluator, results = self.run_with_runner(seed=5, cache=None, evaluator_cls=JitterWinRateEvaluator)
+
+        # 回放抽到的配对与规划一致：没有额外的串行评委调用
+        self.assertEqual(evaluator.judge_calls, results["judge_stats"]["unique"])
+        self.assertEqual(results["metrics"], expected["metrics"])
+        self.assertEqual(results["comparisons"], expected["comparisons"])
+
+
+if __name__ == "__main__":
+    unittest.main()
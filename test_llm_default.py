@@ -0,0 +1,41 @@
+import os
+import threading
+import unittest
+from unittest import mock
+
+from hello_agents.core import llm as llm_module
+
+ENV = {
+    "LLM_MODEL_ID": "test-model",
+    "LLM_API_KEY": "sk-test",
+    "LLM_BASE_URL": "http://localhost:9/v1",
+}
+
+
+class TestDefaultLLM(unittest.TestCase):
+    def setUp(self):
+        llm_module._default_llm = None
+        self.addCleanup(setattr, llm_module, "_default_llm", None)
+
+    def call_with_timeout(self, fn, timeout=10):
+        """在子线程里调用，超时视为死锁"""
+        result = {}
+        thread = threading.Thread(target=lambda: result.setdefault("value", fn()), daemon=True)
+        thread.start()
+        thread.join(timeout)
+        self.assertFalse(thread.is_alive(), "get_default_llm() 未在超时内返回（死锁）")
+        return result["value"]
+
+    @mock.patch.dict(os.environ, ENV, clear=True)
+    def test_default_llm_is_created_once_and_shared(self):
+        first = self.call_with_timeout(llm_module.get_default_llm)
+        second = self.call_with_timeout(llm_module.get_default_llm)
+
+        self.assertIs(first, second)
+        self.assertEqual(first.model, "test-model")
+        # 默认LLM与直接构造的同配置实例共用同一个客户端
+        self.assertIs(llm_module.HelloAgentsLLM()._client, first._client)
+
+
+if __name__ == "__main__":
+    unittest.main()